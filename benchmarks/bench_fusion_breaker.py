@@ -0,0 +1,88 @@
+"""
+Benchmark: consultas à API Fusion com o ping antes de cada consulta
+(comportamento anterior) e com o circuit breaker guiado pelas consultas reais.
+
+Usa o servidor Fusion simulado de loadtest/standins.py em dois cenários:
+- saudável: a API responde normalmente
+- com erros: todas as consultas retornam 503
+
+Executar com: python benchmarks/bench_fusion_breaker.py [consultas]
+"""
+
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from standins import FusionHandler, LatencyProfile, StandInServer
+from src.services.fusion_api import FusionAPI
+
+
+class PingBeforeLookup:
+    """Comportamento anterior: ping (timeout 2s) antes de cada consulta; offline = dados simulados"""
+
+    def __init__(self, api):
+        self.api = api
+
+    def allow_request(self):
+        return self.api._health_check()
+
+    def record_success(self):
+        pass
+
+    def record_failure(self):
+        pass
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+
+def build_api(url, with_breaker):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = f"{url}/api"
+    if not with_breaker:
+        api.breaker = PingBeforeLookup(api)
+    return api
+
+
+def run(profile, lookups, with_breaker):
+    server = StandInServer(FusionHandler, profile).start()
+    api = build_api(server.url, with_breaker)
+    latencies = []
+    try:
+        for i in range(lookups):
+            start = time.perf_counter()
+            api.get_client_data("cpf", f"{12345678900 + i}")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        stats = api.stats()
+        api.close()
+        server.stop()
+    latencies.sort()
+    return latencies[len(latencies) // 2], sum(latencies), server.requests, stats
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    scenarios = [
+        ("saudável", LatencyProfile(20), lookups),
+        ("com erros (503)", LatencyProfile(20, error_rate=1.0, error_status=503), lookups),
+    ]
+    # Erros esperados da API simulada
+    logging.disable(logging.ERROR)
+    for label, profile, count in scenarios:
+        for with_breaker in (False, True):
+            median, total, requests_sent, stats = run(profile, count, with_breaker)
+            mode = "circuit breaker" if with_breaker else "ping por consulta"
+            extra = f"  circuito {stats['state']}, {stats['rejected']} recusadas" if "state" in stats else ""
+            print(f"{label:16s} {mode:18s}: {count} consultas em {total:6.2f}s  "
+                  f"mediana {median * 1000:7.1f} ms  {requests_sent} consultas enviadas à API{extra}")
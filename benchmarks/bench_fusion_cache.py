@@ -0,0 +1,144 @@
+"""
+Benchmark: cache das consultas à API Fusion (FusionCache).
+
+Usa o servidor Fusion simulado de loadtest/standins.py com clientes que
+reenviam o mesmo CPF várias vezes (distribuição de Zipf) e 10% de
+identificadores inexistentes (404), e compara:
+- sem cache (comportamento anterior)
+- cache em memória do processo
+- cache no armazenamento compartilhado (SQLite)
+
+Depois mede o stale-while-revalidate com TTLs curtos (a consulta vencida
+é respondida sem esperar a API) e o limite de memória do cache.
+
+Executar com: python benchmarks/bench_fusion_cache.py [consultas] [clientes]
+"""
+
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from standins import FusionHandler, LatencyProfile, StandInServer
+from src.core.sqlite_session_store import SQLiteSessionStore
+from src.services.fusion_api import FusionAPI
+from src.services.fusion_cache import FusionCache, MemoryFusionCacheBackend, StoreFusionCacheBackend
+
+
+def build_api(url, cache):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = f"{url}/api"
+    api.breaker.close()
+    if api.cache is not None:
+        api.cache.close()
+    api.cache = cache
+    return api
+
+
+def workload(lookups, customers, seed=7):
+    """CPFs com popularidade de Zipf; 10% dos clientes não existem na API"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(customers)]
+    ids = [
+        f"{FusionHandler.NOT_FOUND_PREFIX}{c:08d}" if c % 10 == 9 else f"{12345678900 + c}"
+        for c in range(customers)
+    ]
+    return rng.choices(ids, weights=weights, k=lookups)
+
+
+def run(label, cache, identifiers, profile):
+    server = StandInServer(FusionHandler, profile).start()
+    api = build_api(server.url, cache)
+    latencies = []
+    start = time.perf_counter()
+    try:
+        for identifier in identifiers:
+            t = time.perf_counter()
+            api.get_client_data("cpf", identifier)
+            latencies.append(time.perf_counter() - t)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = cache.stats() if cache is not None else None
+        api.close()
+        server.stop()
+    latencies.sort()
+    hit_rate = f"  acertos {stats['hit_rate']:.1%}" if stats else ""
+    print(f"{label:26s}: {len(identifiers) / elapsed:8.0f} consultas/s  "
+          f"mediana {latencies[len(latencies) // 2] * 1000:6.2f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f} ms  "
+          f"{server.requests:5d} consultas à API{hit_rate}")
+
+
+def stale_while_revalidate(profile):
+    """Com TTL de 0,2 s, consultas vencidas não esperam a API (uma atualização por chave)"""
+    server = StandInServer(FusionHandler, profile).start()
+    cache = FusionCache(status_ttls={}, default_ttl=0.2, stale_ttl=60)
+    api = build_api(server.url, cache)
+    identifiers = [f"{12345678900 + c}" for c in range(20)]
+    try:
+        for identifier in identifiers:
+            api.get_client_data("cpf", identifier)
+        time.sleep(0.3)
+        sent = server.requests
+        worst = 0.0
+        for _ in range(5):
+            for identifier in identifiers:
+                t = time.perf_counter()
+                api.get_client_data("cpf", identifier)
+                worst = max(worst, time.perf_counter() - t)
+        # Esperar as atualizações e ler de novo (agora dentro do TTL)
+        time.sleep(0.15)
+        refreshed = server.requests - sent
+        for identifier in identifiers:
+            api.get_client_data("cpf", identifier)
+        stats = cache.stats()
+    finally:
+        api.close()
+        server.stop()
+    print(f"stale-while-revalidate     : 100 consultas vencidas, pior latência {worst * 1000:.2f} ms, "
+          f"{refreshed} atualizações em segundo plano para 20 chaves "
+          f"({stats['stale']} respostas antigas, depois {stats['hits']} acertos)")
+
+
+def bounded(customers):
+    cache = FusionCache(backend=MemoryFusionCacheBackend(max_entries=1000))
+    for c in range(customers):
+        identifier = f"{12345678900 + c}"
+        cache.get("cpf", identifier, lambda id_type, value: {
+            "sucesso": True, "tipo": id_type, "valor": value, "dados": {"status": "Concluído"}
+        })
+    stats = cache.stats()
+    cache.close()
+    print(f"limite de memória          : {customers} clientes, {stats['entries']} entradas mantidas, "
+          f"{stats['evicted']} descartadas (LRU)")
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    customers = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    logging.disable(logging.ERROR)
+    profile = LatencyProfile(10)
+    identifiers = workload(lookups, customers)
+    print(f"{lookups} consultas, {len(set(identifiers))} CPFs distintos, API com mediana de {profile.median_ms:.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteSessionStore(os.path.join(tmp, "fusion-cache.db"))
+        scenarios = [
+            ("sem cache", None),
+            ("cache em memória", FusionCache()),
+            ("cache compartilhado SQLite", FusionCache(backend=StoreFusionCacheBackend(store))),
+        ]
+        for label, cache in scenarios:
+            run(label, cache, identifiers, profile)
+        store.close()
+
+    stale_while_revalidate(profile)
+    bounded(customers * 10)
@@ -0,0 +1,105 @@
+"""
+Benchmark: consultas à API Fusion com requests.get avulso por consulta
+(comportamento anterior), com a sessão HTTP compartilhada (pool keep-alive)
+e com aget_client_data (httpx assíncrono) no event loop.
+
+Usa o servidor Fusion simulado de loadtest/standins.py e informa latência
+(mediana e p95), vazão e conexões TCP abertas no servidor.
+
+Executar com: python benchmarks/bench_fusion_client.py [consultas] [concorrência]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from standins import FusionHandler, LatencyProfile, StandInServer
+from src.services.fusion_api import FusionAPI
+
+
+class BareRequests:
+    """Comportamento anterior: requests.get (nova conexão) a cada consulta"""
+
+    def get(self, url, **kwargs):
+        return requests.get(url, **kwargs)
+
+    def close(self):
+        pass
+
+
+def build_api(url, pooled):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = f"{url}/api"
+    api.breaker.close()
+    if not pooled:
+        api.http = BareRequests()
+    return api
+
+
+def timed(api, i):
+    start = time.perf_counter()
+    data = api.get_client_data("cpf", f"{12345678900 + i}")
+    return time.perf_counter() - start, data is not None
+
+
+async def atimed(api, semaphore, i):
+    async with semaphore:
+        start = time.perf_counter()
+        data = await api.aget_client_data("cpf", f"{12345678900 + i}")
+        return time.perf_counter() - start, data is not None
+
+
+async def run_async(api, lookups, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        return await asyncio.gather(*(atimed(api, semaphore, i) for i in range(lookups)))
+    finally:
+        await api.aclose()
+
+
+def run(mode, lookups, concurrency):
+    server = StandInServer(FusionHandler, LatencyProfile(5)).start()
+    api = build_api(server.url, pooled=mode != "requests.get avulso")
+    start = time.perf_counter()
+    try:
+        if mode == "aget_client_data":
+            results = asyncio.run(run_async(api, lookups, concurrency))
+        else:
+            with ThreadPoolExecutor(concurrency) as pool:
+                results = list(pool.map(lambda i: timed(api, i), range(lookups)))
+    finally:
+        elapsed = time.perf_counter() - start
+        api.close()
+        server.stop()
+    latencies = sorted(latency for latency, _ in results)
+    ok = sum(1 for _, found in results if found)
+    return {
+        "elapsed": elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "ok": ok,
+        "connections": server.connections,
+        "requests": server.requests,
+    }
+
+
+if __name__ == "__main__":
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    logging.disable(logging.ERROR)
+    for mode in ("requests.get avulso", "sessão com pool", "aget_client_data"):
+        r = run(mode, lookups, concurrency)
+        print(f"{mode:20s}: {lookups / r['elapsed']:7.0f} consultas/s  "
+              f"mediana {r['p50'] * 1000:6.1f} ms  p95 {r['p95'] * 1000:6.1f} ms  "
+              f"{r['connections']:5d} conexões abertas  {r['ok']}/{r['requests']} respostas válidas")
@@ -0,0 +1,108 @@
+"""
+Benchmark: consultas simultâneas ao mesmo identificador na API Fusion
+(cliente que envia o CPF duas vezes, campanha com muitos clientes da mesma
+ordem), com e sem o agrupamento de chamadas em andamento (SingleFlight).
+
+Usa o servidor Fusion simulado de loadtest/standins.py. O cache fica ativo
+nos dois casos: as consultas chegam juntas, antes de a primeira resposta
+entrar no cache. Mede consultas enviadas à API, chamadas agrupadas e
+duração da rajada, com threads (get_client_data) e no event loop
+(aget_client_data).
+
+Executar com: python benchmarks/bench_fusion_coalescing.py [concorrência] [identificadores]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from standins import FusionHandler, LatencyProfile, StandInServer
+from src.services.fusion_api import FusionAPI
+
+
+class NoCoalescing:
+    """Comportamento anterior: toda chamada vai à API"""
+
+    def do(self, key, fn, *args):
+        return fn(*args)
+
+    async def ado(self, key, fn, *args):
+        return await fn(*args)
+
+    def stats(self):
+        return {"in_flight": 0, "executed": 0, "coalesced": 0}
+
+
+def build_api(url, coalescing):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = f"{url}/api"
+    api.breaker.close()
+    api.max_connections = 64
+    if not coalescing:
+        api.flight = NoCoalescing()
+    return api
+
+
+def burst_threads(api, concurrency, identifiers):
+    """'concurrency' threads consultam juntas, distribuídas entre os identificadores"""
+    barrier = threading.Barrier(concurrency)
+    results = [None] * concurrency
+
+    def worker(i):
+        barrier.wait()
+        results[i] = api.get_client_data("ordem", identifiers[i % len(identifiers)])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+async def burst_async(api, concurrency, identifiers):
+    try:
+        return await asyncio.gather(*(
+            api.aget_client_data("ordem", identifiers[i % len(identifiers)]) for i in range(concurrency)
+        ))
+    finally:
+        await api.aclose()
+
+
+def run(mode, coalescing, concurrency, identifiers):
+    server = StandInServer(FusionHandler, LatencyProfile(50)).start()
+    api = build_api(server.url, coalescing)
+    start = time.perf_counter()
+    try:
+        if mode == "async":
+            results = asyncio.run(burst_async(api, concurrency, identifiers))
+        else:
+            results = burst_threads(api, concurrency, identifiers)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = api.stats()
+        api.close()
+        server.stop()
+    ok = sum(1 for r in results if r and r.get("sucesso"))
+    label = f"{mode}, {'com' if coalescing else 'sem'} agrupamento"
+    print(f"{label:24s}: {concurrency} consultas ({len(identifiers)} identificadores) em {elapsed * 1000:6.0f} ms  "
+          f"{server.requests:3d} consultas à API  {stats['coalesced']:3d} agrupadas  {ok}/{concurrency} respostas")
+
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    identifiers = [f"ORD{40000000 + i:08d}" for i in range(distinct)]
+
+    logging.disable(logging.ERROR)
+    for mode in ("threads", "async"):
+        for coalescing in (False, True):
+            run(mode, coalescing, concurrency, identifiers)
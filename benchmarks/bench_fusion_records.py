@@ -0,0 +1,122 @@
+"""
+Benchmark: consultas à API Fusion quando o cliente troca de identificador
+(CPF, depois placa, telefone ou ordem do mesmo atendimento).
+
+Compara o cache por chave consultada (MemoryFusionCacheBackend) com os
+atendimentos indexados por todos os identificadores (FusionRecordStore),
+usando o servidor Fusion simulado de loadtest/standins.py, e confere a
+invalidação: atualizar um atendimento por qualquer identificador substitui
+o registro em todas as chaves.
+
+Executar com: python benchmarks/bench_fusion_records.py [clientes]
+"""
+
+import logging
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "loadtest"))
+
+from standins import FusionHandler, LatencyProfile, StandInServer
+from src.services.fusion_api import FusionAPI
+from src.services.fusion_cache import FusionCache, FusionRecordStore, MemoryFusionCacheBackend
+
+
+def build_api(url, cache):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = f"{url}/api"
+    api.breaker.close()
+    api.cache.close()
+    api.cache = cache
+    return api
+
+
+def conversation(api, rng, cpf):
+    """O cliente informa o CPF e depois, em média, mais dois identificadores do atendimento"""
+    first = api.get_client_data("cpf", cpf)
+    dados = first["dados"]
+    others = [
+        ("placa", dados["veiculo"]["placa"]),
+        ("telefone", dados["telefone"]),
+        ("ordem", dados["ordem"]),
+    ]
+    answers = [first]
+    for id_type, value in rng.sample(others, rng.randint(1, 3)):
+        answers.append(api.get_client_data(id_type, value))
+    return answers
+
+
+def run(label, backend, customers, profile):
+    server = StandInServer(FusionHandler, profile).start()
+    cache = FusionCache(backend=backend)
+    api = build_api(server.url, cache)
+    rng = random.Random(3)
+    lookups = 0
+    consistent = 0
+    start = time.perf_counter()
+    try:
+        for c in range(customers):
+            answers = conversation(api, rng, f"{12345678900 + c}")
+            lookups += len(answers)
+            # Todas as respostas descrevem o mesmo atendimento
+            if len({a["dados"]["ordem"] for a in answers}) == 1:
+                consistent += 1
+    finally:
+        elapsed = time.perf_counter() - start
+        api.close()
+        server.stop()
+    print(f"{label:28s}: {lookups} consultas em {elapsed:5.2f}s  {server.requests:5d} consultas à API  "
+          f"{len(backend):5d} entradas  {consistent}/{customers} conversas com o mesmo atendimento")
+
+
+def record(ordem, telefone, status):
+    return {
+        "sucesso": True,
+        "tipo": "cpf",
+        "valor": "12345678909",
+        "dados": {
+            "cpf": "12345678909", "telefone": telefone, "ordem": ordem, "status": status,
+            "veiculo": {"placa": "ABC1D23", "chassi": "9BRBLWHEXG0123456"}
+        }
+    }
+
+
+def invalidation():
+    store = FusionRecordStore()
+    cache = FusionCache(backend=store)
+    cache.put("cpf", "123.456.789-09", record("ORD100", "11987654321", "Em andamento"))
+
+    # Mesma ordem atualizada pela placa, com telefone novo
+    cache.put("placa", "abc-1d23", record("ORD100", "11912345678", "Concluído"))
+    old_phone = store.get("telefone:11987654321")
+    status = store.get("chassi:9BRBLWHEXG0123456")["value"]["dados"]["status"]
+
+    # Nova ordem do mesmo cliente: CPF e placa passam a apontar para ela; a ordem antiga continua
+    cache.put("cpf", "12345678909", record("ORD200", "11912345678", "Agendado"))
+    by_cpf = store.get("cpf:12345678909")["value"]["dados"]["ordem"]
+    by_old_order = store.get("ordem:ORD100")["value"]["dados"]["ordem"]
+
+    # Remover por qualquer identificador remove o atendimento inteiro
+    cache.invalidate("telefone", "(11) 91234-5678")
+    removed = store.get("ordem:ORD200") is None and store.get("placa:ABC1D23") is None
+    cache.close()
+
+    ok = old_phone is None and status == "Concluído" and by_cpf == "ORD200" and by_old_order == "ORD100" and removed
+    print(f"invalidação entre identificadores: {'ok' if ok else 'ERRO'} "
+          f"(telefone antigo removido: {old_phone is None}, status pelo chassi: {status}, "
+          f"CPF -> {by_cpf}, ordem antiga -> {by_old_order}, remoção pelo telefone: {removed})")
+
+
+if __name__ == "__main__":
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+
+    logging.disable(logging.ERROR)
+    profile = LatencyProfile(10)
+    run("cache por chave consultada", MemoryFusionCacheBackend(), customers, profile)
+    run("atendimentos indexados", FusionRecordStore(), customers, profile)
+    invalidation()
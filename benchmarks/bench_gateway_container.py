@@ -0,0 +1,54 @@
+"""
+Benchmark: custo por requisição do gateway WhatsApp
+com registro de serviços recriado a cada webhook vs. container compartilhado.
+
+Executar com: python benchmarks/bench_gateway_container.py [iterações]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.orchestrator import ActionOrchestrator
+from src.core.session_manager import SessionManager
+from src.core.service_registry import ServiceRegistry
+from src.channels.whatsapp.container import GatewayContainer
+
+MESSAGES = ["12345678900", "qual o prazo?", "obrigado"]
+
+
+def per_request_registry(iterations):
+    """Comportamento antigo: novo ServiceRegistry/SessionManager por webhook"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        registry = ServiceRegistry()
+        session_manager = SessionManager(registry.get("storage_client"))
+        orchestrator = ActionOrchestrator(session_manager, registry)
+        orchestrator.process_input(MESSAGES[i % len(MESSAGES)], "whatsapp", f"5511{i % 50:09d}")
+        session_manager.close()
+    return time.perf_counter() - start
+
+
+def shared_container(iterations):
+    """Comportamento novo: container construído uma vez e reutilizado"""
+    container = GatewayContainer(settings={}).startup()
+    start = time.perf_counter()
+    for i in range(iterations):
+        container.orchestrator.process_input(MESSAGES[i % len(MESSAGES)], "whatsapp", f"5511{i % 50:09d}")
+    elapsed = time.perf_counter() - start
+    container.shutdown()
+    return elapsed
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    before = per_request_registry(iterations)
+    after = shared_container(iterations)
+
+    print(f"Iterações: {iterations}")
+    print(f"Registro por requisição: {before / iterations * 1e6:10.1f} us/req")
+    print(f"Container compartilhado: {after / iterations * 1e6:10.1f} us/req")
+    print(f"Ganho: {before / after:.1f}x")
@@ -0,0 +1,73 @@
+"""
+Benchmark: gravações de sessão por turno
+Compara a persistência a cada mutação (comportamento anterior) com o commit
+único por turno em ActionOrchestrator.process_input.
+
+Executar com: python benchmarks/bench_session_commit.py [conversas]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.orchestrator import ActionOrchestrator
+from src.core.session_manager import Session, SessionManager
+from src.core.service_registry import ServiceRegistry
+
+TURNS = ["12345678900", "qual o prazo?", "a peça é original?", "ORD654321", "obrigado"]
+
+
+class CountingStorage:
+    """Storage client em memória que contabiliza gravações e bytes"""
+
+    def __init__(self):
+        self.data = {}
+        self.writes = 0
+        self.bytes = 0
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.writes += 1
+        self.bytes += len(value)
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def run(conversations, per_mutation):
+    registry = ServiceRegistry()
+    storage = CountingStorage()
+    orchestrator = ActionOrchestrator(SessionManager(storage), registry)
+
+    original = Session._mark_dirty
+    if per_mutation:
+        # Emula o comportamento anterior: gravar a sessão inteira a cada mutação
+        def save_on_mutation(self, field):
+            original(self, field)
+            self.manager.save_session(self)
+        Session._mark_dirty = save_on_mutation
+
+    try:
+        start = time.perf_counter()
+        for i in range(conversations):
+            for text in TURNS:
+                orchestrator.process_input(text, "whatsapp", f"5511{i:09d}")
+        elapsed = time.perf_counter() - start
+    finally:
+        Session._mark_dirty = original
+
+    turns = conversations * len(TURNS)
+    return storage.writes / turns, storage.bytes / turns, elapsed / turns * 1e6
+
+
+if __name__ == "__main__":
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    for label, per_mutation in (("Gravação por mutação", True), ("Commit por turno", False)):
+        writes, size, micros = run(conversations, per_mutation)
+        print(f"{label:22s}: {writes:5.2f} gravações/turno  {size:8.0f} bytes/turno  {micros:8.1f} us/turno")
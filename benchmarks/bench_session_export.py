@@ -0,0 +1,106 @@
+"""
+Benchmark: exportação de sessões (SessionManager.iter_sessions + export_sessions)
+em memória, SQLite, Redis (mock) e shards SQLite.
+
+Para cada armazenamento: sessões/s, pico de memória alocada durante a
+exportação (tracemalloc) com N e 4N sessões, conferência do número de
+registros e dos turnos, e verificação de que a exportação não renova a
+expiração das sessões em memória.
+
+Executar com: python benchmarks/bench_session_export.py [sessões]
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_export import export_sessions
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import get_serializer
+from src.core.session_store import MemorySessionStore
+from src.core.sharded_session_store import create_sharded_store
+from src.core.sqlite_session_store import SQLiteSessionStore
+from src.services.mocks.redis_mock import RedisMock
+
+
+class CountingOutput(io.TextIOBase):
+    """Saída que só conta linhas e bytes (não acumula o texto exportado)"""
+
+    def __init__(self):
+        self.lines = 0
+        self.bytes = 0
+        self.turns = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+        if text != "\n":
+            self.lines += 1
+            self.turns += json.loads(text)["turns"]
+        return len(text)
+
+
+def populate(store, sessions):
+    manager = SessionManager(store, history_window=6, archive_batch=4, serializer=get_serializer("binary"))
+    turns = 0
+    for u in range(sessions):
+        session = manager.get_session("whatsapp", f"5511{u:09d}")
+        for t in range(u % 15 + 1):
+            session.add_message("user", f"mensagem {t}")
+            session.add_message("assistant", f"resposta {t}")
+            turns += 1
+        if u % 7 == 0:
+            session.set_escalation_reason("Cliente pediu atendente")
+        manager.commit_session(session)
+    return turns
+
+
+def export(store):
+    manager = SessionManager(store, serializer=get_serializer("binary"))
+    output = CountingOutput()
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = export_sessions(manager, output, batch_size=500)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, output, elapsed, peak
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [
+            ("Memória", lambda n: MemorySessionStore(sweep_interval=0)),
+            ("SQLite", lambda n: SQLiteSessionStore(os.path.join(tmp, f"export-{n}.db"))),
+            ("Redis (mock)", lambda n: RedisSessionStore(client=RedisMock())),
+            ("3 shards SQLite", lambda n: create_sharded_store(
+                [SQLiteSessionStore(os.path.join(tmp, f"shard-{n}-{i}.db")) for i in range(3)])),
+        ]
+        for label, factory in backends:
+            peaks = []
+            for n in (sessions, sessions * 4):
+                store = factory(n)
+                turns = populate(store, n)
+                count, output, elapsed, peak = export(store)
+                peaks.append(peak)
+                ok = "ok" if count == n and output.turns == turns else f"ERRO ({count} sessões, {output.turns} turnos)"
+                print(f"{label:16s} {n:6d} sessões: {n / elapsed:8,.0f} sessões/s  "
+                      f"pico {peak / 1024:7.0f} KB  {output.bytes / n:.0f} bytes/registro  conferência {ok}")
+                store.close()
+
+        # A exportação não deve renovar a expiração das sessões em memória
+        store = MemorySessionStore(sweep_interval=0)
+        populate(store, 100)
+        before = {key: entry[2] for key, entry in store._data.items()}
+        time.sleep(0.01)
+        export(store)
+        renewed = sum(1 for key, expires_at in before.items() if store._data[key][2] != expires_at)
+        print(f"Expirações renovadas pela exportação (memória): {renewed}")
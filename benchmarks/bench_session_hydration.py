@@ -0,0 +1,79 @@
+"""
+Benchmark: custo por turno de carregar e gravar sessões longas com
+hidratação completa (histórico decodificado na leitura) vs. hidratação
+preguiçosa (apenas estado e cabeçalho; mensagens novas acrescentadas ao
+histórico gravado sem decodificá-lo), nos formatos JSON e binário.
+
+Cada turno faz o que ActionOrchestrator.process_input faz na maioria das
+mensagens: lê a sessão, consulta o estado, acrescenta duas mensagens e grava
+(o histórico cresce duas mensagens por turno a partir do tamanho inicial).
+
+Executar com: python benchmarks/bench_session_hydration.py [turnos]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import get_serializer
+from src.core.session_store import MemorySessionStore
+
+SIZES = (20, 200, 1000)
+CLIENT_INFO = {
+    "sucesso": True, "tipo": "cpf", "valor": "12345678900",
+    "dados": {"nome": "João da Silva", "cpf": "12345678900", "status": "Em andamento",
+              "tipo_servico": "Troca de Parabrisa",
+              "veiculo": {"modelo": "Honda Civic", "placa": "ABC1234", "ano": "2020"}}
+}
+
+
+def prepare(format_name, messages):
+    """Gerenciador com uma sessão de 'messages' mensagens (sem arquivamento)"""
+    manager = SessionManager(
+        MemorySessionStore(sweep_interval=0),
+        history_window=messages + 1000000,
+        serializer=get_serializer(format_name)
+    )
+    session = manager.get_session("whatsapp", "5511999999999")
+    session.update_client_info(CLIENT_INFO)
+    session.set_state("awaiting_followup")
+    for i in range(messages - 1):
+        session.add_message("user" if i % 2 else "assistant", f"mensagem {i} sobre o andamento do serviço")
+    manager.commit_session(session)
+    return manager
+
+
+def run(manager, turns, eager):
+    load = save = 0.0
+    for i in range(turns):
+        started = time.perf_counter()
+        session = manager.get_session("whatsapp", "5511999999999")
+        if eager:
+            # Hidratação completa, como antes: todo o histórico decodificado na leitura
+            session.get_conversation_history()
+            session.get_client_info()
+        session.get_state()
+        loaded = time.perf_counter()
+
+        session.add_message("user", "qual a previsão de conclusão?")
+        session.add_message("assistant", "Seu serviço está em andamento e deve ser concluído hoje.")
+        manager.commit_session(session)
+        save += time.perf_counter() - loaded
+        load += loaded - started
+    return load / turns * 1e6, save / turns * 1e6
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print(f"{'mensagens':>9s}  {'formato':7s} {'hidratação':11s} {'leitura (us)':>13s} {'gravação (us)':>14s}")
+    for size in SIZES:
+        for format_name, eager in (("json", True), ("json", False), ("binary", True), ("binary", False)):
+            manager = prepare(format_name, size)
+            load, save = run(manager, turns, eager)
+            label = "completa" if eager else "preguiçosa"
+            print(f"{size:9d}  {format_name:7s} {label:11s} {load:13.1f} {save:14.1f}")
+            manager.close()
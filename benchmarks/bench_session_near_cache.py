@@ -0,0 +1,99 @@
+"""
+Benchmark: leituras remotas de sessão por turno com e sem o cache local
+(SessionNearCache) em dois workers que compartilham o mesmo Redis (RedisMock).
+
+As conversas ficam em geral no mesmo worker, mas uma fração dos turnos vai
+para o outro; a cópia em cache do primeiro worker fica desatualizada e é
+detectada na leitura pela versão e pelo session_id. Ao final, cada sessão é
+conferida com o histórico esperado.
+
+Executar com: python benchmarks/bench_session_near_cache.py [conversas] [turnos] [fração_troca]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_cache import SessionNearCache
+from src.core.session_manager import SessionConflictError, SessionManager
+from src.core.session_serializer import get_serializer
+from src.services.mocks.redis_mock import RedisMock
+
+
+class ReadCountingRedis(RedisMock):
+    """RedisMock que contabiliza os bytes devolvidos em leituras"""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_read = 0
+
+    def _execute(self, name, args, kwargs):
+        result = super()._execute(name, args, kwargs)
+        if name == "hgetall":
+            self.bytes_read += sum(len(k) + len(v) for k, v in result.items())
+        elif name == "lrange":
+            self.bytes_read += sum(len(item) for item in result)
+        elif name in ("get", "hget") and result is not None:
+            self.bytes_read += len(result)
+        return result
+
+
+def run(conversations, turns, switch_rate, use_cache):
+    random.seed(7)
+    client = ReadCountingRedis()
+    store = RedisSessionStore(client=client)
+    workers = [
+        SessionManager(store, serializer=get_serializer("binary"),
+                       near_cache=SessionNearCache() if use_cache else None)
+        for _ in range(2)
+    ]
+
+    expected = {}
+    conflicts = 0
+    start = time.perf_counter()
+    for turn in range(turns):
+        for i in range(conversations):
+            user_id = f"5511{i:09d}"
+            home = i % 2
+            worker = workers[1 - home if random.random() < switch_rate else home]
+
+            while True:
+                session = worker.get_session("whatsapp", user_id)
+                session.get_state()
+                session.add_message("user", f"pergunta {turn}")
+                session.add_message("assistant", f"resposta {turn}")
+                try:
+                    worker.commit_session(session)
+                    break
+                except SessionConflictError:
+                    conflicts += 1
+            expected.setdefault(user_id, []).extend((f"pergunta {turn}", f"resposta {turn}"))
+    elapsed = time.perf_counter() - start
+
+    for user_id, contents in expected.items():
+        session = SessionManager(store).get_session("whatsapp", user_id)
+        history = [m["content"] for m in session.get_full_history()][1:]
+        assert history == contents, f"Sessão {user_id} com histórico inconsistente"
+
+    total = conversations * turns
+    cache_stats = [w.near_cache.stats() for w in workers if w.near_cache is not None]
+    return client.round_trips / total, client.bytes_read / total, elapsed / total * 1e6, conflicts, cache_stats
+
+
+if __name__ == "__main__":
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    switch_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    for label, use_cache in (("Sem cache local", False), ("Com cache local", True)):
+        trips, read, micros, conflicts, cache_stats = run(conversations, turns, switch_rate, use_cache)
+        print(f"{label:16s}: {trips:5.2f} idas/turno  {read:8.0f} bytes lidos/turno  {micros:7.1f} us/turno  "
+              f"{conflicts} turnos reaplicados")
+        for index, stats in enumerate(cache_stats):
+            print(f"  worker {index}: acertos {stats['hits']}  ausentes {stats['misses']}  "
+                  f"desatualizados {stats['stale']}  conferências {stats['probes']}  taxa {stats['hit_rate']:.1%}")
+    print(f"Históricos conferidos ({conversations} conversas, {turns} turnos, {switch_rate:.0%} de troca de worker)")
@@ -0,0 +1,84 @@
+"""
+Benchmark: sessões no Redis como documento JSON único vs. hash + lista
+com pipeline (RedisSessionStore), usando o Redis em processo (RedisMock).
+
+Mede idas ao servidor e bytes gravados por turno ao longo de conversas
+longas e confere que cada sessão recarregada é igual ao estado gravado.
+
+Executar com: python benchmarks/bench_session_redis.py [conversas] [turnos]
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.orchestrator import ActionOrchestrator
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_manager import SessionManager
+from src.core.service_registry import ServiceRegistry
+from src.services.mocks.redis_mock import RedisMock
+
+TURNS = ["12345678900", "qual o prazo?", "a peça é original?", "qual a loja mais próxima?", "obrigado"]
+
+
+class CountingRedis(RedisMock):
+    """RedisMock que contabiliza os bytes enviados em gravações"""
+
+    def __init__(self):
+        super().__init__()
+        self.bytes_written = 0
+
+    def _execute(self, name, args, kwargs):
+        if name == "set":
+            self.bytes_written += len(args[1])
+        elif name == "hset":
+            self.bytes_written += sum(len(k) + len(v) for k, v in kwargs["mapping"].items())
+        elif name == "rpush":
+            self.bytes_written += sum(len(v) for v in args[1:])
+        return super()._execute(name, args, kwargs)
+
+
+class CheckedSessionManager(SessionManager):
+    """Guarda o estado em memória de cada sessão no fim do turno, para conferência"""
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self.expected = {}
+
+    def commit_session(self, session):
+        saved = super().commit_session(session)
+        self.expected[session.user_id] = json.loads(json.dumps(session.to_dict()))
+        return saved
+
+
+def run(conversations, turns, structured):
+    registry = ServiceRegistry()
+    client = CountingRedis()
+    storage = RedisSessionStore(client=client) if structured else client
+    manager = CheckedSessionManager(storage)
+    orchestrator = ActionOrchestrator(manager, registry)
+
+    start = time.perf_counter()
+    for i in range(conversations):
+        for t in range(turns):
+            orchestrator.process_input(TURNS[t % len(TURNS)], "whatsapp", f"5511{i:09d}")
+    elapsed = time.perf_counter() - start
+
+    total = conversations * turns
+    for user_id, expected in manager.expected.items():
+        loaded = manager.get_session("whatsapp", user_id).to_dict()
+        assert loaded == expected, f"Sessão {user_id} carregada difere do estado gravado"
+    return client.round_trips / total, client.bytes_written / total, elapsed / total * 1e6
+
+
+if __name__ == "__main__":
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    turns = int(sys.argv[2]) if len(sys.argv) > 2 else 25
+
+    for label, structured in (("JSON único", False), ("Hash + lista", True)):
+        trips, size, micros = run(conversations, turns, structured)
+        print(f"{label:14s}: {trips:5.2f} idas/turno  {size:8.0f} bytes/turno  {micros:8.1f} us/turno")
+    print(f"Sessões recarregadas conferem com o estado gravado ({conversations} conversas, {turns} turnos)")
@@ -0,0 +1,81 @@
+"""
+Benchmark: serialização de sessões em JSON vs. formato binário versionado
+(BinarySessionSerializer), com 10, 100 e 1000 mensagens no histórico.
+
+Mede tempo de codificação/decodificação e bytes por sessão, e confere que
+o formato binário reproduz a sessão e continua lendo o JSON anterior.
+
+Executar com: python benchmarks/bench_session_serialization.py [repetições]
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.session_serializer import get_serializer
+
+SIZES = (10, 100, 1000)
+USER_TEXTS = ["12345678900", "qual a previsão de conclusão?", "a peça utilizada é original?", "obrigado"]
+ASSISTANT_TEXTS = [
+    "Olá João da Silva! Encontrei seu atendimento para o veículo Honda Civic. Seu serviço de Troca de Parabrisa está com status: Em andamento. Como posso ajudar?",
+    "Seu serviço está em andamento e deve ser concluído hoje.",
+    "Sim, utilizamos apenas peças originais ou homologadas pelo fabricante."
+]
+
+
+def build_session(messages):
+    """Sessão com client_info preenchido e 'messages' mensagens alternadas"""
+    moment = datetime(2024, 5, 10, 9, 30)
+    history = []
+    for i in range(messages):
+        moment += timedelta(seconds=random.randint(1, 90), microseconds=random.randint(0, 999999))
+        role = "user" if i % 2 else "assistant"
+        texts = USER_TEXTS if role == "user" else ASSISTANT_TEXTS
+        history.append({"role": role, "content": random.choice(texts), "timestamp": moment.isoformat()})
+
+    return {
+        "session_id": "7c9e6679-7425-40de-944b-e07fc1f90ae7",
+        "created_at": datetime(2024, 5, 10, 9, 30).isoformat(),
+        "state": "awaiting_followup",
+        "conversation_history": history,
+        "client_info": {
+            "sucesso": True, "tipo": "cpf", "valor": "12345678900",
+            "dados": {"nome": "João da Silva", "cpf": "12345678900", "status": "Em andamento",
+                      "veiculo": {"modelo": "Honda Civic", "placa": "ABC1234", "ano": "2020"}}
+        },
+        "escalation_info": None
+    }
+
+
+def measure(serializer, data, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        raw = serializer.dumps(data)
+    encode = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serializer.loads(raw)
+    decode = (time.perf_counter() - start) / repeat
+    return len(raw), encode, decode
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    json_serializer = get_serializer("json")
+    binary_serializer = get_serializer("binary")
+
+    print(f"{'mensagens':>9s}  {'formato':8s} {'bytes':>9s} {'codificar (us)':>15s} {'decodificar (us)':>17s}")
+    for size in SIZES:
+        data = build_session(size)
+        assert binary_serializer.loads(binary_serializer.dumps(data)) == data
+        assert binary_serializer.loads(json_serializer.dumps(data)) == data
+
+        rounds = max(5, repeat * 10 // size)
+        for serializer in (json_serializer, binary_serializer):
+            length, encode, decode = measure(serializer, data, rounds)
+            print(f"{size:9d}  {serializer.name:8s} {length:9d} {encode * 1e6:15.1f} {decode * 1e6:17.1f}")
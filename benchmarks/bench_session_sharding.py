@@ -0,0 +1,126 @@
+"""
+Benchmark: distribuição de sessões entre shards por hash consistente.
+
+- Uniformidade da distribuição de chaves entre os shards
+- Fração de chaves movidas ao incluir/remover um shard (hash consistente
+  contra hash módulo N)
+- Inclusão e remoção de shards (SQLite e memória) com workers atendendo
+  turnos ao mesmo tempo, seguidas de rebalance(): confere que nenhuma
+  mensagem se perdeu e que toda chave terminou no shard responsável
+
+Executar com: python benchmarks/bench_session_sharding.py [chaves]
+"""
+
+import hashlib
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import get_serializer
+from src.core.session_store import MemorySessionStore
+from src.core.sharded_session_store import ConsistentHashRing, create_sharded_store
+from src.core.sqlite_session_store import SQLiteSessionStore
+
+
+def distribution(keys, shards, vnodes):
+    ring = ConsistentHashRing([f"shard-{i}" for i in range(shards)], vnodes)
+    counts = {}
+    for key in keys:
+        node = ring.node_for(key)
+        counts[node] = counts.get(node, 0) + 1
+    values = list(counts.values())
+    return statistics.pstdev(values) / statistics.mean(values), max(values) / statistics.mean(values)
+
+
+def movement(keys, shards):
+    before = ConsistentHashRing([f"shard-{i}" for i in range(shards)])
+    after = before.copy()
+    after.add_node(f"shard-{shards}")
+    ring_moved = sum(1 for key in keys if before.node_for(key) != after.node_for(key))
+
+    def modulo(key, n):
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big") % n
+    modulo_moved = sum(1 for key in keys if modulo(key, shards) != modulo(key, shards + 1))
+    return ring_moved / len(keys), modulo_moved / len(keys)
+
+
+def live_resharding(label, make_store, workers=8, users=200, turns=150):
+    """Turnos concorrentes enquanto um shard é incluído e outro removido"""
+    stores = {f"{label}-{i}": make_store(i) for i in range(3)}
+    sharded = create_sharded_store(stores)
+    sent = {f"5511{u:09d}": [] for u in range(users)}
+    locks = {user_id: threading.Lock() for user_id in sent}
+    stop = threading.Event()
+
+    def worker(index):
+        manager = SessionManager(sharded, history_window=6, archive_batch=4, serializer=get_serializer("binary"))
+        turn = 0
+        while not stop.is_set() and turn < turns:
+            user_id = list(sent)[(index * 7919 + turn * 31) % users]
+            text = f"mensagem {index}-{turn}"
+            # Um turno por usuário de cada vez (roteamento fixo), para isolar o efeito do resharding
+            with locks[user_id]:
+                session = manager.get_session("whatsapp", user_id)
+                session.add_message("user", text)
+                manager.commit_session(session)
+                sent[user_id].append(text)
+            turn += 1
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    time.sleep(0.2)
+    sharded.add_shard(f"{label}-3", make_store(3))
+    first = sharded.rebalance()
+    sharded.remove_shard(f"{label}-0")
+    second = sharded.rebalance()
+    for thread in threads:
+        thread.join()
+
+    checker = SessionManager(sharded, serializer=get_serializer("binary"))
+    lost = 0
+    for user_id, texts in sent.items():
+        recorded = {m["content"] for m in checker.get_session("whatsapp", user_id).get_full_history()}
+        lost += sum(1 for text in texts if text not in recorded)
+
+    misplaced = sum(
+        1 for name, store in sharded.shards.items()
+        for key in store.scan_keys() if sharded.shard_for(key) != name
+    )
+    leftover = sum(1 for _ in stores[f"{label}-0"].scan_keys())
+    turns_done = sum(len(texts) for texts in sent.values())
+    sharded.close()
+    stores[f"{label}-0"].close()
+    return turns_done, first, second, lost, misplaced, leftover, sharded.migrated
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    keys = [f"session:whatsapp:5511{i:09d}" for i in range(count)]
+
+    for vnodes in (1, 16, 160):
+        cv, peak = distribution(keys, 4, vnodes)
+        print(f"4 shards, {vnodes:3d} nós virtuais: desvio {cv * 100:5.1f}%  shard mais cheio {peak:.2f}x a média")
+
+    ring_moved, modulo_moved = movement(keys, 4)
+    print(f"Inclusão do 5º shard: hash consistente move {ring_moved * 100:.1f}% das chaves, "
+          f"módulo N move {modulo_moved * 100:.1f}%")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        scenarios = [
+            ("sqlite", lambda i: SQLiteSessionStore(os.path.join(tmp, f"sessions-{i}.db"))),
+            ("memory", lambda i: MemorySessionStore(sweep_interval=0)),
+        ]
+        for label, factory in scenarios:
+            done, first, second, lost, misplaced, leftover, migrated = live_resharding(label, factory)
+            print(f"{label:6s}: {done} turnos durante a inclusão e a remoção de shards; "
+                  f"rebalance moveu {first['moved']}/{first['scanned']} e {second['moved']}/{second['scanned']} chaves; "
+                  f"{migrated} migradas no total; {lost} mensagens perdidas; {misplaced} chaves fora do dono; "
+                  f"{leftover} restantes no shard removido")
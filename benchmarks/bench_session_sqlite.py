@@ -0,0 +1,147 @@
+"""
+Benchmark: gravações de sessão por segundo no SQLite (modo WAL) com vários
+workers, comparando um commit por gravação (conexão única protegida por lock)
+com os commits em grupo do SQLiteSessionStore.
+
+Também executa turnos completos do SessionManager sobre o SQLiteSessionStore,
+confere as sessões relidas de um novo processo (nova instância sobre o mesmo
+arquivo) e mede a remoção de sessões expiradas pelo índice de expiração.
+
+Executar com: python benchmarks/bench_session_sqlite.py [threads] [gravações_por_thread]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import get_serializer
+from src.core.sqlite_session_store import SQLiteSessionStore
+
+VALUE = os.urandom(1500)
+
+
+class PerWriteCommitStore:
+    """Referência: uma conexão compartilhada e um commit (transação) por gravação"""
+
+    def __init__(self, path, synchronous):
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={synchronous}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+            "version INTEGER, expires_at REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+
+    def setex(self, key, ttl, value):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, value, version, expires_at) VALUES (?, ?, NULL, ?)",
+                (key, value, time.time() + ttl)
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def run_writes(store, threads, writes):
+    def worker(index):
+        for i in range(writes):
+            store.setex(f"session:whatsapp:{index}:{i % 50}", 3600, VALUE)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return threads * writes / (time.perf_counter() - start)
+
+
+def run_turns(path, threads, turns):
+    store = SQLiteSessionStore(path)
+    committed = {}
+
+    def worker(index):
+        manager = SessionManager(store, serializer=get_serializer("binary"))
+        for turn in range(turns):
+            user_id = f"5511{index:05d}{turn % 10:04d}"
+            session = manager.get_session("whatsapp", user_id)
+            session.add_message("user", f"mensagem {turn}")
+            session.add_message("assistant", f"resposta {turn}")
+            manager.commit_session(session)
+            committed[user_id] = session.get_full_history()
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    stats = store.stats()
+    store.close()
+
+    # Nova instância sobre o mesmo arquivo (simula reinício do processo)
+    reopened = SQLiteSessionStore(path)
+    checker = SessionManager(reopened, serializer=get_serializer("binary"))
+    mismatches = sum(
+        1 for user_id, history in committed.items()
+        if checker.get_session("whatsapp", user_id).get_full_history() != history
+    )
+    reopened.close()
+    return threads * turns / elapsed, stats, mismatches, len(committed)
+
+
+def run_sweep(path, sessions):
+    store = SQLiteSessionStore(path, sweep_interval=0)
+    for start in range(0, sessions, 1000):
+        threads = [
+            threading.Thread(target=store.setex, args=(f"expired:{i}", 0.01, VALUE))
+            for i in range(start, min(start + 1000, sessions))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    store.setex("alive", 3600, VALUE)
+    time.sleep(0.05)
+
+    start = time.perf_counter()
+    store._sweep()
+    elapsed = time.perf_counter() - start
+    purged, remaining = store.purged, len(store)
+    store.close()
+    return purged, remaining, elapsed
+
+
+if __name__ == "__main__":
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for synchronous in ("NORMAL", "FULL"):
+            baseline = PerWriteCommitStore(os.path.join(tmp, f"baseline-{synchronous}.db"), synchronous)
+            rate = run_writes(baseline, threads, writes)
+            baseline.close()
+            print(f"{synchronous:6s} commit por gravação: {rate:10,.0f} gravações/s ({threads} threads)")
+
+            grouped = SQLiteSessionStore(os.path.join(tmp, f"grouped-{synchronous}.db"), synchronous=synchronous)
+            rate = run_writes(grouped, threads, writes)
+            stats = grouped.stats()
+            grouped.close()
+            print(f"{synchronous:6s} commits em grupo   : {rate:10,.0f} gravações/s ({threads} threads, "
+                  f"{stats['batches']} commits, média {stats['avg_batch']} gravações/commit)")
+
+        rate, stats, mismatches, users = run_turns(os.path.join(tmp, "turns.db"), threads, 100)
+        print(f"Turnos SessionManager      : {rate:10,.0f} turnos/s (média {stats['avg_batch']} gravações/commit), "
+              f"{mismatches}/{users} sessões divergentes após reabrir")
+
+        purged, remaining, elapsed = run_sweep(os.path.join(tmp, "sweep.db"), 20000)
+        print(f"Limpeza de expiradas       : {purged} removidas em {elapsed * 1000:.1f} ms, {remaining} restante(s)")
@@ -0,0 +1,92 @@
+"""
+Microbenchmark: ingestão de webhooks do WhatsApp
+Compara o caminho antigo (dupla decodificação + json.dumps para log) com o
+WebhookIngestor (assinatura HMAC pré-computada + decodificação única).
+
+Executar com: python benchmarks/bench_webhook_ingestion.py [iterações]
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.channels.whatsapp.ingestion import WebhookIngestor, json_loads
+
+APP_SECRET = "bench-secret"
+
+
+def make_payload(messages=1, statuses=0):
+    """Monta payload de webhook com N mensagens e N status de entrega"""
+    value = {"messaging_product": "whatsapp", "metadata": {"phone_number_id": "123"}}
+    if messages:
+        value["messages"] = [
+            {
+                "from": f"55119{i:08d}",
+                "id": f"wamid.HBgM{i:020d}",
+                "timestamp": "1700000000",
+                "type": "text",
+                "text": {"body": "Qual a previsão de conclusão do meu serviço?"}
+            }
+            for i in range(messages)
+        ]
+    if statuses:
+        value["statuses"] = [
+            {"id": f"wamid.ST{i:020d}", "status": "delivered", "timestamp": "1700000000",
+             "recipient_id": f"55119{i:08d}"}
+            for i in range(statuses)
+        ]
+    payload = {
+        "object": "whatsapp_business_account",
+        "entry": [{"id": "1", "changes": [{"field": "messages", "value": value}]}]
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+def legacy_ingest(body):
+    """Caminho antigo do receive_webhook (sem verificação de assinatura)"""
+    payload = json.loads(body)
+    json.dumps(payload)
+    found = []
+    if payload.get("object") == "whatsapp_business_account":
+        for entry in payload.get("entry", []):
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+                if "messages" in value:
+                    for message in value["messages"]:
+                        if "text" in message:
+                            found.append((message.get("from"), message.get("id"), message["text"]["body"]))
+    return found
+
+
+def legacy_signature(body):
+    """Verificação de assinatura recriando o HMAC a cada chamada"""
+    return "sha256=" + hmac.new(APP_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    ingestor = WebhookIngestor(app_secret=APP_SECRET)
+
+    print(f"Decodificador JSON: {json_loads.__module__}")
+    cases = [
+        ("1 mensagem", make_payload(messages=1)),
+        ("100 mensagens + 100 status", make_payload(messages=100, statuses=100)),
+        ("somente status (20)", make_payload(messages=0, statuses=20)),
+    ]
+    for name, body in cases:
+        signature = legacy_signature(body)
+        old = bench(lambda: (legacy_signature(body), legacy_ingest(body)), iterations)
+        new = bench(lambda: ingestor.ingest(body, signature), iterations)
+        print(f"{name:28s} ({len(body):6d} bytes): antigo {old:9.1f} us  novo {new:9.1f} us  ({old / new:.1f}x)")
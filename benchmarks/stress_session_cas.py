@@ -0,0 +1,111 @@
+"""
+Teste de estresse: vários workers (threads, cada uma com seu SessionManager)
+atendendo os mesmos usuários sem roteamento fixo, com e sem a gravação
+condicional por versão (compare-and-set) das sessões.
+
+Cada turno envia uma mensagem única; ao final, o histórico completo de cada
+usuário (arquivo + janela recente) é conferido e as mensagens perdidas por
+gravações sobrepostas são contadas. Com compare-and-set, o conflito faz o
+ActionOrchestrator reaplicar as alterações do turno sobre a versão atual
+(sem repetir as ações) e nenhuma mensagem pode se perder.
+
+Executar com: python benchmarks/stress_session_cas.py [workers] [usuários] [turnos_por_worker]
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.orchestrator import ActionOrchestrator
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_manager import SessionConflictError, SessionManager
+from src.core.service_registry import ServiceRegistry
+from src.core.session_serializer import get_serializer
+from src.core.session_store import MemorySessionStore
+from src.services.mocks.redis_mock import RedisMock
+from src.utils.metrics import SESSION_CONFLICTS_TOTAL
+
+
+class UnversionedStore:
+    """Armazenamento sem compare_and_set: a última gravação vence (comportamento anterior)"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.store.setex(key, ttl, value)
+
+    def delete(self, key):
+        self.store.delete(key)
+
+
+class SlowOrchestrator(ActionOrchestrator):
+    """Simula a latência de Fusion/OpenAI entre a leitura e a gravação da sessão"""
+
+    def _execute_action(self, action, session):
+        time.sleep(random.uniform(0, 0.003))
+        return super()._execute_action(action, session)
+
+
+def run(store, workers, users, turns):
+    registry = ServiceRegistry()
+    sent = {f"5511{u:09d}": [] for u in range(users)}
+    sent_lock = threading.Lock()
+    failures = []
+
+    def worker(index):
+        manager = SessionManager(store, history_window=6, archive_batch=4, serializer=get_serializer("binary"))
+        orchestrator = SlowOrchestrator(manager, registry, max_attempts=100)
+        for turn in range(turns):
+            user_id = random.choice(list(sent))
+            text = f"mensagem {index}-{turn}"
+            try:
+                orchestrator.process_input(text, "whatsapp", user_id)
+            except SessionConflictError:
+                failures.append(text)
+                continue
+            with sent_lock:
+                sent[user_id].append(text)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    conflicts = SESSION_CONFLICTS_TOTAL.value()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    conflicts = SESSION_CONFLICTS_TOTAL.value() - conflicts
+
+    checker = SessionManager(store, serializer=get_serializer("binary"))
+    lost = 0
+    for user_id, texts in sent.items():
+        history = checker.get_session("whatsapp", user_id).get_full_history()
+        recorded = {m["content"] for m in history if m["role"] == "user"}
+        lost += sum(1 for text in texts if text not in recorded)
+
+    delivered = sum(len(texts) for texts in sent.values())
+    return delivered, lost, conflicts, len(failures), elapsed
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    turns = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+
+    scenarios = [
+        ("Memória sem versão", lambda: UnversionedStore(MemorySessionStore(sweep_interval=0))),
+        ("Memória com CAS", lambda: MemorySessionStore(sweep_interval=0)),
+        ("Redis com CAS", lambda: RedisSessionStore(client=RedisMock())),
+    ]
+    for label, factory in scenarios:
+        delivered, lost, conflicts, failed, elapsed = run(factory(), workers, users, turns)
+        print(f"{label:20s}: {delivered} turnos concluídos  {lost} mensagens perdidas  "
+              f"{conflicts} conflitos reaplicados  {failed} turnos desistidos  {elapsed:.1f}s")
@@ -0,0 +1,55 @@
+"""
+Exportação das sessões para relatórios (NDJSON ou CSV), lidas em lotes do
+armazenamento configurado no secrets.toml (session_backend "sqlite" ou
+"redis"; sessões em memória só existem dentro do processo do gateway).
+
+As leituras não renovam a expiração das sessões e a memória usada não
+depende do número de sessões.
+
+Executar com: python export_sessions.py --format csv --output sessoes.csv [--channel whatsapp]
+"""
+
+import argparse
+import logging
+import sys
+from src.channels.whatsapp.container import GatewayContainer
+from src.core.session_export import export_sessions
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import get_serializer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportação das sessões para relatórios")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--output", default="-", help="Arquivo de saída ('-' = saída padrão)")
+    parser.add_argument("--channel", default=None, help="Apenas sessões deste canal")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chaves lidas por vez do armazenamento")
+    parser.add_argument("--window-only", action="store_true",
+                        help="Conta os turnos só na janela recente (não lê o histórico arquivado)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr)
+
+    container = GatewayContainer()
+    store = container.build_session_store()
+    manager = SessionManager(store, serializer=get_serializer(container.settings.get("session_format", "json")))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        count = export_sessions(
+            manager,
+            output,
+            output_format=args.format,
+            batch_size=args.batch_size,
+            channel=args.channel,
+            full_history=not args.window_only
+        )
+        print(f"{count} sessões exportadas", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Gerador de carga para o gateway WhatsApp.
+
+Simula N clientes seguindo roteiros de conversa realistas
+(identificador -> pergunta de status -> pedido de atendente), enviando
+webhooks assinados ao gateway e medindo a latência ponta a ponta de cada
+turno (do POST do webhook até a resposta chegar na Graph API simulada).
+
+Uso:
+    1. python loadtest/run_loadtest.py --print-config > .streamlit/secrets.toml
+    2. uvicorn whatsapp_server:app --port 8000
+    3. python loadtest/run_loadtest.py --customers 200 --rounds 2
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from standins import DEFAULT_PORTS, LatencyProfile, gateway_secrets, start_standins
+
+# Roteiros de conversa (peso, mensagens); {cpf}/{placa} são preenchidos por cliente
+SCRIPTS = [
+    (5, ["{cpf}", "qual a previsão de conclusão?", "quero falar com um atendente"]),
+    (3, ["{cpf}", "qual o status do meu serviço?", "obrigado"]),
+    (2, ["{placa}", "a peça utilizada é original?", "qual a loja mais próxima?"]),
+]
+
+
+class ReplyTracker:
+    """Recebe da Graph API simulada o instante de cada resposta por destinatário"""
+
+    def __init__(self):
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def queue_for(self, recipient):
+        with self._lock:
+            return self._queues.setdefault(recipient, queue.Queue())
+
+    def on_message(self, recipient, at):
+        self.queue_for(recipient).put(at)
+
+
+class LoadTest:
+    """Executa os roteiros de conversa e agrega os resultados"""
+
+    def __init__(self, gateway_url, app_secret, tracker, reply_timeout=30.0, think_time=1.0):
+        self.webhook_url = gateway_url.rstrip("/") + "/webhook"
+        self.app_secret = app_secret.encode("utf-8")
+        self.tracker = tracker
+        self.reply_timeout = reply_timeout
+        self.think_time = think_time
+
+        self.latencies = []
+        self.timeouts = 0
+        self.webhook_errors = 0
+        self._lock = threading.Lock()
+        self._message_seq = 0
+
+    def _webhook_body(self, sender, text):
+        """Monta o payload de webhook de uma mensagem de texto"""
+        with self._lock:
+            self._message_seq += 1
+            message_id = f"wamid.loadtest.{self._message_seq}.{random.getrandbits(32)}"
+
+        payload = {
+            "object": "whatsapp_business_account",
+            "entry": [{
+                "id": "loadtest",
+                "changes": [{
+                    "field": "messages",
+                    "value": {
+                        "messaging_product": "whatsapp",
+                        "metadata": {"phone_number_id": "100000000000"},
+                        "contacts": [{"wa_id": sender}],
+                        "messages": [{
+                            "from": sender,
+                            "id": message_id,
+                            "timestamp": str(int(time.time())),
+                            "type": "text",
+                            "text": {"body": text}
+                        }]
+                    }
+                }]
+            }]
+        }
+        return json.dumps(payload).encode("utf-8")
+
+    def _post(self, body):
+        signature = "sha256=" + hmac.new(self.app_secret, body, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(
+            self.webhook_url,
+            data=body,
+            headers={"Content-Type": "application/json", "X-Hub-Signature-256": signature},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.reply_timeout) as response:
+            return response.status
+
+    def run_customer(self, index, rounds):
+        """Executa 'rounds' conversas de um cliente simulado"""
+        sender = f"55119{index:08d}"
+        cpf = f"{90000000000 + index:011d}"
+        placa = f"LTS{index % 10000:04d}"
+        replies = self.tracker.queue_for(sender)
+
+        for _ in range(rounds):
+            script = random.choices([s for _, s in SCRIPTS], weights=[w for w, _ in SCRIPTS])[0]
+            for template in script:
+                text = template.format(cpf=cpf, placa=placa)
+
+                # Descartar respostas atrasadas de turnos anteriores
+                while not replies.empty():
+                    replies.get_nowait()
+
+                started = time.monotonic()
+                try:
+                    status = self._post(self._webhook_body(sender, text))
+                    if status != 200:
+                        raise RuntimeError(f"status {status}")
+                except Exception:
+                    with self._lock:
+                        self.webhook_errors += 1
+                    continue
+
+                try:
+                    replied_at = replies.get(timeout=self.reply_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    continue
+
+                with self._lock:
+                    self.latencies.append(replied_at - started)
+
+                time.sleep(random.uniform(0, 2 * self.think_time))
+
+
+def percentile(values, pct):
+    """Percentil por posição mais próxima (valores já ordenados)"""
+    if not values:
+        return 0.0
+    rank = max(0, min(len(values) - 1, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do gateway WhatsApp")
+    parser.add_argument("--gateway", default="http://127.0.0.1:8000")
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=1, help="Conversas por cliente")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Tempo (s) para iniciar todos os clientes")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Pausa média (s) entre turnos")
+    parser.add_argument("--reply-timeout", type=float, default=30.0)
+    parser.add_argument("--app-secret", default="loadtest-secret")
+    parser.add_argument("--fusion", default="80,300,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--openai", default="600,2000,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--graph", default="40,150,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--print-config", action="store_true",
+                        help="Imprime o secrets.toml que aponta o gateway para os servidores simulados")
+    args = parser.parse_args()
+
+    if args.print_config:
+        class _Url:
+            def __init__(self, port):
+                self.url = f"http://127.0.0.1:{port}"
+        print(gateway_secrets({name: _Url(port) for name, port in DEFAULT_PORTS.items()}, args.app_secret))
+        return
+
+    tracker = ReplyTracker()
+    servers = start_standins(
+        LatencyProfile.parse(args.fusion),
+        LatencyProfile.parse(args.openai),
+        LatencyProfile.parse(args.graph),
+        on_message=tracker.on_message
+    )
+
+    test = LoadTest(args.gateway, args.app_secret, tracker, args.reply_timeout, args.think_time)
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.customers) as pool:
+        for index in range(args.customers):
+            pool.submit(test.run_customer, index, args.rounds)
+            time.sleep(args.ramp / max(1, args.customers))
+    elapsed = time.monotonic() - started
+
+    for server in servers.values():
+        server.stop()
+
+    latencies = sorted(test.latencies)
+    print(f"Clientes: {args.customers}  Conversas por cliente: {args.rounds}  Duração: {elapsed:.1f}s")
+    print(f"Turnos concluídos: {len(latencies)}  Timeouts: {test.timeouts}  Erros no webhook: {test.webhook_errors}")
+    print(f"Vazão: {len(latencies) / elapsed:.1f} turnos/s")
+    print(
+        f"Latência ponta a ponta (ms): p50 {percentile(latencies, 50) * 1000:.0f}  "
+        f"p95 {percentile(latencies, 95) * 1000:.0f}  p99 {percentile(latencies, 99) * 1000:.0f}  "
+        f"máx {(latencies[-1] if latencies else 0) * 1000:.0f}"
+    )
+    for name, server in servers.items():
+        print(f"{name:7s}: {server.requests} requisições, {server.errors} erros simulados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Servidores locais que simulam as dependências externas do gateway:
+- API Fusion:   GET  /api/status/{id_type}/{identifier}
+- OpenAI:       POST /v1/chat/completions
+- Graph API:    POST /{versao}/{phone_number_id}/messages
+
+Cada servidor tem latência (log-normal) e taxa de erro configuráveis.
+Executar isoladamente com: python loadtest/standins.py
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LatencyProfile:
+    """Distribuição de latência (log-normal) e de erros de um servidor simulado"""
+
+    def __init__(self, median_ms=50.0, p99_ms=None, error_rate=0.0, error_status=500):
+        """
+        Args:
+            median_ms (float): Latência mediana (ms)
+            p99_ms (float): Latência no percentil 99 (padrão: 4x a mediana)
+            error_rate (float): Fração de requisições respondidas com erro (0.0 a 1.0)
+            error_status (int): Status HTTP das respostas de erro
+        """
+        self.median_ms = median_ms
+        self.p99_ms = p99_ms or median_ms * 4
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # z(0.99) = 2.326: sigma tal que mediana * e^(2.326 * sigma) = p99
+        self.sigma = math.log(self.p99_ms / self.median_ms) / 2.326 if self.median_ms > 0 else 0.0
+
+    @classmethod
+    def parse(cls, spec):
+        """Converte 'mediana,p99,taxa_erro' (ex: '80,400,0.01') em LatencyProfile"""
+        parts = [float(p) for p in spec.split(",")]
+        return cls(*parts[:3])
+
+    def delay(self):
+        """Sorteia uma latência em segundos"""
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms), self.sigma) / 1000.0
+
+    def should_fail(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Servidor HTTP em thread própria com perfil de latência"""
+
+    daemon_threads = True
+    # Rajadas de conexões simultâneas sem estourar a fila de listen (padrão 5)
+    request_queue_size = 128
+
+    def __init__(self, handler_class, profile, port=0):
+        super().__init__(("127.0.0.1", port), handler_class)
+        self.profile = profile
+        self.on_message = None
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def count(self, error=False):
+        with self._lock:
+            self.requests += 1
+            if error:
+                self.errors += 1
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Base: aplica latência/erros do perfil e responde JSON"""
+
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo são escritos separadamente: sem TCP_NODELAY, conexões
+    # keep-alive esperariam o ACK atrasado (~40 ms) a cada resposta
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self):
+        """Aplica a latência e decide se a requisição falha"""
+        profile = self.server.profile
+        time.sleep(profile.delay())
+        if profile.should_fail():
+            self.server.count(error=True)
+            self._reply(profile.error_status, {"error": "simulated failure"})
+            return False
+        self.server.count()
+        return True
+
+
+class FusionHandler(_StandInHandler):
+    """
+    API Fusion: base sintética de clientes em que todos os identificadores de
+    um atendimento (cpf, telefone, ordem, placa, chassi) levam ao mesmo
+    cliente; identificadores com NOT_FOUND_PREFIX não existem (404)
+    """
+
+    STATUS_PATH = re.compile(r"^/api/status/(\w+)/(\w+)$")
+    STATUSES = ["Em andamento", "Agendado", "Concluído"]
+    # Identificadores sem atendimento (resposta 404)
+    NOT_FOUND_PREFIX = "000"
+    LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+    def do_GET(self):
+        match = self.STATUS_PATH.match(self.path)
+        if not match:
+            # Raiz da API (usada como verificação de disponibilidade)
+            self._reply(200, {"status": "ok"})
+            return
+
+        if not self._simulate():
+            return
+
+        id_type, identifier = match.groups()
+        if identifier.startswith(self.NOT_FOUND_PREFIX):
+            self._reply(404, {"error": "not found"})
+            return
+
+        self._reply(200, self.customer(self.customer_number(id_type, identifier)))
+
+    @classmethod
+    def customer_number(cls, id_type, identifier):
+        """Número do cliente a partir de qualquer um dos seus identificadores"""
+        try:
+            if id_type == "placa":
+                letters = identifier[:3].upper()
+                n = sum(cls.LETTERS.index(c) * 26 ** (2 - i) for i, c in enumerate(letters))
+                return n * 10000 + int(identifier[3:])
+            return int(re.sub(r"\D", "", identifier)[-8:])
+        except ValueError:
+            return sum(ord(c) for c in identifier)
+
+    @classmethod
+    def customer(cls, n):
+        """Atendimento do cliente n"""
+        letters = "".join(cls.LETTERS[(n // 10000) // 26 ** (2 - i) % 26] for i in range(3))
+        return {
+            "nome": f"Cliente {n}",
+            "cpf": f"123{n:08d}",
+            "telefone": f"119{n:08d}",
+            "ordem": f"ORD{n:08d}",
+            "status": cls.STATUSES[n % len(cls.STATUSES)],
+            "tipo_servico": "Troca de Parabrisa",
+            "veiculo": {
+                "modelo": "Honda Civic",
+                "placa": f"{letters}{n % 10000:04d}",
+                "ano": "2020",
+                "chassi": f"9BRBLWHEX{n:08d}"
+            }
+        }
+
+
+class OpenAIHandler(_StandInHandler):
+    """Endpoint de chat completions com resposta fixa"""
+
+    def do_POST(self):
+        self._read_body()
+        if not self._simulate():
+            return
+        self._reply(200, {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Seu serviço está em andamento e deve ser concluído hoje."},
+                "finish_reason": "stop"
+            }]
+        })
+
+
+class GraphHandler(_StandInHandler):
+    """Graph API /messages: registra o horário de cada mensagem enviada"""
+
+    def do_POST(self):
+        body = self._read_body()
+        if not self._simulate():
+            return
+
+        try:
+            recipient = json.loads(body).get("to")
+        except ValueError:
+            recipient = None
+        if recipient and self.server.on_message is not None:
+            self.server.on_message(recipient, time.monotonic())
+
+        self._reply(200, {
+            "messaging_product": "whatsapp",
+            "contacts": [{"input": recipient, "wa_id": recipient}],
+            "messages": [{"id": f"wamid.standin.{time.monotonic_ns()}"}]
+        })
+
+
+# Portas padrão, fixas para que o gateway possa ser configurado antes do teste
+DEFAULT_PORTS = {"fusion": 9101, "openai": 9102, "graph": 9103}
+
+
+def start_standins(fusion=None, openai=None, graph=None, on_message=None, ports=None):
+    """
+    Inicia os três servidores simulados
+
+    Args:
+        fusion, openai, graph (LatencyProfile): Perfis de cada servidor
+        on_message: Função chamada com (destinatário, instante) a cada envio na Graph API
+        ports (dict): Portas por servidor (padrão: DEFAULT_PORTS; 0 = porta livre)
+
+    Returns:
+        dict: Servidores por nome ('fusion', 'openai', 'graph')
+    """
+    ports = ports or DEFAULT_PORTS
+    servers = {
+        "fusion": StandInServer(FusionHandler, fusion or LatencyProfile(80), ports["fusion"]),
+        "openai": StandInServer(OpenAIHandler, openai or LatencyProfile(600, 2000), ports["openai"]),
+        "graph": StandInServer(GraphHandler, graph or LatencyProfile(40), ports["graph"])
+    }
+    servers["graph"].on_message = on_message
+    for server in servers.values():
+        server.start()
+    return servers
+
+
+def gateway_secrets(servers, app_secret):
+    """Trecho de .streamlit/secrets.toml que aponta o gateway para os servidores simulados"""
+    return (
+        "[api]\n"
+        'environment = "hml"\n'
+        f'base_url_hml = "{servers["fusion"].url}/api"\n\n'
+        "[openai]\n"
+        'api_key = "sk-standin"\n'
+        f'api_endpoint = "{servers["openai"].url}/v1/chat/completions"\n\n'
+        "[whatsapp]\n"
+        'api_token = "standin-token"\n'
+        'phone_number_id = "100000000000"\n'
+        f'api_base_url = "{servers["graph"].url}"\n'
+        f'app_secret = "{app_secret}"\n'
+        "rate_limit = 1000\n"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidores simulados de Fusion, OpenAI e Graph API")
+    parser.add_argument("--fusion", default="80,300,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--openai", default="600,2000,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--graph", default="40,150,0", help="mediana_ms,p99_ms,taxa_erro")
+    parser.add_argument("--app-secret", default="loadtest-secret")
+    args = parser.parse_args()
+
+    servers = start_standins(
+        LatencyProfile.parse(args.fusion),
+        LatencyProfile.parse(args.openai),
+        LatencyProfile.parse(args.graph)
+    )
+    print(gateway_secrets(servers, args.app_secret))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for server in servers.values():
+            server.stop()
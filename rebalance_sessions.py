@@ -0,0 +1,48 @@
+"""
+Rebalanceamento das sessões entre shards (SQLite ou Redis) após incluir ou
+remover um shard.
+
+Procedimento:
+1. No secrets.toml, informar a nova lista de shards (sqlite_shards ou
+   [redis] shard_urls) e a lista anterior (sqlite_previous_shards ou
+   [redis] previous_shard_urls) e reiniciar o gateway: as sessões acessadas
+   que mudaram de shard são migradas no primeiro acesso. Os shards são
+   identificados pelo nome (name); para remover um shard que não seja o
+   último da lista, todos precisam de nome.
+2. Executar este script para mover as demais (pode rodar com o gateway ativo).
+3. Remover a lista anterior do secrets.toml e reiniciar o gateway.
+
+Executar com: python rebalance_sessions.py [--batch-size 500]
+"""
+
+import argparse
+import logging
+from src.channels.whatsapp.container import GatewayContainer
+from src.core.sharded_session_store import ShardedSessionStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebalanceamento das sessões entre shards")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chaves lidas por vez em cada shard")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    container = GatewayContainer()
+    store = container.build_session_store()
+    try:
+        if not isinstance(store, ShardedSessionStore):
+            print("Apenas um shard configurado: nada a rebalancear")
+            return
+
+        result = store.rebalance(batch_size=args.batch_size)
+        print(f"Shards: {', '.join(store.ring.nodes)}")
+        print(f"Chaves verificadas: {result['scanned']}  movidas: {result['moved']}")
+        if result["retired"]:
+            print(f"Shards esvaziados (podem ser desligados): {', '.join(result['retired'])}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,419 @@
+import logging
+import os
+from urllib.parse import urlsplit
+from src.core.orchestrator import ActionOrchestrator
+from src.core.session_manager import SessionManager
+from src.core.service_registry import ServiceRegistry
+from src.core.session_store import MemorySessionStore
+from src.core.session_serializer import get_serializer
+from src.core.session_cache import SessionNearCache
+from src.channels.whatsapp.dispatcher import MessageDispatcher
+from src.channels.whatsapp.dedup import MessageDeduplicator
+from src.channels.whatsapp.ingestion import WebhookIngestor
+from src.utils.metrics import metrics, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def load_gateway_settings():
+    """
+    Carrega configurações do gateway a partir do secrets (seção [gateway])
+
+    Returns:
+        dict: Configurações do gateway (vazio se não houver secrets)
+    """
+    try:
+        import streamlit as st
+        return dict(st.secrets.get("gateway", {}))
+    except Exception as e:
+        logger.warning(f"Não foi possível carregar configurações do gateway: {str(e)}")
+        return {}
+
+
+def _shard_location(spec):
+    """Endereço do shard sem credenciais (host, porta e banco; ou caminho do arquivo)"""
+    parsed = urlsplit(spec)
+    if parsed.scheme:
+        return (parsed.scheme, parsed.hostname, parsed.port, parsed.path)
+    return os.path.abspath(spec)
+
+
+class GatewayContainer:
+    """
+    Container de aplicação do gateway WhatsApp.
+    Constrói registro de serviços, gerenciador de sessões e clientes HTTP
+    uma única vez por processo e os compartilha entre as requisições.
+    """
+
+    def __init__(self, registry=None, settings=None):
+        """
+        Inicializa o container (sem construir os serviços)
+
+        Args:
+            registry: ServiceRegistry pré-construído (opcional, útil para testes)
+            settings (dict): Configurações do gateway (opcional)
+        """
+        self.settings = settings if settings is not None else load_gateway_settings()
+        self.registry = registry
+        self.session_manager = None
+        self.orchestrator = None
+        self.whatsapp_service = None
+        self.dispatcher = None
+        self.deduplicator = None
+        self.ingestor = None
+        self.session_store = None
+        self.started = False
+
+    @property
+    def ingestion_mode(self):
+        """Modo de ingestão: 'queue' (processamento em segundo plano) ou 'inline'"""
+        return self.settings.get("ingestion_mode", "queue")
+
+    def startup(self):
+        """Constrói os serviços compartilhados (chamado no início do lifespan)"""
+        if self.started:
+            return self
+
+        if self.registry is None:
+            self.registry = ServiceRegistry()
+
+        storage = self.registry.get("storage_client")
+        if storage is None:
+            self.session_store = self.build_session_store()
+            storage = self.session_store
+            self.registry.register("storage_client", storage)
+
+        self.session_manager = SessionManager(
+            storage,
+            history_window=int(self.settings.get("history_window", 20)),
+            archive_batch=int(self.settings.get("archive_batch", 10)),
+            serializer=get_serializer(self.settings.get("session_format", "json")),
+            near_cache=self._build_near_cache(storage)
+        )
+        self.orchestrator = ActionOrchestrator(
+            self.session_manager,
+            self.registry,
+            max_attempts=int(self.settings.get("session_conflict_attempts", 3))
+        )
+        self.whatsapp_service = self._build_whatsapp_service()
+
+        # Cache da API Fusion compartilhado entre os processos, se configurado
+        attach_shared_cache = getattr(self.registry.get("fusion_api"), "attach_shared_cache", None)
+        if attach_shared_cache is not None:
+            attach_shared_cache(storage)
+
+        self.ingestor = WebhookIngestor()
+
+        # Armazenamento compartilhado só é usado se configurado (vários processos)
+        shared_store = None
+        if self.settings.get("dedup_backend") == "shared":
+            self._check_shared_dedup_store(storage)
+            shared_store = storage
+        self.deduplicator = MessageDeduplicator(
+            ttl=int(self.settings.get("dedup_ttl", 24 * 60 * 60)),
+            max_entries=int(self.settings.get("dedup_max_entries", 100000)),
+            shared_store=shared_store
+        )
+
+        if self.ingestion_mode == "queue":
+            self.dispatcher = MessageDispatcher(
+                self.process_message,
+                workers=int(self.settings.get("workers", 0)) or None,
+                max_threads=int(self.settings.get("worker_threads", 0)) or None,
+                max_queue_size=int(self.settings.get("max_queue_size", 0)),
+                shed_handler=self.reply_high_demand,
+                high_watermark=int(self.settings.get("high_watermark", 1000)),
+                low_watermark=int(self.settings.get("low_watermark", 500)),
+                shed_queue_size=int(self.settings.get("shed_queue_size", 100))
+            )
+
+        metrics.register_collector(self.metrics_samples)
+
+        self.started = True
+        logger.info("Container do gateway inicializado")
+        return self
+
+    def build_session_store(self):
+        """
+        Redis (por campo, com pipeline) ou SQLite (arquivo local) se configurado;
+        senão, memória com TTL e limites. Com mais de um shard configurado, as
+        sessões são distribuídas por hash consistente
+
+        Também usado pelos scripts de manutenção (rebalance_sessions.py,
+        export_sessions.py), que fecham o armazenamento ao terminar.
+
+        Returns:
+            Armazenamento de sessões configurado
+
+        Raises:
+            ValueError: Se a lista de shards é inválida
+        """
+        backend = self.settings.get("session_backend", "memory")
+        try:
+            shards, previous = self._session_shard_specs(backend)
+            stores = {name: self._build_shard(backend, spec) for name, spec in shards.items()}
+            previous_stores = None
+            if previous:
+                previous_stores = {
+                    name: stores[name] if name in stores else self._build_shard(backend, spec)
+                    for name, spec in previous.items()
+                }
+        except ValueError:
+            # Lista de shards inválida: não cair para sessões em memória
+            raise
+        except Exception as e:
+            logger.error(f"Armazenamento '{backend}' indisponível, usando sessões em memória: {str(e)}")
+            backend, previous_stores = "memory", None
+            stores = {"memory-0": self._build_shard(backend, "memory-0")}
+
+        if len(stores) == 1 and previous_stores is None:
+            return next(iter(stores.values()))
+
+        from src.core.sharded_session_store import create_sharded_store
+        logger.info(f"Sessões distribuídas em {len(stores)} shards ({backend}): {', '.join(stores)}")
+        return create_sharded_store(
+            stores,
+            vnodes=int(self.settings.get("session_vnodes", 160)),
+            previous=previous_stores
+        )
+
+    def _session_shard_specs(self, backend):
+        """
+        Shards atuais e anteriores (enquanto o rebalanceamento não terminou)
+
+        Returns:
+            tuple: (dict nome -> caminho/URL, dict anterior ou None)
+
+        Raises:
+            ValueError: Se um nome se repete ou aponta para outro armazenamento
+                na lista anterior
+        """
+        if backend == "sqlite":
+            shards = self.settings.get("sqlite_shards") or [self.settings.get("sqlite_path", "sessions.db")]
+            previous = self.settings.get("sqlite_previous_shards")
+            field = "path"
+        elif backend == "redis":
+            import streamlit as st
+            redis_config = st.secrets.get("redis", {})
+            shards = redis_config.get("shard_urls") or [redis_config.get("url")]
+            previous = redis_config.get("previous_shard_urls")
+            field = "url"
+        else:
+            count = int(self.settings.get("memory_shards", 1))
+            return {f"memory-{i}": f"memory-{i}" for i in range(count)}, None
+
+        current = self._name_shards(shards, field)
+        if not previous:
+            return current, None
+        previous = self._name_shards(previous, field)
+        for name, spec in previous.items():
+            if name in current and _shard_location(current[name]) != _shard_location(spec):
+                raise ValueError(
+                    f"Shard '{name}' aponta para outro armazenamento na lista anterior; "
+                    f"informe um nome (name) para cada shard"
+                )
+        return current, previous
+
+    @staticmethod
+    def _name_shards(entries, field):
+        """
+        Nome de cada shard no anel de hash: o informado em {name, url/path} ou
+        shard-{posição}. O nome (e não a URL, que pode conter senha) decide a
+        distribuição das chaves, então trocar senha ou host não move sessões.
+
+        Returns:
+            dict: Nome -> caminho/URL
+        """
+        named = {}
+        for index, entry in enumerate(entries):
+            if isinstance(entry, str):
+                name, spec = f"shard-{index}", entry
+            else:
+                name, spec = entry["name"], entry[field]
+            if name in named:
+                raise ValueError(f"Nome de shard repetido: '{name}'")
+            named[name] = spec
+        return named
+
+    def _build_shard(self, backend, spec):
+        """Constrói o armazenamento de um shard (caminho SQLite, URL Redis ou nome em memória)"""
+        if backend == "sqlite":
+            from src.core.sqlite_session_store import SQLiteSessionStore
+            return SQLiteSessionStore(
+                path=spec,
+                synchronous=self.settings.get("sqlite_synchronous", "NORMAL"),
+                flush_interval=float(self.settings.get("sqlite_flush_interval", 0)),
+                sweep_interval=float(self.settings.get("sqlite_sweep_interval", 60))
+            )
+        if backend == "redis":
+            import streamlit as st
+            from src.core.redis_session_store import RedisSessionStore
+            return RedisSessionStore(
+                url=spec,
+                max_connections=int(st.secrets.get("redis", {}).get("max_connections", 50))
+            )
+        return MemorySessionStore(
+            max_entries=int(self.settings.get("memory_max_sessions", 100000)),
+            max_bytes=int(self.settings.get("memory_max_bytes", 256 * 1024 * 1024)),
+            sweep_interval=float(self.settings.get("memory_sweep_interval", 60))
+        ).start()
+
+    def _check_shared_dedup_store(self, storage):
+        """
+        Confere se o armazenamento atende à deduplicação compartilhada
+
+        Raises:
+            ValueError: Se ele não grava chaves condicionalmente (set com nx),
+                como as sessões em memória, que também não são compartilhadas
+                entre processos
+        """
+        stores = list(getattr(storage, "shards", {}).values()) or [storage]
+        unsupported = [type(store).__name__ for store in stores if not callable(getattr(store, "set", None))]
+        if unsupported:
+            raise ValueError(
+                f"dedup_backend = 'shared' requer armazenamento compartilhado com set(nx=True) "
+                f"(session_backend 'redis' ou 'sqlite'); armazenamento atual: {', '.join(sorted(set(unsupported)))}"
+            )
+
+    def _build_near_cache(self, storage):
+        """Cache local de sessões, útil apenas com armazenamento compartilhado versionado"""
+        size = int(self.settings.get("near_cache_size", 10000))
+        if size <= 0 or not hasattr(storage, "get_version_token"):
+            return None
+        return SessionNearCache(max_entries=size)
+
+    def _build_whatsapp_service(self):
+        """Usa o cliente assíncrono com pool de conexões e spool, se disponível"""
+        if self.settings.get("whatsapp_client", "async") == "async":
+            try:
+                from src.services.whatsapp_async import AsyncWhatsAppService
+                service = AsyncWhatsAppService()
+                self.registry.register("whatsapp_service", service)
+                return service
+            except ImportError as e:
+                logger.warning(f"Cliente WhatsApp assíncrono indisponível, usando síncrono: {str(e)}")
+
+        return self.registry.get("whatsapp_service")
+
+    async def start_workers(self):
+        """Inicia os clientes assíncronos e os workers em segundo plano (modo 'queue')"""
+        start = getattr(self.whatsapp_service, "start", None)
+        if start is not None:
+            await start()
+        if self.dispatcher is not None:
+            await self.dispatcher.start()
+
+    async def stop_workers(self):
+        """Esvazia a fila, encerra os workers e fecha os clientes assíncronos"""
+        if self.dispatcher is not None:
+            await self.dispatcher.stop()
+        for service in (self.whatsapp_service, self.registry.get("fusion_api")):
+            aclose = getattr(service, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def process_message(self, message):
+        """
+        Processa uma mensagem recebida e envia a resposta ao remetente
+
+        Args:
+            message (dict): Mensagem com 'sender', 'content' e 'message_id'
+        """
+        sender = message["sender"]
+
+        response = self.orchestrator.process_input(
+            user_input=message["content"],
+            channel="whatsapp",
+            user_id=sender,
+            message_id=message.get("message_id")
+        )
+        with STAGE_SECONDS.time("whatsapp_send"):
+            self.whatsapp_service.send_message(sender, response)
+
+        logger.info(f"Mensagem processada - De: {sender}, ID: {message.get('message_id')}")
+
+    def reply_high_demand(self, message):
+        """
+        Responde com mensagem de alta demanda sem consultar Fusion/IA
+
+        Args:
+            message (dict): Mensagem descartada por sobrecarga
+        """
+        response = self.registry.get("response_generator").generate_high_demand_response(
+            channel="whatsapp"
+        )
+        self.whatsapp_service.send_message(message["sender"], response)
+
+        logger.info(f"Mensagem descartada por sobrecarga - De: {message['sender']}, ID: {message.get('message_id')}")
+
+    def stats(self):
+        """Retorna métricas operacionais do gateway"""
+        stats = {"ingestion_mode": self.ingestion_mode}
+        if self.ingestor is not None:
+            stats["ingestion"] = self.ingestor.stats()
+        if self.deduplicator is not None:
+            stats["dedup"] = self.deduplicator.stats()
+        if hasattr(self.session_store, "stats"):
+            stats["sessions"] = self.session_store.stats()
+        if self.session_manager.near_cache is not None:
+            stats["session_cache"] = self.session_manager.near_cache.stats()
+        if hasattr(self.whatsapp_service, "stats"):
+            stats["whatsapp"] = self.whatsapp_service.stats()
+        fusion_api = self.registry.get("fusion_api")
+        if hasattr(fusion_api, "stats"):
+            stats["fusion"] = fusion_api.stats()
+        if getattr(fusion_api, "cache", None) is not None:
+            stats["fusion_cache"] = fusion_api.cache.stats()
+        if self.dispatcher is not None:
+            stats["queue"] = self.dispatcher.stats()
+        return stats
+
+    def metrics_samples(self):
+        """Converte as métricas de stats() em gauges para o endpoint /metrics"""
+        samples = []
+        for section, values in self.stats().items():
+            if not isinstance(values, dict):
+                continue
+            for name, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    samples.append((f"carglass_gateway_{section}_{name}", value))
+        return samples
+
+    def shutdown(self):
+        """Libera recursos dos serviços (chamado no fim do lifespan)"""
+        if not self.started:
+            return
+
+        metrics.unregister_collector(self.metrics_samples)
+
+        # Fechar clientes HTTP e conexões de todos os serviços que suportam; o
+        # armazenamento criado pelo container é fechado por último, uma única vez,
+        # pois os demais serviços (ex: cache da API Fusion) podem usá-lo até aqui
+        for name, service in list(self.registry.items()):
+            if service is self.session_store:
+                continue
+            close = getattr(service, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.error(f"Erro ao finalizar serviço {name}: {str(e)}")
+
+        if self.session_store is not None:
+            self.registry.register("storage_client", None)
+            try:
+                self.session_store.close()
+            except Exception as e:
+                logger.error(f"Erro ao finalizar armazenamento de sessões: {str(e)}")
+            self.session_store = None
+
+        self.session_manager = None
+        self.orchestrator = None
+        self.whatsapp_service = None
+        self.dispatcher = None
+        self.deduplicator = None
+        self.ingestor = None
+        self.started = False
+        logger.info("Container do gateway finalizado")
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MessageDeduplicator:
+    """
+    Detecta reentregas de webhooks pelo ID da mensagem do WhatsApp.
+    Mantém em memória um conjunto limitado de IDs com expiração (TTL) e,
+    opcionalmente, consulta um armazenamento compartilhado (ex: Redis) para
+    deduplicar entre vários processos do gateway.
+    """
+
+    def __init__(self, ttl=24 * 60 * 60, max_entries=100000, shared_store=None, key_prefix="wamid:"):
+        """
+        Inicializa o deduplicador
+
+        Args:
+            ttl (int): Tempo (s) durante o qual um ID é lembrado
+            max_entries (int): Número máximo de IDs mantidos em memória
+            shared_store: Cliente compartilhado com set(key, value, nx=True, ex=ttl) (opcional)
+            key_prefix (str): Prefixo das chaves no armazenamento compartilhado
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_store = shared_store
+        self.key_prefix = key_prefix
+
+        # ID -> instante de expiração; como o TTL é fixo, a ordem de inserção
+        # é também a ordem de expiração
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.checked = 0
+        self.duplicates = 0
+        self.evicted = 0
+        self.shared_errors = 0
+
+    def is_duplicate(self, message_id):
+        """
+        Verifica se a mensagem já foi recebida e registra o ID caso seja nova
+
+        Args:
+            message_id (str): ID da mensagem (wamid)
+
+        Returns:
+            bool: True se a mensagem é uma reentrega
+        """
+        if not message_id:
+            return False
+        if self._check_local(message_id):
+            return True
+        if self.shared_store is None:
+            return False
+        return self._check_shared(message_id, self._claim_shared(message_id))
+
+    async def ais_duplicate(self, message_id):
+        """
+        Versão de is_duplicate para o event loop: a consulta ao armazenamento
+        compartilhado (ida ao Redis ou gravação no SQLite) roda em uma thread
+
+        Args:
+            message_id (str): ID da mensagem (wamid)
+
+        Returns:
+            bool: True se a mensagem é uma reentrega
+        """
+        if not message_id:
+            return False
+        if self._check_local(message_id):
+            return True
+        if self.shared_store is None:
+            return False
+        claimed = await asyncio.to_thread(self._claim_shared, message_id)
+        return self._check_shared(message_id, claimed)
+
+    async def arelease(self, message_id):
+        """
+        Esquece um ID registrado (mensagem não aceita para processamento),
+        para que a reentrega do webhook seja processada
+
+        Args:
+            message_id (str): ID da mensagem (wamid)
+        """
+        if not message_id:
+            return
+        with self._lock:
+            self._seen.pop(message_id, None)
+        if self.shared_store is not None:
+            await asyncio.to_thread(self._release_shared, message_id)
+
+    def _release_shared(self, message_id):
+        try:
+            self.shared_store.delete(f"{self.key_prefix}{message_id}")
+        except Exception as e:
+            self.shared_errors += 1
+            logger.warning(f"Erro ao liberar ID no armazenamento de deduplicação: {str(e)}")
+
+    def _check_local(self, message_id):
+        """
+        Confere o ID em memória; se for novo, já o registra, de forma que
+        reentregas simultâneas no mesmo processo não cheguem ao armazenamento
+        compartilhado enquanto a primeira é conferida lá
+
+        Returns:
+            bool: True se é uma reentrega
+        """
+        now = time.monotonic()
+        with self._lock:
+            self.checked += 1
+            self._expire(now)
+
+            if message_id in self._seen:
+                self.duplicates += 1
+                return True
+
+            self._remember(message_id, now)
+            return False
+
+    def _check_shared(self, message_id, claimed):
+        """Resultado da consulta compartilhada (o ID continua lembrado localmente)"""
+        if claimed:
+            return False
+        # Já processada por outro processo
+        with self._lock:
+            self.duplicates += 1
+        return True
+
+    def _claim_shared(self, message_id):
+        """Registra o ID no armazenamento compartilhado (True se ainda não existia)"""
+        try:
+            return bool(self.shared_store.set(
+                f"{self.key_prefix}{message_id}", "1", nx=True, ex=self.ttl
+            ))
+        except Exception as e:
+            # Em caso de falha, seguir apenas com a deduplicação local
+            self.shared_errors += 1
+            logger.warning(f"Erro no armazenamento de deduplicação: {str(e)}")
+            return True
+
+    def _remember(self, message_id, now):
+        """Adiciona o ID respeitando o limite de memória"""
+        self._seen[message_id] = now + self.ttl
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+            self.evicted += 1
+
+    def _expire(self, now):
+        """Remove IDs expirados (do mais antigo para o mais novo)"""
+        while self._seen:
+            message_id, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            del self._seen[message_id]
+
+    def stats(self):
+        """Retorna métricas de deduplicação"""
+        return {
+            "tracked_ids": len(self._seen),
+            "checked": self.checked,
+            "duplicates_dropped": self.duplicates,
+            "evicted": self.evicted,
+            "shared_errors": self.shared_errors
+        }
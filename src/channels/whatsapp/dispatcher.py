@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Resultados de MessageDispatcher.submit
+ACCEPTED = "accepted"
+SHED = "shed"
+REJECTED = "rejected"
+
+
+def default_worker_count():
+    """Número padrão de workers: o processamento é dominado por I/O (Fusion, IA, WhatsApp)"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+class MessageDispatcher:
+    """
+    Fila de processamento em segundo plano para mensagens do WhatsApp.
+    O webhook apenas enfileira as mensagens; um conjunto de workers assíncronos
+    consome a fila e executa os serviços síncronos em um pool de threads.
+
+    As mensagens são agrupadas em "pistas" por cliente (chave 'canal:usuário'):
+    mensagens do mesmo cliente são processadas uma por vez, na ordem de chegada,
+    enquanto clientes diferentes são processados em paralelo.
+
+    Controle de admissão: ao atingir high_watermark mensagens pendentes, novas
+    mensagens deixam de ser enfileiradas e recebem apenas uma resposta barata
+    (shed_handler), até que a fila volte a low_watermark. As respostas de
+    sobrecarga aguardando envio são limitadas a shed_queue_size; além disso,
+    a mensagem é descartada sem resposta (contada em shed_notices_dropped).
+    """
+
+    def __init__(self, handler, workers=None, max_threads=None, max_queue_size=0, drain_timeout=10.0,
+                 shed_handler=None, high_watermark=0, low_watermark=None, shed_queue_size=100):
+        """
+        Inicializa o dispatcher
+
+        Args:
+            handler: Função síncrona chamada com cada mensagem (dict)
+            workers (int): Número de workers assíncronos (padrão: 4 por núcleo, máx. 32)
+            max_threads (int): Tamanho do pool de threads (padrão: igual a workers)
+            max_queue_size (int): Limite de mensagens pendentes (0 = ilimitado)
+            drain_timeout (float): Tempo máximo (s) para esvaziar a fila no desligamento
+            shed_handler: Função síncrona chamada com mensagens descartadas por sobrecarga
+            high_watermark (int): Pendências a partir das quais há descarte (0 = desativado)
+            low_watermark (int): Pendências abaixo das quais o descarte termina (padrão: metade do high)
+            shed_queue_size (int): Máximo de respostas de sobrecarga aguardando envio
+        """
+        self.handler = handler
+        self.workers = workers or default_worker_count()
+        self.max_threads = max_threads or self.workers
+        self.max_queue_size = max_queue_size
+        self.drain_timeout = drain_timeout
+        self.shed_handler = shed_handler
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark if low_watermark is not None else high_watermark // 2
+        self.shedding = False
+        self.shed_queue_size = shed_queue_size
+
+        # Pistas por cliente: uma chave está em _lanes enquanto tiver mensagens
+        # pendentes ou em processamento, e aparece no máximo uma vez em _ready
+        self._lanes = {}
+        self._ready = None
+        self._idle = None
+        self.pending = 0
+
+        self.executor = None
+        self.shed_executor = None
+        self._tasks = []
+
+        # Métricas
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.shed = 0
+        self.shed_episodes = 0
+        self.shed_notices_pending = 0
+        self.shed_notices_dropped = 0
+        self.in_flight = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._total_lag = 0.0
+
+    async def start(self):
+        """Cria a fila de pistas, o pool de threads e inicia os workers"""
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_threads,
+            thread_name_prefix="whatsapp-worker"
+        )
+        # Pool separado para respostas de sobrecarga, que não disputam threads com os workers
+        self.shed_executor = ThreadPoolExecutor(
+            max_workers=2,
+            thread_name_prefix="whatsapp-shed"
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers)
+        ]
+        logger.info(f"Dispatcher iniciado com {self.workers} workers e {self.max_threads} threads")
+
+    async def stop(self):
+        """Aguarda as pistas esvaziarem (até drain_timeout) e encerra os workers"""
+        if self._ready is None:
+            return
+
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dispatcher encerrado com {self.pending} mensagens pendentes")
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        self.executor.shutdown(wait=True)
+        self.shed_executor.shutdown(wait=True)
+        self._ready = None
+        self._lanes = {}
+        logger.info("Dispatcher finalizado")
+
+    def submit(self, message):
+        """
+        Enfileira uma mensagem na pista do seu cliente
+
+        Args:
+            message (dict): Mensagem extraída do webhook (com 'sender')
+
+        Returns:
+            str: ACCEPTED se enfileirada, SHED se descartada com resposta de
+                sobrecarga, REJECTED se o limite de pendências foi atingido
+        """
+        if self.max_queue_size and self.pending >= self.max_queue_size:
+            self.rejected += 1
+            logger.warning(f"Fila cheia, mensagem descartada: {message.get('message_id')}")
+            return REJECTED
+
+        if self._should_shed():
+            self.shed += 1
+            if self.shed_handler is not None:
+                self._notify_shed(message)
+            return SHED
+
+        message["enqueued_at"] = time.monotonic()
+        key = self._lane_key(message)
+
+        lane = self._lanes.get(key)
+        if lane is None:
+            # Pista nova: agendar a chave para um worker
+            self._lanes[key] = deque([message])
+            self._ready.put_nowait(key)
+        else:
+            # Cliente já tem mensagens em andamento: manter a ordem
+            lane.append(message)
+
+        self.pending += 1
+        self.enqueued += 1
+        self._idle.clear()
+        return ACCEPTED
+
+    def _should_shed(self):
+        """Aplica histerese entre as marcas alta e baixa da fila"""
+        if not self.high_watermark:
+            return False
+
+        if not self.shedding and self.pending >= self.high_watermark:
+            self.shedding = True
+            self.shed_episodes += 1
+            logger.warning(f"Sobrecarga: descartando novas mensagens ({self.pending} pendentes)")
+
+        return self.shedding
+
+    def _notify_shed(self, message):
+        """Agenda a resposta barata fora das pistas (sem Fusion/IA), se houver vaga"""
+        if self.shed_notices_pending >= self.shed_queue_size:
+            # Envios da Graph API atrasados: não acumular mais respostas
+            self.shed_notices_dropped += 1
+            return
+
+        self.shed_notices_pending += 1
+        future = asyncio.get_running_loop().run_in_executor(self.shed_executor, self._run_shed_handler, message)
+        future.add_done_callback(self._shed_notice_done)
+
+    def _shed_notice_done(self, future):
+        self.shed_notices_pending -= 1
+
+    def _run_shed_handler(self, message):
+        """Executa o shed_handler registrando falhas"""
+        try:
+            self.shed_handler(message)
+        except Exception as e:
+            logger.error(f"Erro ao responder mensagem descartada: {str(e)}")
+
+    def _lane_key(self, message):
+        """Chave da pista do cliente (mesmo formato da chave de sessão)"""
+        return f"{message.get('channel', 'whatsapp')}:{message['sender']}"
+
+    async def _worker(self, worker_id):
+        """Consome pistas prontas executando o handler no pool de threads"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            message = lane.popleft()
+
+            # Atraso entre o recebimento do webhook e o início do processamento
+            lag = time.monotonic() - message["enqueued_at"]
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self._total_lag += lag
+
+            self.in_flight += 1
+            try:
+                await loop.run_in_executor(self.executor, self.handler, message)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Erro no worker {worker_id} ao processar mensagem: {str(e)}")
+            finally:
+                self.in_flight -= 1
+                self.pending -= 1
+
+                # Próxima mensagem do mesmo cliente volta ao fim da fila (justiça entre clientes)
+                if lane:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+
+                if self.shedding and self.pending <= self.low_watermark:
+                    self.shedding = False
+                    logger.info(f"Fim do descarte por sobrecarga ({self.pending} pendentes)")
+
+                if self.pending == 0:
+                    self._idle.set()
+
+    def stats(self):
+        """Retorna métricas de fila e atraso de processamento"""
+        started = self.processed + self.failed + self.in_flight
+        return {
+            "queue_depth": self.pending - self.in_flight,
+            "in_flight": self.in_flight,
+            "active_lanes": len(self._lanes),
+            "workers": self.workers,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "shedding": self.shedding,
+            "shed": self.shed,
+            "shed_episodes": self.shed_episodes,
+            "shed_notices_pending": self.shed_notices_pending,
+            "shed_notices_dropped": self.shed_notices_dropped,
+            "high_watermark": self.high_watermark,
+            "low_watermark": self.low_watermark,
+            "lag_last_seconds": round(self.last_lag, 4),
+            "lag_max_seconds": round(self.max_lag, 4),
+            "lag_avg_seconds": round(self._total_lag / started, 4) if started else 0.0
+        }
@@ -1,35 +1,47 @@
-from fastapi import FastAPI, Request, Response, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response, Depends
 import logging
-import json
-import hmac
-import hashlib
-from src.core.orchestrator import ActionOrchestrator
-from src.core.session_manager import SessionManager
-from src.core.service_registry import ServiceRegistry
-from src.services.whatsapp import WhatsAppService
+from src.utils.metrics import metrics
+from src.channels.whatsapp.container import GatewayContainer
+from src.channels.whatsapp.dispatcher import REJECTED
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
-# Criar aplicação FastAPI
-app = FastAPI(title="CarGlass WhatsApp Gateway")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Constrói os serviços uma vez na inicialização e os libera no desligamento"""
+    container = GatewayContainer().startup()
+    app.state.container = container
+    await container.start_workers()
+    try:
+        yield
+    finally:
+        await container.stop_workers()
+        container.shutdown()
 
-# Injeção de dependências
-def get_orchestrator():
-    registry = ServiceRegistry()
-    storage = registry.get("storage_client")
-    session_manager = SessionManager(storage)
-    return ActionOrchestrator(session_manager, registry)
+# Criar aplicação FastAPI
+app = FastAPI(title="CarGlass WhatsApp Gateway", lifespan=lifespan)
 
-def get_whatsapp_service():
-    registry = ServiceRegistry()
-    return registry.get("whatsapp_service")
+# Injeção de dependências (serviços compartilhados pelo container do processo)
+def get_container(request: Request) -> GatewayContainer:
+    return request.app.state.container
 
 @app.get("/")
 async def root():
     """Endpoint de verificação de saúde"""
     return {"status": "online", "service": "CarGlass WhatsApp Gateway"}
 
+@app.get("/stats")
+async def stats(container: GatewayContainer = Depends(get_container)):
+    """Métricas operacionais (profundidade da fila, atraso de processamento)"""
+    return container.stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas no formato de texto do Prometheus"""
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/webhook")
 async def verify_webhook(request: Request):
     """
@@ -59,86 +71,48 @@ async def verify_webhook(request: Request):
 @app.post("/webhook")
 async def receive_webhook(
     request: Request, 
-    orchestrator: ActionOrchestrator = Depends(get_orchestrator),
-    whatsapp_service: WhatsAppService = Depends(get_whatsapp_service)
+    container: GatewayContainer = Depends(get_container)
 ):
     """
     Endpoint para receber mensagens do WhatsApp
     """
     try:
-        # Obter corpo da requisição
+        # Ler corpo bruto uma única vez, verificar assinatura e decodificar
         body = await request.body()
+        messages = container.ingestor.ingest(
+            body,
+            request.headers.get("X-Hub-Signature-256", "")
+        )
         
-        # Verificar assinatura (em produção)
-        # self._verify_signature(request, body)
+        if messages is None:
+            return Response(status_code=403)
         
-        # Processar payload
-        payload = await request.json()
-        logger.debug(f"Webhook recebido: {json.dumps(payload)}")
+        rejected = 0
+        for job in messages:
+            # Ignorar reentregas do mesmo webhook (Meta reenvia em ack lento)
+            if await container.deduplicator.ais_duplicate(job["message_id"]):
+                logger.info(f"Mensagem duplicada ignorada - ID: {job['message_id']}")
+                continue
+            
+            if container.dispatcher is not None:
+                # Enfileirar e responder imediatamente ao webhook
+                if container.dispatcher.submit(job) == REJECTED:
+                    # Fila cheia: esquecer o ID para que a reentrega seja processada
+                    await container.deduplicator.arelease(job["message_id"])
+                    rejected += 1
+            else:
+                # Modo inline: processar dentro da requisição
+                container.process_message(job)
         
-        # Verificar tipo de evento
-        if "object" in payload and payload["object"] == "whatsapp_business_account":
-            for entry in payload.get("entry", []):
-                for change in entry.get("changes", []):
-                    value = change.get("value", {})
-                    
-                    if "messages" in value:
-                        for message in value["messages"]:
-                            # Extrair informações da mensagem
-                            sender = message.get("from")
-                            message_id = message.get("id")
-                            
-                            # Extrair conteúdo da mensagem
-                            if "text" in message:
-                                # Mensagem de texto
-                                content = message["text"]["body"]
-                                
-                                # Processar a mensagem
-                                response = orchestrator.process_input(
-                                    user_input=content,
-                                    channel="whatsapp",
-                                    user_id=sender
-                                )
-                                
-                                # Enviar resposta de volta
-                                whatsapp_service.send_message(sender, response)
-                                
-                                logger.info(f"Mensagem processada - De: {sender}, ID: {message_id}")
-                            
-                            # Suporte para outros tipos de mensagem (futuramente)
-                            # elif "image" in message:
-                            #     # Processar imagem
-                            #     pass
+        if rejected:
+            # A Meta reenvia o webhook; as mensagens já aceitas são descartadas como duplicadas
+            logger.warning(f"Fila cheia: {rejected} mensagem(ns) recusada(s), webhook será reenviado")
+            return Response(status_code=503)
         
-        # Sempre responder com 200 OK para o webhook
+        # Responder com 200 OK para o webhook
         return Response(status_code=200)
     
     except Exception as e:
         logger.error(f"Erro ao processar webhook: {str(e)}")
         # Sempre responder com 200 OK para o webhook (requisito da plataforma)
         return Response(status_code=200)
-    
-    def _verify_signature(self, request, body):
-        """Verifica assinatura do webhook (em produção)"""
-        signature = request.headers.get("X-Hub-Signature-256", "")
-        
-        if not signature:
-            logger.warning("Sem assinatura no cabeçalho")
-            return False
-        
-        # Verificar assinatura (em produção, usar st.secrets para a chave)
-        app_secret = "YOUR_APP_SECRET"
-        
-        # Calcular assinatura esperada
-        expected_signature = "sha256=" + hmac.new(
-            app_secret.encode('utf-8'),
-            body,
-            hashlib.sha256
-        ).hexdigest()
-        
-        # Comparar assinaturas
-        if not hmac.compare_digest(signature, expected_signature):
-            logger.warning("Assinatura inválida no webhook")
-            raise HTTPException(status_code=403, detail="Invalid signature")
-        
-        return True
@@ -0,0 +1,156 @@
+import hashlib
+import hmac
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Decodificador JSON mais rápido quando disponível
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+class WebhookIngestor:
+    """
+    Etapa de ingestão dos webhooks do WhatsApp.
+    Lê o corpo bruto uma única vez, verifica a assinatura X-Hub-Signature-256,
+    decodifica o JSON uma única vez e extrai apenas as mensagens de texto,
+    descartando rapidamente eventos sem mensagens (ex: 'statuses' de entrega).
+    """
+
+    def __init__(self, app_secret=None):
+        """
+        Inicializa a etapa de ingestão
+
+        Args:
+            app_secret (str): Chave do app Meta para verificar assinaturas
+                (padrão: whatsapp.app_secret do secrets; vazio desativa a verificação)
+        """
+        if app_secret is None:
+            try:
+                import streamlit as st
+                app_secret = st.secrets.get("whatsapp", {}).get("app_secret", "")
+            except Exception as e:
+                logger.warning(f"Não foi possível carregar app_secret do WhatsApp: {str(e)}")
+                app_secret = ""
+
+        # HMAC pré-computado com a chave; cada verificação só copia o estado
+        self._mac = hmac.new(app_secret.encode("utf-8"), digestmod=hashlib.sha256) if app_secret else None
+        if self._mac is None:
+            logger.warning("app_secret não configurado: assinatura dos webhooks não será verificada")
+
+        # Métricas
+        self.received = 0
+        self.invalid_signatures = 0
+        self.parse_errors = 0
+        self.skipped_events = 0
+        self.messages = 0
+
+    def verify_signature(self, body, signature):
+        """
+        Verifica a assinatura do webhook
+
+        Args:
+            body (bytes): Corpo bruto da requisição
+            signature (str): Valor do cabeçalho X-Hub-Signature-256
+
+        Returns:
+            bool: True se a assinatura é válida (ou se a verificação está desativada)
+        """
+        if self._mac is None:
+            return True
+
+        if not signature:
+            logger.warning("Sem assinatura no cabeçalho")
+            return False
+
+        mac = self._mac.copy()
+        mac.update(body)
+        expected_signature = "sha256=" + mac.hexdigest()
+
+        if not hmac.compare_digest(signature, expected_signature):
+            logger.warning("Assinatura inválida no webhook")
+            return False
+
+        return True
+
+    def ingest(self, body, signature):
+        """
+        Processa o corpo bruto de um webhook
+
+        Args:
+            body (bytes): Corpo bruto da requisição
+            signature (str): Valor do cabeçalho X-Hub-Signature-256
+
+        Returns:
+            list: Mensagens de texto extraídas, ou None se a assinatura é inválida
+        """
+        self.received += 1
+
+        if not self.verify_signature(body, signature):
+            self.invalid_signatures += 1
+            return None
+
+        # Eventos sem mensagens (ex: somente 'statuses') não precisam ser decodificados
+        if b'"messages"' not in body:
+            self.skipped_events += 1
+            return []
+
+        try:
+            payload = json_loads(body)
+        except ValueError as e:
+            self.parse_errors += 1
+            logger.error(f"Webhook com JSON inválido: {str(e)}")
+            return []
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Webhook recebido: {body.decode('utf-8', 'replace')}")
+
+        messages = self.extract_messages(payload)
+        self.messages += len(messages)
+        return messages
+
+    def extract_messages(self, payload):
+        """
+        Extrai mensagens de texto de um payload já decodificado
+
+        Args:
+            payload (dict): Payload do webhook
+
+        Returns:
+            list: Mensagens no formato {'sender', 'message_id', 'content'}
+        """
+        if not isinstance(payload, dict) or payload.get("object") != "whatsapp_business_account":
+            self.skipped_events += 1
+            return []
+
+        messages = []
+        for entry in payload.get("entry", []):
+            for change in entry.get("changes", []):
+                value = change.get("value", {})
+
+                for message in value.get("messages", ()):
+                    # Suporte para outros tipos de mensagem (futuramente)
+                    if message.get("type", "text") != "text" or "text" not in message:
+                        continue
+
+                    messages.append({
+                        "sender": message.get("from"),
+                        "message_id": message.get("id"),
+                        "content": message["text"]["body"]
+                    })
+
+        return messages
+
+    def stats(self):
+        """Retorna métricas da ingestão"""
+        return {
+            "received": self.received,
+            "invalid_signatures": self.invalid_signatures,
+            "parse_errors": self.parse_errors,
+            "skipped_events": self.skipped_events,
+            "messages": self.messages
+        }
@@ -1,4 +1,72 @@
+import logging
+import threading
+import uuid
+from collections import OrderedDict
 from src.core.service_registry import ServiceRegistry
+from src.core.session_manager import SessionConflictError
+from src.utils.metrics import STAGE_SECONDS, INTENTS_TOTAL, ACTIONS_TOTAL, ESCALATIONS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class _RecordedSession:
+    """
+    Encaminha o acesso à sessão do turno e registra as leituras que decidem o
+    turno (estado, dados do cliente, escalonamento) e as chamadas que a
+    alteram. Em caso de conflito, as alterações só são reaplicadas sobre a
+    versão atual da sessão se essas leituras continuarem iguais nela.
+    """
+    
+    MUTATIONS = ("add_message", "set_state", "update_client_info", "set_escalation_reason", "reset")
+    READS = ("get_state", "get_client_info", "has_client_info", "get_escalation_id")
+    
+    def __init__(self, session, turn_id):
+        """
+        Args:
+            session: Sessão carregada para o turno
+            turn_id (str): Identificador do turno (ID da mensagem), chave de idempotência
+        """
+        self._session = session
+        self._mutations = []
+        self._reads = []
+        self._decided = False
+        self.turn_id = turn_id
+    
+    def __getattr__(self, name):
+        attr = getattr(self._session, name)
+        if name in self.READS:
+            def read(*args):
+                value = attr(*args)
+                # Leituras depois de o turno alterar a sessão refletem o próprio turno
+                if not self._decided:
+                    self._reads.append((name, args, value))
+                return value
+            return read
+        if name not in self.MUTATIONS:
+            return attr
+        
+        def record(*args, **kwargs):
+            self._mutations.append((name, args, kwargs))
+            if name != "add_message":
+                self._decided = True
+            return attr(*args, **kwargs)
+        return record
+    
+    @property
+    def current(self):
+        """Sessão que recebe as alterações (a versão mais recente carregada)"""
+        return self._session
+    
+    def reads_match(self, session):
+        """Verifica se as leituras do turno dão o mesmo resultado em outra cópia da sessão"""
+        return all(getattr(session, name)(*args) == value for name, args, value in self._reads)
+    
+    def replay(self, session):
+        """Reaplica as alterações registradas em outra cópia da sessão"""
+        for name, args, kwargs in self._mutations:
+            getattr(session, name)(*args, **kwargs)
+        self._session = session
+
 
 class ActionOrchestrator:
     """
@@ -6,11 +74,22 @@ class ActionOrchestrator:
     Determina qual ação executar com base na entrada do usuário e contexto.
     """
     
-    def __init__(self, session_manager, service_registry):
+    def __init__(self, session_manager, service_registry, max_attempts=3, escalation_memory=10000):
+        """
+        Args:
+            session_manager: Gerenciador de sessões
+            service_registry: Registro de serviços
+            max_attempts (int): Tentativas do turno em caso de conflito de versão da sessão
+            escalation_memory (int): Turnos cujo escalonamento é lembrado (idempotência)
+        """
         self.session_manager = session_manager
         self.services = service_registry
+        self.max_attempts = max_attempts
+        self.escalation_memory = escalation_memory
+        self._escalations = OrderedDict()
+        self._escalations_lock = threading.Lock()
     
-    def process_input(self, user_input, channel, user_id):
+    def process_input(self, user_input, channel, user_id, message_id=None):
         """
         Processa entrada do usuário e determina próximas ações
         
@@ -18,20 +97,62 @@ class ActionOrchestrator:
             user_input (str): Texto enviado pelo usuário
             channel (str): Canal de origem ('web' ou 'whatsapp')
             user_id (str): Identificador do usuário
+            message_id (str): ID da mensagem; um mesmo turno não escala duas vezes
             
         Returns:
             str: Resposta formatada para o usuário
+            
+        Raises:
+            SessionConflictError: Se a sessão continuar em conflito após max_attempts
         """
+        turn_id = message_id or uuid.uuid4().hex
+        
         # Recuperar sessão/estado atual
-        session = self.session_manager.get_session(channel, user_id)
+        session = _RecordedSession(self.session_manager.get_session(channel, user_id), turn_id)
+        response = self._process_turn(user_input, session)
         
+        # Outro worker pode gravar a mesma sessão durante o turno (concorrência
+        # otimista). Se o que decidiu o turno não mudou na versão atual, só as
+        # alterações do turno são reaplicadas; senão a decisão é refeita sobre
+        # ela, sem escalar de novo o mesmo turno
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                # Persistir a sessão uma única vez ao final do turno
+                self.session_manager.commit_session(session.current)
+                return response
+            except SessionConflictError as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"Turno descartado após {attempt} conflitos de sessão: {str(e)}")
+                    raise
+                current = self.session_manager.get_session(channel, user_id)
+                if session.reads_match(current):
+                    logger.info(f"Conflito de sessão, reaplicando o turno (tentativa {attempt + 1}): {str(e)}")
+                    session.replay(current)
+                else:
+                    logger.info(f"Conflito de sessão com estado alterado, refazendo o turno (tentativa {attempt + 1}): {str(e)}")
+                    session = _RecordedSession(current, turn_id)
+                    response = self._process_turn(user_input, session)
+    
+    def _process_turn(self, user_input, session):
+        """Executa as ações do turno, registrando as alterações na sessão"""
         # Determinar intenção do usuário
-        intent = self.services.intent_detector.detect(user_input, session)
+        with STAGE_SECONDS.time("intent_detection"):
+            intent = self.services.intent_detector.detect(user_input, session)
+        INTENTS_TOTAL.inc(intent.type)
         
         # Aplicar regras de negócio para determinar ação
-        action = self.services.decision_engine.determine_action(intent, session)
+        with STAGE_SECONDS.time("decision"):
+            action = self.services.decision_engine.determine_action(intent, session)
+        ACTIONS_TOTAL.inc(action.type)
         
-        # Executar ação apropriada
+        # Executar ação apropriada e registrar o turno no histórico
+        session.add_message("user", user_input)
+        response = self._execute_action(action, session)
+        session.add_message("assistant", response)
+        return response
+    
+    def _execute_action(self, action, session):
+        """Executa a ação determinada pelo motor de decisão"""
         if action.type == "query_status":
             return self._handle_status_query(action, session)
         elif action.type == "answer_question":
@@ -51,7 +172,8 @@ class ActionOrchestrator:
         id_type = action.params.get("id_type")
         
         # Consultar API Fusion baseado no tipo de identificador
-        client_data = self.services.fusion_api.get_client_data(id_type, identifier)
+        with STAGE_SECONDS.time("fusion_lookup"):
+            client_data = self.services.fusion_api.get_client_data(id_type, identifier)
         
         if client_data and client_data.get("sucesso"):
             # Atualizar sessão com dados do cliente
@@ -86,11 +208,12 @@ class ActionOrchestrator:
         question = action.params.get("question")
         client_data = session.get_client_info()
         
-        return self.services.ai_service.generate_response(
-            question, 
-            client_data,
-            channel=session.channel
-        )
+        with STAGE_SECONDS.time("ai_generation"):
+            return self.services.ai_service.generate_response(
+                question, 
+                client_data,
+                channel=session.channel
+            )
     
     def _handle_escalation(self, action, session):
         """Escala para atendente humano"""
@@ -99,13 +222,8 @@ class ActionOrchestrator:
         # Registrar motivo do escalonamento
         session.set_escalation_reason(reason)
         
-        # Iniciar processo de escalonamento
-        escalation_id = self.services.escalation_service.escalate(
-            session.user_id,
-            session.channel,
-            session.get_conversation_history(),
-            reason
-        )
+        # Iniciar processo de escalonamento (uma vez por turno, mesmo se refeito)
+        escalation_id = self._escalate_once(session, reason)
         
         # Retornar mensagem informando sobre escalonamento
         return self.services.response_generator.generate_escalation_response(
@@ -113,6 +231,27 @@ class ActionOrchestrator:
             channel=session.channel
         )
     
+    def _escalate_once(self, session, reason):
+        """Escala a conversa, ou devolve o escalonamento já feito para o mesmo turno"""
+        with self._escalations_lock:
+            escalation_id = self._escalations.get(session.turn_id)
+        if escalation_id is not None:
+            return escalation_id
+        
+        ESCALATIONS_TOTAL.inc(reason)
+        escalation_id = self.services.escalation_service.escalate(
+            session.user_id,
+            session.channel,
+            session.get_full_history(),
+            reason
+        )
+        
+        with self._escalations_lock:
+            self._escalations[session.turn_id] = escalation_id
+            while len(self._escalations) > self.escalation_memory:
+                self._escalations.popitem(last=False)
+        return escalation_id
+    
     def _handle_ask_for_identifier(self, session):
         """Solicita identificador ao usuário"""
         return self.services.response_generator.generate_ask_for_identifier_response(
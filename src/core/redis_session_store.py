@@ -0,0 +1,307 @@
+import json
+import logging
+from src.core.session_serializer import JsonListHistory, RawJson, encode_field
+
+try:
+    import redis
+except ImportError:  # Dependência opcional: só necessária com session_backend = "redis"
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class RedisSessionStore:
+    """
+    Armazenamento de sessões no Redis com estrutura por campo.
+
+    Cada sessão ocupa duas chaves:
+    - chave             hash com os campos escalares (state, client_info, escalation_info...)
+    - {chave}:history   lista com o histórico recente (uma mensagem JSON por item)
+
+    A lista usa a chave da sessão como hash tag, ficando no mesmo slot do
+    hash no Redis Cluster; as duas chaves são declaradas em KEYS no script
+    de gravação condicional.
+
+    A gravação de um turno envia, em uma única ida ao servidor, apenas os
+    campos alterados e as mensagens novas, recorta a lista ao tamanho da
+    janela e renova o TTL das duas chaves sem regravar os dados. Os comandos
+    são executados por um script Lua que antes confere a versão da sessão
+    (compare-and-set), rejeitando a gravação se outro worker gravou antes.
+
+    Também expõe get/setex/set/delete/expire para os lotes de histórico
+    arquivado e para a deduplicação compartilhada de webhooks.
+    """
+
+    # Campos escalares gravados quando o histórico muda (atualizados pelo arquivamento)
+    HISTORY_COUNTERS = ("archived_messages", "archive_chunks")
+    # Campos decodificados apenas quando acessados
+    DEFERRED_FIELDS = ("client_info",)
+
+    # KEYS = (hash da sessão, lista do histórico); ARGV[1] = versão esperada; em seguida,
+    # comandos no formato: nº de argumentos, comando, índice da chave em KEYS, argumentos...
+    CAS_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version') or '0'
+if current ~= ARGV[1] then
+    return 0
+end
+local i = 2
+while i <= #ARGV do
+    local n = tonumber(ARGV[i])
+    redis.call(ARGV[i + 1], KEYS[tonumber(ARGV[i + 2])], unpack(ARGV, i + 3, i + n))
+    i = i + n + 1
+end
+return 1
+"""
+    SESSION_KEY = 1
+    HISTORY_KEY = 2
+
+    def __init__(self, client=None, url=None, max_connections=50):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            client: Cliente Redis já construído (ou compatível, ex: RedisMock)
+            url (str): URL de conexão usada quando client não é informado
+            max_connections (int): Tamanho do pool de conexões
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("Pacote 'redis' não instalado (necessário para session_backend = 'redis')")
+            pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+            client = redis.Redis(connection_pool=pool)
+
+        self.client = client
+        self._cas = client.register_script(self.CAS_SCRIPT)
+
+        # Métricas
+        self.full_saves = 0
+        self.incremental_saves = 0
+        self.touches = 0
+        self.conflicts = 0
+        self.bytes_written = 0
+
+    def close(self):
+        """Fecha as conexões do pool"""
+        close = getattr(self.client, "close", None)
+        if callable(close):
+            close()
+
+    # Interface chave/valor (lotes arquivados, deduplicação)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def setex(self, key, ttl, value):
+        return self.client.setex(key, ttl, value)
+
+    def set(self, key, value, nx=False, ex=None):
+        return self.client.set(key, value, nx=nx, ex=ex)
+
+    def delete(self, key):
+        return self.client.delete(key)
+
+    def expire(self, key, ttl):
+        return self.client.expire(key, ttl)
+
+    # Interface estruturada (usada pelo SessionManager)
+
+    def load_session(self, key):
+        """
+        Lê os campos e o histórico de uma sessão em uma única ida ao servidor
+
+        Args:
+            key (str): Chave da sessão
+
+        Returns:
+            tuple: (campos ou None se não existir, histórico não decodificado)
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.lrange(self._history_key(key), 0, -1)
+        fields, history = pipe.execute()
+
+        if not fields:
+            return None, None
+
+        data = {}
+        for name, value in fields.items():
+            if isinstance(name, bytes):
+                name = name.decode("utf-8")
+            if name in self.DEFERRED_FIELDS:
+                data[name] = RawJson(value.decode("utf-8") if isinstance(value, bytes) else value)
+            else:
+                data[name] = json.loads(value)
+        return data, JsonListHistory(history)
+
+    def save_session(self, key, session, ttl, expected_version):
+        """
+        Grava as alterações de um turno se a versão armazenada for a esperada
+
+        Sessões novas ou reiniciadas são gravadas por inteiro; nas demais,
+        só os campos marcados como alterados e as mensagens acrescentadas.
+
+        Args:
+            key (str): Chave da sessão
+            session: Objeto de sessão (com dirty_fields e appended_messages)
+            ttl (int): Expiração das chaves em segundos
+            expected_version (int): Versão carregada (sessão ausente = 0)
+
+        Returns:
+            int: Bytes enviados ao servidor, ou None se houve conflito de versão
+        """
+        fields = session.header_fields()
+        length = session.history_length()
+        history_key = self._history_key(key)
+        dirty = session.dirty_fields
+
+        full = "new" in dirty or "history_reset" in dirty or session.appended_messages > length
+        if full:
+            names = list(fields)
+            new_messages = session.get_conversation_history()
+        else:
+            names = [name for name in dirty if name in fields]
+            if "version" in fields:
+                names.append("version")
+            if "conversation_history" in dirty:
+                names.extend(name for name in self.HISTORY_COUNTERS if name in fields)
+            # Apenas as mensagens novas (o histórico gravado não é decodificado)
+            new_messages = session.new_messages()
+
+        mapping = {name: encode_field(fields[name]) for name in names}
+        items = [json.dumps(message) for message in new_messages]
+
+        # As chaves são referenciadas pela posição em KEYS
+        commands = []
+        if full:
+            commands.append(("DEL", self.HISTORY_KEY))
+        if mapping:
+            commands.append(("HSET", self.SESSION_KEY, *[part for pair in mapping.items() for part in pair]))
+        if items:
+            commands.append(("RPUSH", self.HISTORY_KEY, *items))
+        if length:
+            # Lista limitada à janela mantida na sessão (o excedente já foi arquivado)
+            commands.append(("LTRIM", self.HISTORY_KEY, -length, -1))
+        commands.append(("EXPIRE", self.SESSION_KEY, ttl))
+        commands.append(("EXPIRE", self.HISTORY_KEY, ttl))
+
+        args = [expected_version]
+        for command in commands:
+            args.append(len(command))
+            args.extend(command)
+
+        if not self._cas(keys=[key, history_key], args=args):
+            self.conflicts += 1
+            return None
+
+        written = sum(len(name) + len(value) for name, value in mapping.items()) + sum(len(item) for item in items)
+        if full:
+            self.full_saves += 1
+        else:
+            self.incremental_saves += 1
+        self.bytes_written += written
+        return written
+
+    def get_version_token(self, key):
+        """
+        Lê apenas a versão e o identificador da sessão (usados pelo cache local)
+
+        O identificador distingue uma sessão recriada após expirar de uma
+        cópia antiga com a mesma versão.
+
+        Returns:
+            tuple: (versão, session_id) ou None se a sessão não existir
+        """
+        version, session_id = self.client.hmget(key, "version", "session_id")
+        if version is None:
+            return None
+        return int(version), json.loads(session_id) if session_id is not None else None
+
+    def touch_session(self, key, ttl):
+        """Renova a expiração de uma sessão sem regravar os dados"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.expire(key, ttl)
+        pipe.expire(self._history_key(key), ttl)
+        pipe.execute()
+        self.touches += 1
+
+    def delete_session(self, key):
+        """Remove os campos e o histórico de uma sessão"""
+        self.client.delete(key, self._history_key(key))
+
+    # Migração entre armazenamentos (rebalanceamento de shards)
+
+    def scan_keys(self, batch_size=500, prefix=""):
+        """
+        Percorre as chaves com SCAN (cursor, sem bloquear o servidor),
+        omitindo as listas de histórico, que acompanham a chave da sessão
+
+        Args:
+            batch_size (int): Chaves sugeridas por ida ao servidor (COUNT)
+            prefix (str): Apenas chaves com este prefixo (MATCH)
+
+        Yields:
+            str: Chave
+        """
+        for key in self.client.scan_iter(match=f"{prefix}*" if prefix else None, count=batch_size):
+            if isinstance(key, bytes):
+                key = key.decode("utf-8")
+            if not key.endswith(":history"):
+                yield key
+
+    def dump_entry(self, key):
+        """
+        Exporta uma chave (e a lista de histórico, se for sessão) com DUMP/PTTL
+
+        Returns:
+            list: [(chave, dados serializados, TTL em ms)] ou None se ausente
+        """
+        names = [key, self._history_key(key)]
+        pipe = self.client.pipeline(transaction=False)
+        for name in names:
+            pipe.dump(name)
+            pipe.pttl(name)
+        results = pipe.execute()
+
+        entry = [
+            (name, data, max(ttl, 0))
+            for name, data, ttl in zip(names, results[0::2], results[1::2])
+            if data is not None
+        ]
+        return entry or None
+
+    def restore_entry(self, key, entry):
+        """
+        Grava as chaves exportadas por dump_entry, se a chave principal ainda
+        não existir (RESTORE sem REPLACE; uma versão mais nova é preservada)
+
+        Returns:
+            bool: True se gravada
+        """
+        (name, data, ttl), *others = entry
+        try:
+            self.client.restore(name, ttl, data)
+        except Exception as e:
+            if "BUSYKEY" in str(e):
+                return False
+            raise
+
+        if others:
+            pipe = self.client.pipeline(transaction=False)
+            for name, data, ttl in others:
+                pipe.restore(name, ttl, data, replace=True)
+            pipe.execute()
+        return True
+
+    def _history_key(self, key):
+        # Hash tag: mesmo slot da chave da sessão no Redis Cluster
+        return f"{{{key}}}:history"
+
+    def stats(self):
+        """Retorna métricas de gravação"""
+        return {
+            "full_saves": self.full_saves,
+            "incremental_saves": self.incremental_saves,
+            "touches": self.touches,
+            "conflicts": self.conflicts,
+            "bytes_written": self.bytes_written
+        }
@@ -0,0 +1,98 @@
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class SessionNearCache:
+    """
+    Cache de sessões local ao processo (LRU) na frente do armazenamento compartilhado.
+
+    Cada entrada guarda a sessão junto com a versão gravada e o identificador
+    da sessão (session_id). A cada leitura, a versão e o identificador atuais
+    (uma consulta pequena) são comparados com os do cache antes de reutilizar
+    a sessão, de modo que o turno nunca decide sobre uma cópia desatualizada.
+    Os commits atualizam o cache (write-through).
+    """
+
+    def __init__(self, max_entries=10000):
+        """
+        Args:
+            max_entries (int): Número máximo de sessões mantidas
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.probes = 0
+
+    def get(self, key, fetch_token):
+        """
+        Retorna a sessão em cache se ainda for a atual
+
+        Args:
+            key (str): Chave da sessão
+            fetch_token: Função que lê (versão, session_id) no armazenamento (None
+                se não existir)
+
+        Returns:
+            Session: Sessão em cache ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+        cached_token, session = entry
+        if session.is_dirty():
+            # Alterações não gravadas (turno interrompido): descartar
+            token = None
+        else:
+            self.probes += 1
+            token = fetch_token(key)
+
+        with self._lock:
+            if token is None or token != cached_token:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                self.stale += 1
+                return None
+
+            if self._entries.get(key) is entry:
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return session
+
+    def put(self, key, token, session):
+        """Guarda a sessão com a versão e o identificador gravados"""
+        with self._lock:
+            self._entries[key] = (token, session)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove uma sessão do cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Retorna métricas do cache"""
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "probes": self.probes,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,104 @@
+import csv
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colunas do relatório (também a ordem no CSV)
+EXPORT_FIELDS = (
+    "channel",
+    "user_id",
+    "session_id",
+    "state",
+    "created_at",
+    "last_activity",
+    "turns",
+    "messages",
+    "identifier_type",
+    "client_status",
+    "escalated",
+    "escalation_reason",
+    "escalated_at",
+)
+
+
+def session_record(session, full_history=True):
+    """
+    Resume uma sessão em um registro plano para relatórios
+
+    Args:
+        session: Objeto de sessão (de SessionManager.iter_sessions)
+        full_history (bool): Conta os turnos também nas mensagens arquivadas
+            (lê os lotes do arquivo); se False, apenas na janela recente
+
+    Returns:
+        dict: Registro com as colunas de EXPORT_FIELDS
+    """
+    fields = session.header_fields()
+    history = session.get_conversation_history()
+    if full_history and fields.get("archive_chunks"):
+        history = session.manager.load_archived_history(session, renew=False) + history
+
+    client_info = session.get_client_info() or {}
+    escalation_info = fields.get("escalation_info") or {}
+
+    return {
+        "channel": session.channel,
+        "user_id": session.user_id,
+        "session_id": fields.get("session_id"),
+        "state": fields.get("state"),
+        "created_at": fields.get("created_at"),
+        "last_activity": history[-1].get("timestamp") if history else None,
+        "turns": sum(1 for message in history if message.get("role") == "user"),
+        "messages": session.history_length() + fields.get("archived_messages", 0),
+        "identifier_type": client_info.get("tipo"),
+        "client_status": (client_info.get("dados") or {}).get("status"),
+        "escalated": bool(escalation_info),
+        "escalation_reason": escalation_info.get("reason"),
+        "escalated_at": escalation_info.get("timestamp"),
+    }
+
+
+def export_sessions(manager, output, output_format="ndjson", batch_size=500, channel=None, full_history=True):
+    """
+    Grava um registro por sessão em 'output', à medida que as sessões são
+    lidas (memória constante, independente do número de sessões)
+
+    Args:
+        manager: SessionManager
+        output: Arquivo de texto aberto para escrita
+        output_format (str): "ndjson" (um JSON por linha) ou "csv"
+        batch_size (int): Chaves lidas por vez do armazenamento
+        channel (str): Apenas sessões deste canal (opcional)
+        full_history (bool): Conta os turnos também nas mensagens arquivadas
+
+    Returns:
+        int: Número de sessões exportadas
+
+    Raises:
+        ValueError: Se o formato não for suportado
+    """
+    if output_format == "ndjson":
+        def write(record):
+            output.write(json.dumps(record, ensure_ascii=False))
+            output.write("\n")
+    elif output_format == "csv":
+        writer = csv.DictWriter(output, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        raise ValueError(f"Formato de exportação não suportado: {output_format}")
+
+    count = 0
+    for session in manager.iter_sessions(batch_size=batch_size, channel=channel):
+        try:
+            record = session_record(session, full_history)
+        except ValueError as e:
+            # Histórico ou campo corrompido: a sessão é ignorada, não a exportação
+            logger.warning(f"Sessão ignorada na exportação ({session.channel}:{session.user_id}): {str(e)}")
+            continue
+        write(record)
+        count += 1
+
+    logger.info(f"Exportação de sessões concluída: {count} sessões ({output_format})")
+    return count
@@ -1,27 +1,74 @@
 import json
-import time
+import logging
 import uuid
-from datetime import datetime, timedelta
+import zlib
+from datetime import datetime
+from src.utils.metrics import STAGE_SECONDS, SESSION_BYTES, SESSION_HISTORY_MESSAGES, SESSION_CONFLICTS_TOTAL
+from src.core.session_store import MemorySessionStore
+from src.core.sharded_session_store import create_sharded_store
+from src.core.session_serializer import JsonSessionSerializer, RawJson
+
+logger = logging.getLogger(__name__)
+
+
+class SessionConflictError(Exception):
+    """A sessão foi gravada por outro worker depois de carregada (versão divergente)"""
+    
+    def __init__(self, key, expected_version):
+        super().__init__(f"Conflito ao gravar {key}: versão {expected_version} não é mais a atual")
+        self.key = key
+        self.expected_version = expected_version
+
 
 class SessionManager:
     """
     Gerencia sessões de usuários através de múltiplos canais.
     Responsável por persistência e recuperação de estado.
+    
+    O histórico mantido na sessão é limitado às mensagens mais recentes
+    (history_window). Mensagens mais antigas são movidas, em lotes, para um
+    arquivo compactado (zlib) gravado em chaves próprias e somente de inclusão,
+    carregado apenas quando necessário (ex: no escalonamento).
     """
     
-    def __init__(self, storage_client=None):
+    def __init__(self, storage_client=None, history_window=20, archive_batch=10, serializer=None, near_cache=None):
         """
         Inicializa gerenciador de sessões
         
         Args:
-            storage_client: Cliente de armazenamento (Redis, MongoDB, etc.)
+            storage_client: Cliente de armazenamento (Redis, MongoDB, etc.). Se expuser
+                load_session/save_session (ex: RedisSessionStore), a sessão é gravada
+                por campo; caso contrário, como um único documento JSON. Uma lista
+                (ou dict nome -> armazenamento) distribui as sessões entre os
+                armazenamentos por hash consistente (ver sharded_session_store)
+            history_window (int): Mensagens recentes mantidas na sessão
+            archive_batch (int): Mensagens excedentes acumuladas antes de arquivar
+            serializer: Formato do documento da sessão (padrão: JSON; ver session_serializer)
+            near_cache: SessionNearCache local ao processo (requer armazenamento com get_version_token)
         """
-        self.storage = storage_client
         self.session_ttl = 24 * 60 * 60  # 24 horas (em segundos)
+        self.history_window = history_window
+        self.archive_batch = archive_batch
+        self.serializer = serializer or JsonSessionSerializer()
+        
+        if isinstance(storage_client, (list, tuple, dict)):
+            storage_client = create_sharded_store(storage_client)
         
-        # Se não houver cliente de armazenamento, usar dicionário em memória (para desenvolvimento)
-        if self.storage is None:
-            self.memory_storage = {}
+        # Se não houver cliente de armazenamento, usar armazenamento em memória do processo
+        self._owns_storage = storage_client is None
+        self.storage = storage_client if storage_client is not None else MemorySessionStore().start()
+        self.structured = hasattr(self.storage, "save_session")
+        
+        # Cache local só faz sentido se a versão puder ser consultada sem ler a sessão
+        self.near_cache = near_cache
+        if near_cache is not None and not hasattr(self.storage, "get_version_token"):
+            logger.warning("Armazenamento sem get_version_token: cache local de sessões desativado")
+            self.near_cache = None
+    
+    def close(self):
+        """Libera o armazenamento em memória criado pelo gerenciador"""
+        if self._owns_storage:
+            self.storage.close()
     
     def get_session(self, channel, user_id):
         """
@@ -34,44 +81,139 @@ class SessionManager:
         Returns:
             Session: Objeto de sessão
         """
+        with STAGE_SECONDS.time("session_load"):
+            return self._load_session(channel, user_id)
+    
+    def _load_session(self, channel, user_id):
+        """Carrega a sessão do cache local, do armazenamento ou cria uma nova"""
         key = self._create_session_key(channel, user_id)
         
-        if self.storage is None:
-            # Usar armazenamento em memória para desenvolvimento
-            session_data = self.memory_storage.get(key)
-        else:
-            # Usar cliente de armazenamento
-            session_data = self.storage.get(key)
+        if self.near_cache is not None:
+            session = self.near_cache.get(key, self.storage.get_version_token)
+            if session is not None:
+                return session
         
-        if session_data:
-            try:
-                if isinstance(session_data, bytes):
-                    session_data = session_data.decode('utf-8')
-                session_dict = json.loads(session_data)
-                return Session(channel, user_id, self, session_dict)
-            except (json.JSONDecodeError, UnicodeDecodeError):
-                # Erro nos dados da sessão, criar nova
-                return self._create_new_session(channel, user_id)
-        else:
-            # Sessão não existe, criar nova
-            return self._create_new_session(channel, user_id)
+        try:
+            fields, history_source = self._load_fields(key)
+        except ValueError:
+            # Erro nos dados da sessão (inclui JSON e UTF-8 inválidos), criar nova
+            fields, history_source = None, None
+        
+        if fields:
+            session = Session(channel, user_id, self, fields, history_source)
+            if self.near_cache is not None:
+                self.near_cache.put(key, self._version_token(session), session)
+            return session
+        # Sessão não existe, criar nova
+        return self._create_new_session(channel, user_id)
+    
+    def _load_fields(self, key, renew=True):
+        """
+        Lê os campos de uma sessão adiando a decodificação do histórico
+        
+        Args:
+            key (str): Chave da sessão
+            renew (bool): Se False, a leitura não renova a expiração (relatórios)
+        
+        Returns:
+            tuple: (campos ou None se não existir, histórico não decodificado ou None)
+        """
+        if self.structured:
+            return self.storage.load_session(key)
+        
+        session_data = self._storage_get(key, renew)
+        if not session_data:
+            return None, None
+        # Os serializadores também leem o JSON gravado pelo formato anterior
+        return self.serializer.loads_lazy(session_data)
     
     def save_session(self, session):
         """
-        Persiste uma sessão
+        Persiste uma sessão com controle de concorrência otimista: a gravação
+        só é aceita se a versão armazenada ainda for a que foi carregada
         
         Args:
             session: Objeto de sessão a ser salvo
+            
+        Raises:
+            SessionConflictError: Se outro worker gravou a sessão nesse intervalo
         """
-        key = self._create_session_key(session.channel, session.user_id)
-        session_data = json.dumps(session.to_dict())
+        with STAGE_SECONDS.time("session_save"):
+            key = self._create_session_key(session.channel, session.user_id)
+            
+            # Versão incrementada a cada gravação (detecta cópias desatualizadas)
+            expected_version = session.fields.get("version", 0)
+            session.fields["version"] = expected_version + 1
+            
+            # O lote arquivado é reservado na sessão e gravado só se ela for aceita,
+            # para que um worker em conflito não sobrescreva o lote de outro
+            chunk_index = None
+            if session.pending_archive:
+                chunk_index = session.fields.get("archive_chunks", 0)
+                session.fields["archive_chunks"] = chunk_index + 1
+            
+            if self.structured:
+                # Apenas campos alterados e mensagens novas
+                written = self.storage.save_session(key, session, self.session_ttl, expected_version)
+                saved = written is not None
+            else:
+                session_data = self.serializer.dumps_session(session)
+                saved = self._storage_cas(key, session_data, expected_version)
+                written = len(session_data)
+            
+            if not saved:
+                session.fields["version"] = expected_version
+                if chunk_index is not None:
+                    session.fields["archive_chunks"] = chunk_index
+                if self.near_cache is not None:
+                    # A cópia em cache (se for esta) está desatualizada
+                    self.near_cache.invalidate(key)
+                SESSION_CONFLICTS_TOTAL.inc()
+                raise SessionConflictError(key, expected_version)
+            
+            if session.discarded_archive_chunks:
+                # Antes do lote novo, que reutiliza os índices a partir de 0
+                for index in range(session.discarded_archive_chunks):
+                    self._storage_delete(self._create_archive_key(key, index))
+                session.discarded_archive_chunks = 0
+            
+            if chunk_index is not None:
+                self._write_archive_chunk(key, chunk_index, session)
         
-        if self.storage is None:
-            # Usar armazenamento em memória para desenvolvimento
-            self.memory_storage[key] = session_data
-        else:
-            # Usar cliente de armazenamento
-            self.storage.setex(key, self.session_ttl, session_data)
+        session.serialized_bytes = written
+        SESSION_BYTES.observe(session.serialized_bytes)
+        SESSION_HISTORY_MESSAGES.observe(session.history_length())
+    
+    def commit_session(self, session):
+        """
+        Persiste as alterações do turno (uma gravação, ou nenhuma se nada mudou)
+        
+        Args:
+            session: Objeto de sessão
+            
+        Returns:
+            bool: True se a sessão foi gravada
+            
+        Raises:
+            SessionConflictError: Se outro worker gravou a sessão depois de carregada
+        """
+        if not session.is_dirty():
+            if self.structured:
+                # Renovar apenas a expiração, sem regravar os dados
+                self.storage.touch_session(self._create_session_key(session.channel, session.user_id), self.session_ttl)
+            return False
+        
+        self.save_session(session)
+        session.mark_clean()
+        if self.near_cache is not None:
+            key = self._create_session_key(session.channel, session.user_id)
+            self.near_cache.put(key, self._version_token(session), session)
+        return True
+    
+    @staticmethod
+    def _version_token(session):
+        """Versão e identificador da sessão, comparados pelo cache local"""
+        return session.fields.get("version", 0), session.fields.get("session_id")
     
     def delete_session(self, channel, user_id):
         """
@@ -82,14 +224,144 @@ class SessionManager:
             user_id: ID do usuário
         """
         key = self._create_session_key(channel, user_id)
+        if self.near_cache is not None:
+            self.near_cache.invalidate(key)
+        
+        # Remover também os lotes arquivados
+        try:
+            fields, _ = self._load_fields(key)
+        except ValueError:
+            fields = None
+        if fields:
+            for index in range(fields.get("archive_chunks", 0)):
+                self._storage_delete(self._create_archive_key(key, index))
         
-        if self.storage is None:
-            # Usar armazenamento em memória para desenvolvimento
-            if key in self.memory_storage:
-                del self.memory_storage[key]
+        if self.structured:
+            self.storage.delete_session(key)
         else:
-            # Usar cliente de armazenamento
-            self.storage.delete(key)
+            self._storage_delete(key)
+    
+    def iter_sessions(self, batch_size=500, channel=None):
+        """
+        Percorre as sessões gravadas sem carregá-las todas de uma vez
+        (SCAN no Redis, paginação pela chave no SQLite, lotes na memória)
+        
+        As leituras não renovam a expiração nem passam pelo cache local, e
+        as sessões retornadas não devem ser gravadas (apenas leitura).
+        
+        Args:
+            batch_size (int): Chaves lidas por vez do armazenamento
+            channel (str): Apenas sessões deste canal (opcional)
+            
+        Returns:
+            Iterador de Session com hidratação preguiçosa
+            
+        Raises:
+            TypeError: Se o armazenamento não permite percorrer as chaves (sem scan_keys)
+        """
+        # Conferido na chamada, e não só na primeira iteração
+        scan_keys = getattr(self.storage, "scan_keys", None)
+        if scan_keys is None:
+            raise TypeError(
+                f"Armazenamento de sessões {type(self.storage).__name__} não permite percorrer as sessões "
+                f"(sem scan_keys); use MemorySessionStore, SQLiteSessionStore ou RedisSessionStore"
+            )
+        
+        prefix = self._create_session_key(channel, "") if channel else "session:"
+        return self._iter_sessions(scan_keys(batch_size, prefix))
+    
+    def _iter_sessions(self, keys):
+        """Carrega, sem renovar a expiração, as sessões das chaves percorridas"""
+        for key in keys:
+            if ":archive:" in key:
+                continue
+            _, key_channel, user_id = key.split(":", 2)
+            try:
+                fields, history_source = self._load_fields(key, renew=False)
+            except ValueError as e:
+                logger.warning(f"Sessão ilegível ignorada na varredura ({key}): {str(e)}")
+                continue
+            # Expirada ou removida entre a varredura e a leitura
+            if fields:
+                yield Session(key_channel, user_id, self, fields, history_source)
+    
+    def trim_history(self, session):
+        """
+        Move as mensagens mais antigas para o arquivo quando o histórico
+        excede history_window + archive_batch
+        
+        Args:
+            session: Objeto de sessão
+        """
+        if session.history_length() <= self.history_window + self.archive_batch:
+            return
+        
+        history = session.get_conversation_history()
+        overflow = len(history) - self.history_window
+        session.pending_archive.extend(history[:overflow])
+        del history[:overflow]
+        session.fields["archived_messages"] = session.fields.get("archived_messages", 0) + overflow
+    
+    def load_archived_history(self, session, renew=True):
+        """
+        Carrega as mensagens arquivadas de uma sessão (mais antigas primeiro)
+        
+        Args:
+            session: Objeto de sessão
+            renew (bool): Se False, as leituras não renovam a expiração dos lotes
+            
+        Returns:
+            list: Mensagens arquivadas (lotes expirados são ignorados)
+        """
+        key = self._create_session_key(session.channel, session.user_id)
+        messages = []
+        for index in range(session.fields.get("archive_chunks", 0)):
+            chunk = self._storage_get(self._create_archive_key(key, index), renew)
+            if chunk:
+                messages.extend(json.loads(zlib.decompress(chunk)))
+        # Lote ainda não gravado (arquivado neste turno)
+        messages.extend(session.pending_archive)
+        return messages
+    
+    def _write_archive_chunk(self, key, index, session):
+        """Grava as mensagens pendentes de arquivamento como o lote 'index' (compactado)"""
+        chunk = zlib.compress(json.dumps(session.pending_archive).encode('utf-8'))
+        self._storage_set(self._create_archive_key(key, index), chunk)
+        session.pending_archive = []
+    
+    def _storage_get(self, key, renew=True):
+        """Lê uma chave do armazenamento (renew=False usa peek, se disponível)"""
+        if not renew:
+            peek = getattr(self.storage, "peek", None)
+            if peek is not None:
+                return peek(key)
+        return self.storage.get(key)
+    
+    def _storage_set(self, key, value):
+        """Grava uma chave no armazenamento com o TTL da sessão"""
+        self.storage.setex(key, self.session_ttl, value)
+    
+    def _storage_cas(self, key, value, expected_version):
+        """
+        Grava a sessão se a versão armazenada for 'expected_version'
+        (armazenamentos sem compare_and_set gravam sem verificação)
+        
+        Returns:
+            bool: True se gravada
+        """
+        compare_and_set = getattr(self.storage, "compare_and_set", None)
+        if compare_and_set is None:
+            self._storage_set(key, value)
+            return True
+        return compare_and_set(key, self.session_ttl, value, expected_version, expected_version + 1)
+    
+    def _storage_delete(self, key):
+        """Remove uma chave do armazenamento"""
+        self.storage.delete(key)
+    
+    def _create_archive_key(self, session_key, index):
+        """Cria chave de um lote do histórico arquivado"""
+        return f"{session_key}:archive:{index}"
     
     def _create_session_key(self, channel, user_id):
         """Cria chave única para a sessão"""
@@ -116,72 +388,191 @@ class SessionManager:
                 "escalation_info": None
             }
         )
-        self.save_session(session)
+        # Sessão nova: gravada por inteiro no primeiro commit
+        session.dirty_fields.update(("new", "state", "client_info", "escalation_info", "conversation_history"))
         return session
 
 
 class Session:
     """
     Representa uma sessão de usuário com todos os dados de estado e histórico.
+    
+    As alterações não são persistidas imediatamente: cada mutação marca os
+    campos alterados e a sessão é gravada uma única vez por turno, em
+    SessionManager.commit_session.
+    
+    A hidratação é preguiçosa: estado e campos pequenos ficam disponíveis de
+    imediato, enquanto o histórico (e campos adiados como client_info) só é
+    decodificado quando lido. Mensagens acrescentadas antes disso ficam em
+    uma lista pendente e podem ser gravadas sem decodificar as anteriores.
     """
     
-    def __init__(self, channel, user_id, manager, data):
+    __slots__ = (
+        "channel", "user_id", "manager", "fields",
+        "_history", "_history_source", "_pending",
+        "dirty_fields", "appended_messages", "pending_archive", "discarded_archive_chunks",
+        "serialized_bytes"
+    )
+    
+    def __init__(self, channel, user_id, manager, data, history_source=None):
+        """
+        Args:
+            data (dict): Campos da sessão (com ou sem 'conversation_history')
+            history_source: Histórico ainda não decodificado (len() e decode()), opcional
+        """
         self.channel = channel
         self.user_id = user_id
         self.manager = manager
-        self.data = data
+        
+        # Campos escalares; o histórico é mantido à parte
+        history = data.pop("conversation_history", None)
+        self.fields = data
+        if history_source is not None:
+            self._history = None
+            self._history_source = history_source
+        else:
+            self._history = history if history is not None else []
+            self._history_source = None
+        self._pending = []
+        
+        # Controle de alterações desde o último commit
+        self.dirty_fields = set()
+        self.appended_messages = 0
+        
+        # Mensagens retiradas da janela e ainda não gravadas no arquivo
+        self.pending_archive = []
+        # Lotes arquivados antes de reset(), removidos quando a sessão for gravada
+        self.discarded_archive_chunks = 0
+        self.serialized_bytes = 0
+    
+    @property
+    def data(self):
+        """Dados completos da sessão (decodifica histórico e campos adiados)"""
+        for key, value in self.fields.items():
+            if isinstance(value, RawJson):
+                self.fields[key] = value.value()
+        data = dict(self.fields)
+        data["conversation_history"] = self.get_conversation_history()
+        return data
+    
+    def is_dirty(self):
+        """Verifica se há alterações não persistidas"""
+        return bool(self.dirty_fields)
+    
+    def mark_clean(self):
+        """Marca a sessão como persistida"""
+        self.dirty_fields.clear()
+        self.appended_messages = 0
+    
+    def _mark_dirty(self, field):
+        """Registra alteração em um campo"""
+        self.dirty_fields.add(field)
+    
+    def is_history_loaded(self):
+        """Verifica se o histórico já foi decodificado"""
+        return self._history is not None
+    
+    def history_length(self):
+        """Quantidade de mensagens no histórico recente, sem decodificá-lo"""
+        if self._history is not None:
+            return len(self._history)
+        return len(self._history_source) + len(self._pending)
+    
+    def history_parts(self):
+        """Retorna (histórico não decodificado ou None, mensagens acrescentadas a ele)"""
+        if self._history is not None:
+            return None, self._history
+        return self._history_source, self._pending
+    
+    def new_messages(self):
+        """Mensagens acrescentadas desde o último commit"""
+        if not self.appended_messages:
+            return []
+        if self._history is None and self.appended_messages <= len(self._pending):
+            return self._pending[len(self._pending) - self.appended_messages:]
+        history = self.get_conversation_history()
+        return history[max(0, len(history) - self.appended_messages):]
+    
+    def header_fields(self):
+        """Campos da sessão sem o histórico (campos adiados seguem sem decodificar)"""
+        return self.fields
     
     def get_state(self):
         """Retorna estado atual da sessão"""
-        return self.data.get("state", "awaiting_identifier")
+        return self.fields.get("state", "awaiting_identifier")
     
     def set_state(self, new_state):
         """Atualiza estado da sessão"""
-        self.data["state"] = new_state
-        self.manager.save_session(self)
+        if self.fields.get("state") == new_state:
+            return
+        self.fields["state"] = new_state
+        self._mark_dirty("state")
     
     def add_message(self, role, content):
         """Adiciona mensagem ao histórico"""
-        if "conversation_history" not in self.data:
-            self.data["conversation_history"] = []
-            
-        self.data["conversation_history"].append({
+        message = {
             "role": role,
             "content": content,
             "timestamp": datetime.now().isoformat()
-        })
-        self.manager.save_session(self)
+        }
+        if self._history is None:
+            self._pending.append(message)
+        else:
+            self._history.append(message)
+        self.appended_messages += 1
+        self._mark_dirty("conversation_history")
+        self.manager.trim_history(self)
     
     def get_conversation_history(self):
-        """Retorna histórico de conversa"""
-        return self.data.get("conversation_history", [])
+        """Retorna histórico de conversa recente (janela mantida na sessão)"""
+        if self._history is None:
+            self._history = self._history_source.decode() + self._pending
+            self._history_source = None
+            self._pending = []
+        return self._history
+    
+    def get_full_history(self):
+        """Retorna histórico completo, incluindo mensagens arquivadas"""
+        return self.manager.load_archived_history(self) + self.get_conversation_history()
+    
+    def size_stats(self):
+        """Retorna métricas de tamanho da sessão"""
+        return {
+            "hot_messages": self.history_length(),
+            "archived_messages": self.fields.get("archived_messages", 0),
+            "archive_chunks": self.fields.get("archive_chunks", 0),
+            "serialized_bytes": self.serialized_bytes
+        }
     
     def update_client_info(self, client_data):
         """Atualiza informações do cliente"""
-        self.data["client_info"] = client_data
-        self.manager.save_session(self)
+        self.fields["client_info"] = client_data
+        self._mark_dirty("client_info")
     
     def get_client_info(self):
         """Retorna informações do cliente"""
-        return self.data.get("client_info")
+        value = self.fields.get("client_info")
+        if isinstance(value, RawJson):
+            value = self.fields["client_info"] = value.value()
+        return value
     
     def has_client_info(self):
         """Verifica se tem informações do cliente"""
-        return self.data.get("client_info") is not None
+        return self.get_client_info() is not None
     
     def set_escalation_reason(self, reason):
         """Registra motivo de escalonamento"""
-        if "escalation_info" not in self.data:
-            self.data["escalation_info"] = {}
+        if not self.fields.get("escalation_info"):
+            self.fields["escalation_info"] = {}
         
-        self.data["escalation_info"]["reason"] = reason
-        self.data["escalation_info"]["timestamp"] = datetime.now().isoformat()
-        self.manager.save_session(self)
+        self.fields["escalation_info"]["reason"] = reason
+        self.fields["escalation_info"]["timestamp"] = datetime.now().isoformat()
+        self._mark_dirty("escalation_info")
     
     def get_escalation_id(self):
         """Retorna ID de escalonamento para atendente"""
-        if "escalation_info" in self.data:
-            return self.data["escalation_info"].get("id")
+        if self.fields.get("escalation_info"):
+            return self.fields["escalation_info"].get("id")
         return None
     
     def to_dict(self):
@@ -190,14 +581,23 @@ class Session:
     
     def reset(self):
         """Reinicia a sessão"""
-        self.data["state"] = "awaiting_identifier"
-        self.data["client_info"] = None
-        self.data["escalation_info"] = None
-        self.data["conversation_history"] = [
+        self.fields["state"] = "awaiting_identifier"
+        self.fields["client_info"] = None
+        self.fields["escalation_info"] = None
+        self._history = [
             {
                 "role": "assistant",
                 "content": "Olá! Sou o assistente virtual da CarGlass. Por favor, informe seu CPF, telefone, placa, ordem de serviço ou chassi para que eu possa te ajudar.",
                 "timestamp": datetime.now().isoformat()
             }
         ]
-        self.manager.save_session(self)
+        self._history_source = None
+        self._pending = []
+        # Histórico substituído (não apenas acrescido); os lotes antigos são
+        # removidos depois que a sessão reiniciada for aceita
+        self.discarded_archive_chunks = max(self.discarded_archive_chunks, self.fields.get("archive_chunks", 0))
+        self.fields["archived_messages"] = 0
+        self.fields["archive_chunks"] = 0
+        self.pending_archive = []
+        self.appended_messages = 0
+        self.dirty_fields.update(("state", "client_info", "escalation_info", "conversation_history", "history_reset"))
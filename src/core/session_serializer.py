@@ -0,0 +1,495 @@
+import json
+import struct
+from datetime import datetime, timedelta
+
+
+class RawJson:
+    """
+    Campo da sessão ainda não decodificado (ex: client_info).
+    Guarda o texto JSON original, decodificado apenas no primeiro acesso
+    e regravado sem recodificação se não for alterado.
+    """
+
+    __slots__ = ("text", "_value", "_decoded")
+
+    def __init__(self, text):
+        self.text = text
+        self._value = None
+        self._decoded = False
+
+    def value(self):
+        if not self._decoded:
+            self._value = json.loads(self.text)
+            self._decoded = True
+        return self._value
+
+
+def resolve(value):
+    """Valor decodificado de um campo (RawJson ou valor comum)"""
+    return value.value() if isinstance(value, RawJson) else value
+
+
+def encode_field(value):
+    """Texto JSON de um campo, reaproveitando o texto original de RawJson"""
+    return value.text if isinstance(value, RawJson) else json.dumps(value, separators=(",", ":"))
+
+
+class JsonListHistory:
+    """Histórico como lista de mensagens JSON ainda não decodificadas (ex: lista do Redis)"""
+
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def decode(self):
+        return [json.loads(item) for item in self.items]
+
+
+class JsonSessionSerializer:
+    """
+    Serialização da sessão como documento JSON (formato original).
+
+    O documento continua sendo JSON comum, mas é gravado em linhas: a
+    primeira com o cabeçalho (estado e campos pequenos), depois uma linha por
+    campo adiado (client_info) e uma por mensagem do histórico. Como
+    json.dumps não produz quebras de linha dentro dos valores, a leitura
+    separa as linhas e decodifica só o cabeçalho; campos adiados e mensagens
+    ficam como texto até serem acessados, e mensagens novas são acrescentadas
+    sem recodificar as anteriores. Documentos em uma linha só (gravados antes
+    deste layout) são decodificados por inteiro.
+    """
+
+    name = "json"
+
+    DEFERRED_FIELDS = ("client_info",)
+    HISTORY_FIELD = "conversation_history"
+
+    def dumps(self, data):
+        """
+        Serializa os dados da sessão
+
+        Args:
+            data (dict): Dados da sessão
+
+        Returns:
+            str: Documento JSON
+        """
+        fields = {key: value for key, value in data.items() if key != self.HISTORY_FIELD}
+        history = [json.dumps(message) for message in data.get(self.HISTORY_FIELD, [])]
+        return self._write(fields, history)
+
+    def dumps_session(self, session):
+        """
+        Serializa um objeto Session; se o histórico não foi decodificado, as
+        mensagens gravadas são copiadas como texto e só as novas são codificadas
+        """
+        source, pending = session.history_parts()
+        if isinstance(source, JsonListHistory):
+            items = [item if isinstance(item, str) else item.decode('utf-8') for item in source.items]
+            items.extend(json.dumps(message) for message in pending)
+        else:
+            items = [json.dumps(message) for message in session.get_conversation_history()]
+        return self._write(session.header_fields(), items)
+
+    def loads(self, raw):
+        """Desserializa um documento JSON (str ou bytes)"""
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        return json.loads(raw)
+
+    def loads_lazy(self, raw):
+        """
+        Decodifica o cabeçalho, adiando campos grandes e o histórico
+
+        Returns:
+            tuple: (campos, JsonListHistory); para documentos sem o layout em
+                linhas retorna (dados completos, None)
+        """
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        lines = raw.split("\n")
+        history_line = f'"{self.HISTORY_FIELD}":['
+        if len(lines) < 3 or lines[-1] != "]}" or history_line not in lines:
+            return self.loads(raw), None
+
+        header = lines[0]
+        fields = json.loads((header[:-1] if header.endswith(",") else header) + "}")
+
+        history_at = lines.index(history_line)
+        for line in lines[1:history_at]:
+            # "nome":valor,
+            name, end = json.decoder.scanstring(line, 1)
+            fields[name] = RawJson(line[end + 1:-1])
+
+        items = lines[history_at + 1:-1]
+        # Todas as mensagens, menos a última, terminam com a vírgula separadora
+        items = [item[:-1] for item in items[:-1]] + items[-1:]
+        return fields, JsonListHistory(items)
+
+    def _write(self, fields, history):
+        """Monta o documento: cabeçalho, campos adiados e histórico em linhas próprias"""
+        header = {}
+        lines = []
+        for key, value in fields.items():
+            if key in self.DEFERRED_FIELDS:
+                lines.append(f"{json.dumps(key)}:{encode_field(value)},")
+            else:
+                header[key] = resolve(value)
+
+        text = json.dumps(header)
+        lines.insert(0, text[:-1] + ("," if header else ""))
+        lines.append(f'"{self.HISTORY_FIELD}":[')
+        if history:
+            lines.append(",\n".join(history))
+        lines.append("]}")
+        return "\n".join(lines)
+
+
+class BinarySessionSerializer:
+    """
+    Serialização binária compacta e versionada da sessão.
+
+    Layout (versão 2):
+        magic "CGS" | versão (1 byte) | estado | cabeçalho JSON | campos adiados | histórico
+
+    - estado: código de 1 byte (255 = texto livre a seguir)
+    - cabeçalho: campos pequenos (session_id, escalation_info, ...) em JSON compacto
+    - campos adiados: campos grandes (client_info), cada um em JSON próprio,
+      decodificados só quando acessados
+    - histórico em colunas: papéis (1 byte cada), timestamps em microssegundos
+      desde a época (int64), tamanhos e textos concatenados em UTF-8; mensagens
+      fora do padrão (papel desconhecido, campos extras...) seguem em JSON
+
+    Estado e cabeçalho podem ser lidos sem decodificar o histórico, e mensagens
+    novas são acrescentadas às colunas gravadas sem decodificá-las. Dados sem o
+    magic são lidos como JSON, mantendo compatibilidade com sessões gravadas no
+    formato anterior; a versão 1 (sem campos adiados) continua legível.
+
+    Custo: o documento fica com cerca de metade dos bytes do JSON, mas
+    decodificar o histórico inteiro leva cerca de 2x mais CPU (conversão dos
+    timestamps mensagem a mensagem; ver
+    benchmarks/bench_session_serialization.py). Compensa quando a rede ou a
+    memória do armazenamento são o gargalo; por isso o JSON continua sendo o
+    formato padrão (os dois formatos hidratam a sessão de forma preguiçosa).
+    """
+
+    name = "binary"
+
+    MAGIC = b"CGS"
+    VERSION = 2
+    READABLE_VERSIONS = (1, 2)
+
+    STATES = ("awaiting_identifier", "awaiting_followup", "escalated")
+    ROLES = ("user", "assistant", "system")
+    DEFERRED_FIELDS = ("client_info",)
+
+    CUSTOM_STATE = 255
+
+    _EPOCH = datetime(1970, 1, 1)
+    _MICROSECOND = timedelta(microseconds=1)
+
+    def __init__(self):
+        self._state_codes = {state: code for code, state in enumerate(self.STATES)}
+        self._role_codes = {role: code for code, role in enumerate(self.ROLES)}
+        self._json = JsonSessionSerializer()
+
+    def dumps(self, data):
+        """
+        Serializa os dados da sessão
+
+        Args:
+            data (dict): Dados da sessão
+
+        Returns:
+            bytes: Sessão no formato binário
+        """
+        fields = {key: value for key, value in data.items() if key != "conversation_history"}
+        out = self._write_fields(fields)
+        self._write_history(out, data.get("conversation_history", []))
+        return bytes(out)
+
+    def dumps_session(self, session):
+        """
+        Serializa um objeto Session; se o histórico não foi decodificado,
+        as mensagens novas são acrescentadas às colunas já gravadas
+        """
+        out = self._write_fields(session.header_fields())
+        source, pending = session.history_parts()
+        if isinstance(source, EncodedHistory) and source.serializer is self:
+            source.write_appended(out, pending)
+        else:
+            self._write_history(out, session.get_conversation_history())
+        return bytes(out)
+
+    def loads(self, raw):
+        """Desserializa uma sessão (binária ou JSON do formato anterior)"""
+        fields, history = self.loads_lazy(raw)
+        if history is None:
+            return fields
+
+        data = {key: resolve(value) for key, value in fields.items()}
+        data["conversation_history"] = history.decode()
+        return data
+
+    def loads_lazy(self, raw):
+        """
+        Decodifica estado e cabeçalho, adiando campos grandes e o histórico
+
+        Returns:
+            tuple: (campos, EncodedHistory); para sessões JSON retorna
+                (dados completos, None)
+        """
+        if isinstance(raw, str):
+            raw = raw.encode('utf-8')
+        if not raw.startswith(self.MAGIC):
+            return self._json.loads_lazy(raw)
+
+        view = memoryview(raw)
+        try:
+            version = view[3]
+            if version not in self.READABLE_VERSIONS:
+                raise ValueError(f"Versão de sessão não suportada: {version}")
+
+            code = view[4]
+            offset = 5
+            if code == self.CUSTOM_STATE:
+                text, offset = self._read_text(view, offset)
+                state = json.loads(text)
+            else:
+                state = self.STATES[code]
+
+            text, offset = self._read_text(view, offset)
+            fields = json.loads(text)
+            fields["state"] = state
+
+            if version >= 2:
+                count, offset = self._read_varint(view, offset)
+                for _ in range(count):
+                    name, offset = self._read_text(view, offset)
+                    text, offset = self._read_text(view, offset)
+                    fields[name] = RawJson(text)
+
+            return fields, EncodedHistory(self, view, offset)
+        except (IndexError, struct.error) as e:
+            raise ValueError(f"Sessão binária corrompida: {str(e)}")
+
+    def _write_fields(self, fields):
+        out = bytearray(self.MAGIC)
+        out.append(self.VERSION)
+
+        state = fields.get("state")
+        code = self._state_codes.get(state)
+        if code is None:
+            out.append(self.CUSTOM_STATE)
+            self._write_text(out, json.dumps(state))
+        else:
+            out.append(code)
+
+        header = {}
+        deferred = []
+        for key, value in fields.items():
+            if key == "state":
+                continue
+            if key in self.DEFERRED_FIELDS:
+                deferred.append((key, encode_field(value)))
+            else:
+                header[key] = resolve(value)
+        self._write_text(out, json.dumps(header, separators=(",", ":")))
+
+        self._write_varint(out, len(deferred))
+        for key, text in deferred:
+            self._write_text(out, key)
+            self._write_text(out, text)
+        return out
+
+    def _encode_columns(self, history, first_index=0):
+        """Converte mensagens nas colunas do formato (papéis, timestamps, tamanhos, texto, irregulares)"""
+        count = len(history)
+        roles = bytearray(count)
+        micros = [0] * count
+        texts = [""] * count
+        irregular = {}
+
+        role_codes = self._role_codes
+        for index, message in enumerate(history):
+            role = role_codes.get(message.get("role"))
+            content = message.get("content")
+            stamp = self._to_micros(message.get("timestamp"))
+            if role is None or stamp is None or not isinstance(content, str) or len(message) != 3:
+                # Mensagem fora do padrão: guardada por inteiro em JSON
+                irregular[str(first_index + index)] = message
+                continue
+            roles[index] = role
+            micros[index] = stamp
+            texts[index] = content
+
+        return (
+            roles,
+            struct.pack(f"<{count}q", *micros),
+            # Tamanhos em caracteres: o texto concatenado é decodificado de uma vez
+            struct.pack(f"<{count}I", *map(len, texts)),
+            "".join(texts).encode('utf-8'),
+            irregular
+        )
+
+    def _write_history(self, out, history):
+        roles, micros, lengths, text, irregular = self._encode_columns(history)
+        self._write_columns(out, len(history), roles, micros, lengths, text, irregular)
+
+    def _write_columns(self, out, count, roles, micros, lengths, text, irregular):
+        self._write_varint(out, count)
+        out += roles
+        out += micros
+        out += lengths
+        self._write_varint(out, len(text))
+        out += text
+        self._write_text(out, json.dumps(irregular, separators=(",", ":")) if irregular else "")
+
+    def _decode_columns(self, count, roles, micros, lengths, text, irregular):
+        micros = struct.unpack(f"<{count}q", micros)
+        lengths = struct.unpack(f"<{count}I", lengths)
+        text = str(text, 'utf-8')
+
+        names = self.ROLES
+        epoch = self._EPOCH
+        microsecond = self._MICROSECOND
+        history = []
+        position = 0
+        for role, stamp, length in zip(roles, micros, lengths):
+            end = position + length
+            history.append({
+                "role": names[role],
+                "content": text[position:end],
+                "timestamp": (epoch + stamp * microsecond).isoformat()
+            })
+            position = end
+
+        if irregular:
+            for index, message in json.loads(irregular).items():
+                history[int(index)] = message
+        return history
+
+    def _to_micros(self, timestamp):
+        """ISO 8601 sem fuso -> microssegundos desde a época (None se não reversível)"""
+        if not isinstance(timestamp, str):
+            return None
+        try:
+            moment = datetime.fromisoformat(timestamp)
+        except ValueError:
+            return None
+        if moment.tzinfo is not None or moment.isoformat() != timestamp:
+            return None
+        return (moment - self._EPOCH) // self._MICROSECOND
+
+    @staticmethod
+    def _write_varint(out, value):
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+
+    @staticmethod
+    def _read_varint(view, offset):
+        value = 0
+        shift = 0
+        while True:
+            byte = view[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value, offset
+            shift += 7
+
+    def _write_text(self, out, text):
+        encoded = text.encode('utf-8')
+        self._write_varint(out, len(encoded))
+        out += encoded
+
+    def _read_bytes(self, view, offset):
+        length, offset = self._read_varint(view, offset)
+        end = offset + length
+        if end > len(view):
+            raise IndexError("texto excede o tamanho da sessão")
+        return view[offset:end], end
+
+    def _read_text(self, view, offset):
+        data, offset = self._read_bytes(view, offset)
+        return str(data, 'utf-8'), offset
+
+
+class EncodedHistory:
+    """
+    Histórico no formato binário ainda não decodificado.
+    Localiza as colunas sem percorrer as mensagens: o tamanho é conhecido de
+    imediato e mensagens novas podem ser acrescentadas sem decodificar as antigas.
+    """
+
+    __slots__ = ("serializer", "count", "roles", "micros", "lengths", "text", "irregular")
+
+    def __init__(self, serializer, view, offset):
+        self.serializer = serializer
+        count, offset = serializer._read_varint(view, offset)
+        self.count = count
+        self.roles = view[offset:offset + count]
+        offset += count
+        self.micros = view[offset:offset + 8 * count]
+        offset += 8 * count
+        self.lengths = view[offset:offset + 4 * count]
+        offset += 4 * count
+        if len(self.lengths) != 4 * count:
+            raise IndexError("colunas do histórico incompletas")
+        self.text, offset = serializer._read_bytes(view, offset)
+        self.irregular, offset = serializer._read_text(view, offset)
+
+    def __len__(self):
+        return self.count
+
+    def decode(self):
+        """Decodifica todas as mensagens"""
+        try:
+            return self.serializer._decode_columns(
+                self.count, self.roles, self.micros, self.lengths, self.text, self.irregular
+            )
+        except (IndexError, struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Sessão binária corrompida: {str(e)}")
+
+    def write_appended(self, out, messages):
+        """Grava as colunas deste histórico acrescidas de 'messages'"""
+        roles, micros, lengths, text, irregular = self.serializer._encode_columns(messages, self.count)
+        if self.irregular:
+            irregular = {**json.loads(self.irregular), **irregular}
+        self.serializer._write_columns(
+            out,
+            self.count + len(messages),
+            bytes(self.roles) + roles,
+            bytes(self.micros) + micros,
+            bytes(self.lengths) + lengths,
+            bytes(self.text) + text,
+            irregular
+        )
+
+
+SERIALIZERS = {
+    JsonSessionSerializer.name: JsonSessionSerializer,
+    BinarySessionSerializer.name: BinarySessionSerializer
+}
+
+
+def get_serializer(name="json"):
+    """
+    Retorna o serializador de sessões pelo nome
+
+    Args:
+        name (str): 'json' (padrão, menor custo de CPU) ou 'binary' (cerca de
+            metade dos bytes, codificação mais lenta)
+
+    Returns:
+        Serializador com dumps/loads
+    """
+    if name not in SERIALIZERS:
+        raise ValueError(f"Formato de sessão desconhecido: {name}")
+    return SERIALIZERS[name]()
@@ -0,0 +1,261 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class MemorySessionStore:
+    """
+    Armazenamento de sessões em memória do processo.
+    Implementa a mesma interface básica do Redis (get/setex/delete/expire) com:
+    - gravação condicional por versão (compare_and_set)
+    - TTL deslizante: cada leitura renova a expiração da chave
+    - limite LRU por número de chaves e por bytes aproximados
+    - varredura de chaves expiradas em thread de segundo plano
+    """
+
+    # Custo fixo aproximado (bytes) de cada entrada além da chave e do valor
+    ENTRY_OVERHEAD = 120
+
+    def __init__(self, max_entries=100000, max_bytes=256 * 1024 * 1024, sweep_interval=60.0, sweep_batch=500):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            max_entries (int): Número máximo de chaves (0 = ilimitado)
+            max_bytes (int): Tamanho máximo aproximado em bytes (0 = ilimitado)
+            sweep_interval (float): Intervalo (s) entre varreduras de expiração
+            sweep_batch (int): Chaves verificadas por vez durante a varredura
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+
+        # chave -> [valor, ttl, expira_em, bytes, versão]; ordem = menos recente primeiro
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self._stop = threading.Event()
+        self._sweeper = None
+
+        # Métricas
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def start(self):
+        """Inicia a thread de varredura de chaves expiradas"""
+        if self._sweeper is None and self.sweep_interval:
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+            self._sweeper.start()
+        return self
+
+    def close(self):
+        """Interrompe a thread de varredura"""
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def get(self, key):
+        """Lê uma chave renovando sua expiração (None se ausente ou expirada)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[2] <= now:
+                self._remove(key)
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            entry[2] = now + entry[1]
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def setex(self, key, ttl, value):
+        """Grava uma chave com expiração em 'ttl' segundos"""
+        with self._lock:
+            self._store(key, ttl, value, None)
+
+    def compare_and_set(self, key, ttl, value, expected_version, new_version):
+        """
+        Grava a chave somente se a versão atual for 'expected_version'
+        (chave ausente ou expirada equivale à versão 0)
+
+        Returns:
+            bool: True se gravada
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            current = 0
+            if entry is not None and entry[2] > now:
+                current = entry[4] or 0
+            if current != expected_version:
+                return False
+            self._store(key, ttl, value, new_version)
+            return True
+
+    def _store(self, key, ttl, value, version):
+        """Grava uma entrada (com o lock adquirido)"""
+        size = len(key) + len(value) + self.ENTRY_OVERHEAD
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = [value, ttl, time.monotonic() + ttl, size, version]
+        self.bytes += size
+        self._enforce_limits()
+
+    def expire(self, key, ttl):
+        """Renova a expiração de uma chave sem regravar o valor"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False
+            entry[1] = ttl
+            entry[2] = time.monotonic() + ttl
+            return True
+
+    def delete(self, key):
+        """Remove uma chave"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def peek(self, key):
+        """Lê uma chave sem renovar a expiração nem a posição LRU (leituras de relatórios)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def scan_keys(self, batch_size=500, prefix=""):
+        """
+        Percorre as chaves válidas em lotes, liberando o lock entre os lotes
+
+        Args:
+            batch_size (int): Chaves verificadas por vez
+            prefix (str): Apenas chaves com este prefixo
+
+        Yields:
+            str: Chave (as gravadas durante a varredura podem não aparecer)
+        """
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+
+        for start in range(0, len(keys), batch_size):
+            now = time.monotonic()
+            with self._lock:
+                batch = [
+                    key for key in keys[start:start + batch_size]
+                    if key in self._data and self._data[key][2] > now
+                ]
+            yield from batch
+
+    def dump_entry(self, key):
+        """
+        Exporta uma chave para migração entre armazenamentos
+
+        Returns:
+            tuple: (valor, TTL restante em segundos, versão) ou None se ausente
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[2] <= now:
+                return None
+            return entry[0], entry[2] - now, entry[4]
+
+    def restore_entry(self, key, entry):
+        """
+        Grava uma chave exportada por dump_entry, se ela ainda não existir
+        (uma versão mais nova já gravada no destino é preservada)
+
+        Returns:
+            bool: True se gravada
+        """
+        value, ttl, version = entry
+        now = time.monotonic()
+        with self._lock:
+            current = self._data.get(key)
+            if current is not None and current[2] > now:
+                return False
+            self._store(key, ttl, value, version)
+            return True
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key):
+        """Remove uma chave (com o lock adquirido)"""
+        entry = self._data.pop(key)
+        self.bytes -= entry[3]
+
+    def _enforce_limits(self):
+        """Descarta as chaves menos usadas até respeitar os limites (com o lock adquirido)"""
+        while self._data and (
+            (self.max_entries and len(self._data) > self.max_entries) or
+            (self.max_bytes and self.bytes > self.max_bytes)
+        ):
+            key = next(iter(self._data))
+            self._remove(key)
+            self.evicted += 1
+
+    def sweep(self):
+        """
+        Remove chaves expiradas em lotes, liberando o lock entre os lotes
+        para não bloquear as requisições
+
+        Returns:
+            int: Número de chaves removidas
+        """
+        with self._lock:
+            keys = list(self._data.keys())
+
+        removed = 0
+        for start in range(0, len(keys), self.sweep_batch):
+            now = time.monotonic()
+            with self._lock:
+                for key in keys[start:start + self.sweep_batch]:
+                    entry = self._data.get(key)
+                    if entry is not None and entry[2] <= now:
+                        self._remove(key)
+                        self.expired += 1
+                        removed += 1
+            if self._stop.is_set():
+                break
+
+        return removed
+
+    def _sweep_loop(self):
+        """Executa varreduras periódicas até close()"""
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.debug(f"Varredura de sessões: {removed} chaves expiradas removidas")
+            except Exception as e:
+                logger.error(f"Erro na varredura de sessões: {str(e)}")
+
+    def stats(self):
+        """Retorna métricas do armazenamento"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
@@ -0,0 +1,364 @@
+import bisect
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class ConsistentHashRing:
+    """
+    Anel de hash consistente com nós virtuais.
+
+    Cada shard ocupa 'vnodes' posições no anel; uma chave pertence ao primeiro
+    nó virtual a partir do seu hash. Incluir ou remover um shard move apenas
+    cerca de 1/N das chaves (as que passam a pertencer ao shard novo, ou as
+    que pertenciam ao removido).
+    """
+
+    def __init__(self, nodes=(), vnodes=160):
+        """
+        Inicializa o anel
+
+        Args:
+            nodes: Nomes dos shards
+            vnodes (int): Nós virtuais por shard (mais nós = distribuição mais uniforme)
+        """
+        self.vnodes = vnodes
+        self._nodes = set()
+        self._positions = []
+        self._owners = []
+        for node in nodes:
+            self.add_node(node)
+
+    @staticmethod
+    def _hash(value):
+        return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+    @property
+    def nodes(self):
+        return sorted(self._nodes)
+
+    def add_node(self, node):
+        """Inclui um shard no anel"""
+        if node in self._nodes:
+            raise ValueError(f"Shard já existe no anel: {node}")
+        self._nodes.add(node)
+        for i in range(self.vnodes):
+            position = self._hash(f"{node}#{i}")
+            index = bisect.bisect(self._positions, position)
+            self._positions.insert(index, position)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node):
+        """Remove um shard do anel"""
+        if node not in self._nodes:
+            raise ValueError(f"Shard não existe no anel: {node}")
+        self._nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._positions, self._owners) if o != node]
+        self._positions = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key):
+        """Retorna o shard responsável pela chave"""
+        if not self._positions:
+            raise ValueError("Anel de hash sem shards")
+        index = bisect.bisect(self._positions, self._hash(key)) % len(self._positions)
+        return self._owners[index]
+
+    def copy(self):
+        ring = ConsistentHashRing(vnodes=self.vnodes)
+        ring._nodes = set(self._nodes)
+        ring._positions = list(self._positions)
+        ring._owners = list(self._owners)
+        return ring
+
+    def __len__(self):
+        return len(self._nodes)
+
+
+def route_key(key):
+    """
+    Parte da chave usada no roteamento: os lotes arquivados
+    (session:{canal}:{usuário}:archive:{n}) ficam no shard da sessão
+    """
+    return key.split(":archive:", 1)[0]
+
+
+def _named(shards):
+    """Aceita dict nome -> armazenamento ou lista (nomes shard-0, shard-1...)"""
+    if isinstance(shards, dict):
+        return dict(shards)
+    return {f"shard-{i}": store for i, store in enumerate(shards)}
+
+
+class ShardedSessionStore:
+    """
+    Distribui as chaves de sessão entre vários armazenamentos (memória, SQLite
+    ou Redis) por hash consistente, com a mesma interface de um armazenamento
+    único (get/setex/set/delete/expire/compare_and_set).
+
+    Mudanças de topologia (add_shard/remove_shard, ou 'previous' com a
+    configuração anterior após um reinício) deixam o anel anterior ativo até
+    rebalance() terminar: nesse período, cada chave acessada que mudou de
+    dono é migrada antes da operação, de forma que nenhuma sessão "some".
+    A migração só grava no destino se a chave ainda não existir lá
+    (restore_entry), preservando gravações mais novas de outros processos.
+    Cada chave é conferida na origem uma única vez por processo, sob um lock
+    do seu grupo (locks distribuídos por hash da chave), de forma que acessos
+    a chaves diferentes não esperam uns pelos outros.
+    """
+
+    # Locks de migração (por hash da chave) e chaves já conferidas lembradas
+    MIGRATION_LOCKS = 64
+    MAX_SETTLED_KEYS = 100000
+
+    def __init__(self, shards, vnodes=160, previous=None):
+        """
+        Inicializa o armazenamento distribuído
+
+        Args:
+            shards: dict nome -> armazenamento (ou lista) com a topologia atual
+            vnodes (int): Nós virtuais por shard
+            previous: Topologia anterior (dict ou lista) enquanto o rebalanceamento
+                não terminou; os shards que não estão em 'shards' são tratados
+                como removidos (ainda lidos para migrar suas chaves)
+        """
+        self.shards = _named(shards)
+        if not self.shards:
+            raise ValueError("É necessário ao menos um shard")
+        self.ring = ConsistentHashRing(self.shards, vnodes)
+
+        self._previous = None
+        self._retired = {}
+        if previous is not None:
+            previous = _named(previous)
+            self._previous = ConsistentHashRing(previous, vnodes)
+            self._retired = {name: store for name, store in previous.items() if name not in self.shards}
+
+        self._migration_locks = [threading.Lock() for _ in range(self.MIGRATION_LOCKS)]
+        # Chaves já migradas (ou ausentes na origem) desde a mudança de topologia
+        self._settled = set()
+
+        # Métricas
+        self.migrated = 0
+
+    @property
+    def rebalancing(self):
+        """True enquanto houver chaves possivelmente fora do shard responsável"""
+        return self._previous is not None
+
+    def close(self):
+        """Fecha todos os shards (inclusive os removidos ainda não esvaziados)"""
+        for store in list(self.shards.values()) + list(self._retired.values()):
+            close = getattr(store, "close", None)
+            if callable(close):
+                close()
+
+    # Roteamento
+
+    def shard_for(self, key):
+        """Nome do shard responsável pela chave na topologia atual"""
+        return self.ring.node_for(route_key(key))
+
+    def _store_for(self, key):
+        """Armazenamento responsável pela chave, migrando-a antes se mudou de dono"""
+        route = route_key(key)
+        name = self.ring.node_for(route)
+        store = self.shards[name]
+
+        previous = self._previous
+        if previous is not None:
+            old = previous.node_for(route)
+            if old != name and key not in self._settled:
+                self._migrate(key, self._shard(old), store)
+        return store
+
+    def _shard(self, name):
+        store = self.shards.get(name)
+        return store if store is not None else self._retired[name]
+
+    def _migrate(self, key, source, target):
+        """
+        Move uma chave entre shards (sem efeito se ela já não estiver na origem)
+
+        Com o anel atual, nenhum processo grava a chave na origem: depois de
+        conferida, ela não precisa ser lida lá de novo até a próxima mudança.
+
+        Returns:
+            bool: True se a chave foi copiada para o destino
+        """
+        lock = self._migration_locks[hash(key) % self.MIGRATION_LOCKS]
+        with lock:
+            if key in self._settled:
+                return False
+            entry = source.dump_entry(key)
+            restored = False
+            if entry is not None:
+                restored = target.restore_entry(key, entry)
+                # Se o destino já tinha a chave, a cópia da origem é a mais antiga
+                delete_session = getattr(source, "delete_session", None)
+                if delete_session is not None:
+                    delete_session(key)
+                else:
+                    source.delete(key)
+                if restored:
+                    self.migrated += 1
+
+            if len(self._settled) >= self.MAX_SETTLED_KEYS:
+                # Limite de memória: as chaves esquecidas só voltam a ser conferidas
+                self._settled.clear()
+            self._settled.add(key)
+            return restored
+
+    # Topologia
+
+    def add_shard(self, name, store):
+        """
+        Inclui um shard; as chaves que passam a pertencer a ele são migradas
+        ao serem acessadas ou por rebalance()
+        """
+        self._begin_change()
+        self.shards[name] = store
+        self.ring.add_node(name)
+        logger.info(f"Shard de sessões incluído: {name} ({len(self.ring)} shards)")
+
+    def remove_shard(self, name):
+        """
+        Remove um shard do anel; ele continua sendo lido até rebalance()
+        mover todas as suas chaves
+        """
+        if name not in self.shards:
+            raise ValueError(f"Shard não existe: {name}")
+        if len(self.shards) == 1:
+            raise ValueError("Não é possível remover o último shard")
+        self._begin_change()
+        self.ring.remove_node(name)
+        self._retired[name] = self.shards.pop(name)
+        logger.info(f"Shard de sessões removido: {name} ({len(self.ring)} shards)")
+
+    def _begin_change(self):
+        if self._previous is not None:
+            raise RuntimeError("Rebalanceamento pendente: execute rebalance() antes de alterar os shards")
+        self._previous = self.ring.copy()
+        self._settled = set()
+
+    def rebalance(self, batch_size=500):
+        """
+        Percorre todos os shards movendo as chaves que não estão no shard
+        responsável; ao final, descarta o anel anterior e os shards removidos
+        (que não são fechados: pertencem a quem os criou)
+
+        Args:
+            batch_size (int): Chaves lidas por vez em cada shard
+
+        Returns:
+            dict: Chaves verificadas, movidas e shards liberados
+        """
+        scanned = moved = 0
+        sources = list(self.shards.items()) + list(self._retired.items())
+        for name, store in sources:
+            for key in store.scan_keys(batch_size):
+                scanned += 1
+                owner = self.shard_for(key)
+                if owner != name:
+                    self._migrate(key, store, self.shards[owner])
+                    moved += 1
+
+        retired = list(self._retired)
+        self._previous = None
+        self._retired = {}
+        self._settled = set()
+        logger.info(f"Rebalanceamento de sessões concluído: {moved} de {scanned} chaves movidas")
+        return {"scanned": scanned, "moved": moved, "retired": retired}
+
+    # Interface chave/valor
+
+    def get(self, key):
+        return self._store_for(key).get(key)
+
+    def setex(self, key, ttl, value):
+        return self._store_for(key).setex(key, ttl, value)
+
+    def set(self, key, value, nx=False, ex=None):
+        return self._store_for(key).set(key, value, nx=nx, ex=ex)
+
+    def delete(self, key):
+        return self._store_for(key).delete(key)
+
+    def expire(self, key, ttl):
+        return self._store_for(key).expire(key, ttl)
+
+    def compare_and_set(self, key, ttl, value, expected_version, new_version):
+        store = self._store_for(key)
+        compare_and_set = getattr(store, "compare_and_set", None)
+        if compare_and_set is None:
+            store.setex(key, ttl, value)
+            return True
+        return compare_and_set(key, ttl, value, expected_version, new_version)
+
+    def peek(self, key):
+        """Lê uma chave sem renovar a expiração, quando o shard permite"""
+        store = self._store_for(key)
+        return getattr(store, "peek", store.get)(key)
+
+    def scan_keys(self, batch_size=500, prefix=""):
+        """Percorre as chaves de todos os shards (um shard de cada vez)"""
+        for store in list(self.shards.values()) + list(self._retired.values()):
+            yield from store.scan_keys(batch_size, prefix)
+
+    def __len__(self):
+        return sum(len(store) for store in self.shards.values())
+
+    def stats(self):
+        """Métricas somadas dos shards, mais as do roteamento"""
+        stats = {"shards": len(self.shards), "rebalancing": self.rebalancing, "migrated": self.migrated}
+        for store in self.shards.values():
+            shard_stats = store.stats() if hasattr(store, "stats") else {}
+            for name, value in shard_stats.items():
+                # Contadores somam; taxas e médias não
+                if isinstance(value, int) and not isinstance(value, bool):
+                    stats[name] = stats.get(name, 0) + value
+        return stats
+
+
+class StructuredShardedSessionStore(ShardedSessionStore):
+    """Versão para shards com interface estruturada (ex: RedisSessionStore)"""
+
+    def load_session(self, key):
+        return self._store_for(key).load_session(key)
+
+    def save_session(self, key, session, ttl, expected_version):
+        return self._store_for(key).save_session(key, session, ttl, expected_version)
+
+    def get_version_token(self, key):
+        return self._store_for(key).get_version_token(key)
+
+    def touch_session(self, key, ttl):
+        return self._store_for(key).touch_session(key, ttl)
+
+    def delete_session(self, key):
+        return self._store_for(key).delete_session(key)
+
+
+def create_sharded_store(shards, vnodes=160, previous=None):
+    """
+    Cria o armazenamento distribuído adequado ao tipo dos shards
+
+    Args:
+        shards: dict nome -> armazenamento (ou lista)
+        vnodes (int): Nós virtuais por shard
+        previous: Topologia anterior, enquanto o rebalanceamento não terminou
+
+    Returns:
+        ShardedSessionStore ou StructuredShardedSessionStore
+
+    Raises:
+        ValueError: Se houver shards estruturados e não estruturados misturados
+    """
+    stores = list(_named(shards).values()) + list(_named(previous or {}).values())
+    structured = {hasattr(store, "save_session") for store in stores}
+    if len(structured) > 1:
+        raise ValueError("Shards de sessão devem ser todos do mesmo tipo (estruturados ou não)")
+    cls = StructuredShardedSessionStore if structured == {True} else ShardedSessionStore
+    return cls(shards, vnodes=vnodes, previous=previous)
@@ -0,0 +1,495 @@
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Condição de gravação: a chave não pode existir no banco (set com nx, restore_entry)
+ABSENT = "absent"
+# Versão que nunca existe: gravação encadeada a uma gravação condicional que falhou
+FAILED = -1
+
+
+class _Ticket:
+    """Aguarda a confirmação (commit) de uma gravação enfileirada"""
+
+    __slots__ = ("event", "error", "key", "conditional", "conflict")
+
+    def __init__(self, key=None, conditional=False):
+        self.event = threading.Event()
+        self.error = None
+        self.key = key
+        self.conditional = conditional
+        # A condição da gravação não valia mais no banco (outro processo gravou antes)
+        self.conflict = False
+
+    def wait(self):
+        """
+        Returns:
+            bool: True se gravada; False se a condição falhou no commit
+        """
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return not self.conflict
+
+
+class SQLiteSessionStore:
+    """
+    Armazenamento durável de sessões em SQLite (modo WAL) para instalações
+    de um único servidor, sem Redis.
+
+    Implementa a interface get/setex/set/delete/expire/compare_and_set com:
+    - commits em grupo: uma thread gravadora reúne as gravações de todos os
+      workers em uma única transação; cada chamada só retorna após o commit
+      do lote que a contém
+    - leituras em conexões próprias de cada thread (o WAL permite leitores
+      concorrentes com o gravador); gravações ainda não confirmadas são
+      visíveis imediatamente para o próprio processo
+    - coluna de expiração indexada, usada para descartar sessões vencidas em lotes
+    - gravações condicionais (compare_and_set, set com nx, restore_entry)
+      verificadas de novo dentro da transação do gravador, para que dois
+      processos no mesmo arquivo não sobrescrevam a gravação um do outro
+    """
+
+    def __init__(self, path="sessions.db", synchronous="NORMAL", flush_interval=0.0, max_batch=500,
+                 sweep_interval=60.0, sweep_batch=1000):
+        """
+        Inicializa o armazenamento
+
+        Args:
+            path (str): Caminho do arquivo SQLite
+            synchronous (str): "NORMAL" (fsync só nos checkpoints do WAL) ou "FULL" (fsync a cada commit)
+            flush_interval (float): Espera (s) adicional para acumular gravações em um lote
+                (0 = o lote reúne o que chegou durante o commit anterior)
+            max_batch (int): Gravações pendentes a partir das quais o lote é gravado sem esperar
+            sweep_interval (float): Intervalo (s) entre remoções de sessões expiradas (0 = desativado)
+            sweep_batch (int): Máximo de chaves removidas por transação na limpeza
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+
+        self._writer = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        # NORMAL é seguro contra corrupção no WAL; FULL também garante os últimos commits após queda de energia
+        if synchronous not in ("NORMAL", "FULL"):
+            raise ValueError(f"Modo synchronous inválido: {synchronous}")
+        self._writer.execute(f"PRAGMA synchronous={synchronous}")
+        self._writer.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                version INTEGER,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._writer.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+        # Conexões de leitura por thread
+        self._local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+
+        # Gravações aguardando commit: chave -> (valor, expira_em, versão, condição) ou None (remoção);
+        # condição: None (incondicional), versão esperada no banco ou ABSENT
+        self._pending = {}
+        # Renovações de expiração aguardando commit: chave -> expira_em
+        self._touches = {}
+        self._tickets = []
+        # Lote sendo gravado pela thread gravadora (chave -> entrada)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._has_work = threading.Condition(self._lock)
+        self._closed = False
+        self._last_sweep = time.monotonic()
+
+        # Métricas
+        self.writes = 0
+        self.batches = 0
+        self.purged = 0
+        self.conflicts = 0
+
+        self._thread = threading.Thread(target=self._write_loop, name="sqlite-session-writer", daemon=True)
+        self._thread.start()
+
+    def start(self):
+        """Compatível com MemorySessionStore (a thread gravadora inicia no construtor)"""
+        return self
+
+    def close(self):
+        """Grava as pendências, encerra a thread gravadora e fecha as conexões"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._has_work.notify()
+        self._thread.join()
+
+        self._writer.close()
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+
+    # Leitura
+
+    def get(self, key):
+        """Lê uma chave (None se ausente ou expirada)"""
+        now = time.time()
+        with self._lock:
+            if key in self._pending:
+                entry = self._pending[key]
+                return entry[0] if entry is not None and entry[1] > now else None
+
+        row = self._reader().execute(
+            "SELECT value FROM sessions WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _lookup(self, key, now):
+        """
+        Consulta existência e versão de uma chave (com o lock adquirido),
+        considerando as gravações ainda não confirmadas
+
+        Returns:
+            tuple: (existe, versão; 0 se ausente ou sem versão)
+        """
+        if key in self._pending:
+            entry = self._pending[key]
+            if entry is None or entry[1] <= now:
+                return False, 0
+            return True, entry[2] or 0
+
+        row = self._reader().execute(
+            "SELECT version FROM sessions WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return False, 0
+        return True, row[0] or 0
+
+    # Gravação
+
+    def setex(self, key, ttl, value):
+        """Grava uma chave com expiração em 'ttl' segundos"""
+        with self._lock:
+            ticket = self._enqueue(key, (value, time.time() + ttl, None, None))
+        ticket.wait()
+
+    def set(self, key, value, nx=False, ex=None):
+        """Grava uma chave; com nx=True, apenas se ela ainda não existir"""
+        ttl = ex or 365 * 24 * 60 * 60
+        now = time.time()
+        with self._lock:
+            if nx and self._lookup(key, now)[0]:
+                return None
+            ticket = self._enqueue(key, (value, now + ttl, None, ABSENT if nx else None))
+        return True if ticket.wait() else None
+
+    def compare_and_set(self, key, ttl, value, expected_version, new_version):
+        """
+        Grava a chave somente se a versão atual for 'expected_version'
+        (chave ausente ou expirada equivale à versão 0)
+
+        A versão é conferida aqui (rejeição imediata) e de novo na transação
+        do gravador, que vê as gravações de outros processos no mesmo arquivo
+
+        Returns:
+            bool: True se gravada
+        """
+        now = time.time()
+        with self._lock:
+            if self._lookup(key, now)[1] != expected_version:
+                return False
+            ticket = self._enqueue(key, (value, now + ttl, new_version, expected_version))
+        return ticket.wait()
+
+    def expire(self, key, ttl):
+        """Renova a expiração de uma chave sem regravar o valor"""
+        now = time.time()
+        with self._lock:
+            exists = self._lookup(key, now)[0]
+            if not exists:
+                return False
+            entry = self._pending.get(key)
+            if entry is not None:
+                ticket = self._enqueue(key, (entry[0], now + ttl, entry[2], entry[3]))
+            else:
+                ticket = self._enqueue_touch(key, now + ttl)
+        ticket.wait()
+        return True
+
+    def delete(self, key):
+        """Remove uma chave"""
+        with self._lock:
+            ticket = self._enqueue(key, None)
+        ticket.wait()
+
+    def _enqueue(self, key, entry):
+        """Registra uma gravação pendente (com o lock adquirido)"""
+        if self._closed:
+            raise RuntimeError("Armazenamento de sessões SQLite encerrado")
+        conditional = entry is not None and entry[3] is not None
+        if conditional and key in self._pending:
+            # Já conferida contra a gravação pendente anterior, e não contra o banco
+            previous = self._pending[key]
+            if previous is None or previous[3] is None:
+                # A anterior grava sem condição: esta também
+                guard = None
+            elif self._inflight.get(key) is previous:
+                # A anterior está sendo gravada: esta espera a versão dela
+                # (e é invalidada se ela falhar, em _commit)
+                guard = previous[2] or 0
+            else:
+                # Mesmo lote: no banco, vale a condição da anterior
+                guard = previous[3]
+            entry = entry[:3] + (guard,)
+        self._pending[key] = entry
+        self._touches.pop(key, None)
+        ticket = _Ticket(key, conditional)
+        self._tickets.append(ticket)
+        self._has_work.notify()
+        return ticket
+
+    def _enqueue_touch(self, key, expires_at):
+        """Registra uma renovação de expiração pendente (com o lock adquirido)"""
+        if self._closed:
+            raise RuntimeError("Armazenamento de sessões SQLite encerrado")
+        self._touches[key] = expires_at
+        ticket = _Ticket()
+        self._tickets.append(ticket)
+        self._has_work.notify()
+        return ticket
+
+    def _reader(self):
+        """Conexão de leitura da thread atual"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._local.conn = conn
+            # Lock próprio: _reader() também é chamado com self._lock adquirido
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _write_loop(self):
+        """Thread gravadora: reúne as pendências e as grava em uma transação"""
+        while True:
+            with self._lock:
+                while not self._tickets and not self._closed:
+                    timeout = self._sweep_timeout()
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._has_work.wait(timeout)
+                closing = self._closed
+
+            if self._tickets and not closing and self.flush_interval and len(self._tickets) < self.max_batch:
+                # Janela curta para acumular gravações de outros workers
+                time.sleep(self.flush_interval)
+
+            with self._lock:
+                batch = dict(self._pending)
+                self._inflight = batch
+                touches = self._touches
+                tickets = self._tickets
+                self._touches = {}
+                self._tickets = []
+
+            if tickets:
+                self._commit(batch, touches, tickets)
+
+            if self.sweep_interval and time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._sweep()
+
+            if closing:
+                with self._lock:
+                    if not self._tickets:
+                        return
+
+    def _sweep_timeout(self):
+        if not self.sweep_interval:
+            return None
+        return self.sweep_interval - (time.monotonic() - self._last_sweep)
+
+    def _commit(self, batch, touches, tickets):
+        """Grava um lote em uma única transação e libera quem aguarda"""
+        error = None
+        failed = set()
+        upserts = [(key, e[0], e[2], e[1]) for key, e in batch.items() if e is not None and e[3] is None]
+        guarded = [(key, e) for key, e in batch.items() if e is not None and e[3] is not None]
+        deletes = [(key,) for key, e in batch.items() if e is None]
+        try:
+            self._writer.execute("BEGIN IMMEDIATE")
+            if upserts:
+                self._writer.executemany(
+                    "INSERT INTO sessions (key, value, version, expires_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = excluded.version, "
+                    "expires_at = excluded.expires_at",
+                    upserts
+                )
+            now = time.time()
+            for key, entry in guarded:
+                if not self._write_guarded(key, entry, now):
+                    failed.add(key)
+            if deletes:
+                self._writer.executemany("DELETE FROM sessions WHERE key = ?", deletes)
+            if touches:
+                self._writer.executemany(
+                    "UPDATE sessions SET expires_at = ? WHERE key = ?",
+                    [(expires_at, key) for key, expires_at in touches.items()]
+                )
+            self._writer.execute("COMMIT")
+        except sqlite3.Error as e:
+            error = e
+            logger.error(f"Erro ao gravar lote de sessões no SQLite: {str(e)}")
+            try:
+                self._writer.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+        with self._lock:
+            # Remover só o que não foi regravado enquanto o lote era confirmado
+            for key, entry in batch.items():
+                if key in self._pending and self._pending[key] is entry:
+                    del self._pending[key]
+            self.writes += len(tickets)
+            self.batches += 1
+            if error is None:
+                self.conflicts += len(failed)
+            for key in failed:
+                # Gravações encadeadas a esta durante o commit também falham
+                current = self._pending.get(key)
+                if current is not None and current is not batch[key] and current[3] is not None:
+                    self._pending[key] = current[:3] + (FAILED,)
+            self._inflight = {}
+
+        for ticket in tickets:
+            ticket.error = error
+            ticket.conflict = ticket.conditional and ticket.key in failed
+            ticket.event.set()
+
+    def _write_guarded(self, key, entry, now):
+        """
+        Grava uma entrada condicional na transação do gravador
+
+        Returns:
+            bool: False se a condição não vale no banco (nada gravado)
+        """
+        value, expires_at, version, guard = entry
+        if guard == ABSENT or guard == 0:
+            # Chave ausente ou expirada (ou, para a versão 0, gravada sem versão)
+            condition = "sessions.expires_at <= ?"
+            if guard == 0:
+                condition += " OR COALESCE(sessions.version, 0) = 0"
+            cursor = self._writer.execute(
+                "INSERT INTO sessions (key, value, version, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, version = excluded.version, "
+                f"expires_at = excluded.expires_at WHERE {condition}",
+                (key, value, version, expires_at, now)
+            )
+        else:
+            cursor = self._writer.execute(
+                "UPDATE sessions SET value = ?, version = ?, expires_at = ? "
+                "WHERE key = ? AND expires_at > ? AND version = ?",
+                (value, version, expires_at, key, now, guard)
+            )
+        return cursor.rowcount == 1
+
+    def _sweep(self):
+        """Remove sessões expiradas em lotes (usa o índice de expiração)"""
+        self._last_sweep = time.monotonic()
+        try:
+            while True:
+                cursor = self._writer.execute(
+                    "DELETE FROM sessions WHERE key IN "
+                    "(SELECT key FROM sessions WHERE expires_at <= ? LIMIT ?)",
+                    (time.time(), self.sweep_batch)
+                )
+                self.purged += cursor.rowcount
+                if cursor.rowcount < self.sweep_batch:
+                    break
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao remover sessões expiradas: {str(e)}")
+
+    def scan_keys(self, batch_size=500, prefix=""):
+        """
+        Percorre as chaves válidas já gravadas, por paginação na chave primária
+        (cada lote é uma consulta curta; não mantém leitura aberta entre lotes)
+
+        Args:
+            batch_size (int): Chaves lidas por consulta
+            prefix (str): Apenas chaves com este prefixo (intervalo na chave primária)
+
+        Yields:
+            str: Chave
+        """
+        last = prefix
+        # Menor texto maior que todas as chaves com o prefixo
+        upper = prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else "\U0010ffff"
+        query = "SELECT key FROM sessions WHERE key >= ? AND key < ? AND expires_at > ? ORDER BY key LIMIT ?"
+        while True:
+            rows = self._reader().execute(query, (last, upper, time.time(), batch_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row[0]
+            last = rows[-1][0]
+            query = "SELECT key FROM sessions WHERE key > ? AND key < ? AND expires_at > ? ORDER BY key LIMIT ?"
+
+    def dump_entry(self, key):
+        """
+        Exporta uma chave para migração entre armazenamentos
+
+        Returns:
+            tuple: (valor, TTL restante em segundos, versão) ou None se ausente
+        """
+        now = time.time()
+        with self._lock:
+            if key in self._pending:
+                entry = self._pending[key]
+                if entry is None or entry[1] <= now:
+                    return None
+                return entry[0], entry[1] - now, entry[2]
+
+        row = self._reader().execute(
+            "SELECT value, expires_at, version FROM sessions WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1] - now, row[2]
+
+    def restore_entry(self, key, entry):
+        """
+        Grava uma chave exportada por dump_entry, se ela ainda não existir
+        (uma versão mais nova já gravada no destino é preservada)
+
+        Returns:
+            bool: True se gravada
+        """
+        value, ttl, version = entry
+        now = time.time()
+        with self._lock:
+            if self._lookup(key, now)[0]:
+                return False
+            ticket = self._enqueue(key, (value, now + ttl, version, ABSENT))
+        return ticket.wait()
+
+    def __len__(self):
+        return self._reader().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    def stats(self):
+        """Retorna métricas do armazenamento"""
+        return {
+            "writes": self.writes,
+            "batches": self.batches,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0.0,
+            "pending": len(self._pending),
+            "purged": self.purged,
+            "conflicts": self.conflicts
+        }
@@ -23,6 +23,13 @@ class AIService:
             self.api_key = ""
             self.model = "gpt-3.5-turbo"
             self.api_endpoint = "https://api.openai.com/v1/chat/completions"
+        
+        # Sessão HTTP reutilizada entre chamadas (keep-alive)
+        self.http = requests.Session()
+    
+    def close(self):
+        """Fecha a sessão HTTP"""
+        self.http.close()
     
     def generate_response(self, question, client_data, channel="web"):
         """
@@ -63,7 +70,7 @@ class AIService:
                 "temperature": 0.7
             }
             
-            response = requests.post(
+            response = self.http.post(
                 self.api_endpoint,
                 headers=headers,
                 json=payload,
@@ -1,20 +1,40 @@
+import asyncio
 import requests
 import json
 import streamlit as st
 from datetime import datetime
 import time
 import logging
+from requests.adapters import HTTPAdapter
+from src.utils.circuit_breaker import CircuitBreaker
+from src.utils.single_flight import SingleFlight
+from src.services.fusion_cache import FusionCache, FusionRecordStore, StoreFusionCacheBackend, cache_key
+
+try:
+    import httpx
+except ImportError:  # Sem httpx, aget_client_data usa o cliente síncrono em uma thread
+    httpx = None
 
 logger = logging.getLogger(__name__)
 
+
+class FusionUnavailableError(Exception):
+    """A consulta não foi enviada porque o circuito da API Fusion está aberto"""
+
+
 class FusionAPI:
     """
     Serviço para integração com a API Fusion da CarGlass.
     Responsável por consultas de status por diferentes identificadores.
+    
+    As consultas usam um pool de conexões persistentes (keep-alive): o
+    cliente síncrono (requests) é compartilhado pelos workers e o assíncrono
+    (httpx, em aget_client_data) pelo event loop do gateway.
     """
     
     def __init__(self):
         # Tentar obter configurações de ambiente do secrets
+        config = {}
         try:
             self.environment = st.secrets.get("api", {}).get("environment", "dev")
             self.base_urls = {
@@ -22,6 +42,7 @@ class FusionAPI:
                 "hml": st.secrets.get("api", {}).get("base_url_hml", "http://fusion-hml.carglass.hml.local:3000/api"),
                 "prod": st.secrets.get("api", {}).get("base_url_prod", "https://fusion.carglass.com.br/api")
             }
+            config = st.secrets.get("api", {})
         except Exception as e:
             # Fallback para desenvolvimento local
             logger.warning(f"Não foi possível carregar configurações: {str(e)}")
@@ -31,6 +52,80 @@ class FusionAPI:
                 "hml": "http://fusion-hml.carglass.hml.local:3000/api",
                 "prod": "https://fusion.carglass.com.br/api"
             }
+        
+        self.max_connections = int(config.get("max_connections", 20))
+        self.connect_timeout = float(config.get("connect_timeout", 3))
+        self.read_timeout = float(config.get("read_timeout", 10))
+        
+        # Sessão HTTP reutilizada entre chamadas (keep-alive), com pool do tamanho
+        # do número de workers para que as conexões não sejam descartadas e reabertas
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_connections)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        self.http.headers["Accept"] = "application/json"
+        
+        # Cliente assíncrono, criado no event loop da primeira chamada a aget_client_data
+        self.async_http = None
+        
+        # Disponibilidade decidida pelo resultado das consultas reais; a verificação
+        # de saúde roda em segundo plano e nunca no caminho da requisição
+        self.breaker = CircuitBreaker(
+            "fusion",
+            failure_threshold=int(config.get("breaker_failure_threshold", 5)),
+            recovery_timeout=float(config.get("breaker_recovery_timeout", 30)),
+            health_check=self._health_check,
+            health_interval=float(config.get("health_interval", 10))
+        )
+        if self.environment != "dev":
+            self.breaker.start()
+        
+        # Consultas simultâneas ao mesmo identificador viram uma única requisição
+        self.flight = SingleFlight("fusion")
+        
+        # Cache das consultas por identificador ("memory", "shared" ou "none");
+        # "shared" usa memória até o gateway chamar attach_shared_cache
+        self.cache_backend = config.get("cache_backend", "memory")
+        self.cache = None
+        if self.cache_backend != "none":
+            self.cache = FusionCache(
+                backend=FusionRecordStore(max_records=int(config.get("cache_max_entries", 10000))),
+                status_ttls=dict(config["cache_status_ttls"]) if "cache_status_ttls" in config else None,
+                default_ttl=float(config.get("cache_ttl", 300)),
+                negative_ttl=float(config.get("cache_negative_ttl", 60)),
+                stale_ttl=float(config.get("cache_stale_ttl", 300))
+            )
+    
+    def attach_shared_cache(self, store):
+        """
+        Passa a guardar o cache no armazenamento compartilhado (cache_backend = "shared")
+        
+        Args:
+            store: Armazenamento com get/setex/delete (o mesmo das sessões)
+        """
+        if self.cache is not None and self.cache_backend == "shared":
+            self.cache.backend = StoreFusionCacheBackend(store)
+    
+    def close(self):
+        """Interrompe a verificação de saúde e fecha a sessão HTTP"""
+        self.breaker.close()
+        self.http.close()
+        if self.cache is not None:
+            self.cache.close()
+    
+    async def aclose(self):
+        """Fecha o pool de conexões assíncrono"""
+        if self.async_http is not None:
+            await self.async_http.aclose()
+            self.async_http = None
+    
+    def stats(self):
+        """Retorna o estado do circuit breaker e as consultas agrupadas da API Fusion"""
+        stats = self.breaker.stats()
+        flight = self.flight.stats()
+        stats["in_flight"] = flight["in_flight"]
+        stats["coalesced"] = flight["coalesced"]
+        return stats
     
     def get_client_data(self, id_type, identifier):
         """
@@ -44,39 +139,143 @@ class FusionAPI:
             dict: Dados do cliente ou None em caso de erro
         """
         # Em ambiente de desenvolvimento sem acesso à API real, usar dados simulados
-        if self.environment == "dev" or self._is_offline():
+        if self.environment == "dev":
             return self._get_mock_data(id_type, identifier)
         
         try:
-            # Construir URL da API
-            base_url = self.base_urls.get(self.environment)
-            url = f"{base_url}/status/{id_type}/{identifier}"
-            
-            # Headers da requisição
-            headers = {
-                "Accept": "application/json"
-            }
-            
+            if self.cache is not None:
+                return self.cache.get(id_type, identifier, self._fetch_coalesced)
+            return self._fetch_coalesced(id_type, identifier)
+        except FusionUnavailableError:
+            # API fora do ar (circuito aberto): responder sem esperar timeout, como no modo offline
+            return self._get_mock_data(id_type, identifier)
+    
+    def _fetch_coalesced(self, id_type, identifier):
+        """Consulta a API; chamadas simultâneas para o mesmo identificador aguardam a primeira"""
+        return self.flight.do(cache_key(id_type, identifier), self._fetch_client_data, id_type, identifier)
+    
+    async def _afetch_coalesced(self, id_type, identifier):
+        """Versão assíncrona de _fetch_coalesced"""
+        return await self.flight.ado(cache_key(id_type, identifier), self._afetch_client_data, id_type, identifier)
+    
+    def _fetch_client_data(self, id_type, identifier):
+        """
+        Consulta a API Fusion (sem cache)
+        
+        Raises:
+            FusionUnavailableError: Circuito aberto (a consulta não foi enviada)
+        """
+        if not self.breaker.allow_request():
+            raise FusionUnavailableError(id_type)
+        
+        try:
             # Fazer a requisição GET para a API
-            response = requests.get(url, headers=headers, timeout=10)
+            try:
+                response = self.http.get(
+                    self._status_url(id_type, identifier),
+                    timeout=(self.connect_timeout, self.read_timeout)
+                )
+            except Exception:
+                # Erro de conexão ou timeout (também libera a chamada de teste do meio-aberto)
+                self.breaker.record_failure()
+                raise
             
-            # Verificar se a resposta foi bem-sucedida
-            if response.status_code == 200:
-                # Tentar converter a resposta para JSON
-                data = response.json()
-                
-                # Formatar resposta para o padrão esperado pela aplicação
-                return self._format_response(data, id_type, identifier)
-            else:
-                # Log de erro
-                logger.error(f"Erro na API Fusion: {response.status_code} - {response.text}")
-                return None
+            return self._handle_response(response, id_type, identifier)
                 
         except Exception as e:
             # Log de erro
             logger.error(f"Erro ao consultar API Fusion: {str(e)}")
             return None
     
+    async def aget_client_data(self, id_type, identifier):
+        """
+        Consulta dados do cliente na API Fusion sem bloquear o event loop
+        
+        Args:
+            id_type (str): Tipo de identificador (cpf, telefone, placa, ordem, chassi)
+            identifier (str): Valor do identificador
+            
+        Returns:
+            dict: Dados do cliente ou None em caso de erro
+        """
+        if httpx is None:
+            return await asyncio.to_thread(self.get_client_data, id_type, identifier)
+        
+        if self.environment == "dev":
+            return self._get_mock_data(id_type, identifier)
+        
+        try:
+            if self.cache is not None:
+                return await self.cache.aget(id_type, identifier, self._afetch_coalesced)
+            return await self._afetch_coalesced(id_type, identifier)
+        except FusionUnavailableError:
+            return self._get_mock_data(id_type, identifier)
+    
+    async def _afetch_client_data(self, id_type, identifier):
+        """Versão assíncrona de _fetch_client_data"""
+        if not self.breaker.allow_request():
+            raise FusionUnavailableError(id_type)
+        
+        try:
+            try:
+                response = await self._get_async_http().get(self._status_url(id_type, identifier))
+            except Exception:
+                self.breaker.record_failure()
+                raise
+            
+            return self._handle_response(response, id_type, identifier)
+                
+        except Exception as e:
+            logger.error(f"Erro ao consultar API Fusion: {str(e)}")
+            return None
+    
+    def _get_async_http(self):
+        """Cliente assíncrono com pool de conexões (criado no primeiro uso)"""
+        if self.async_http is None:
+            self.async_http = httpx.AsyncClient(
+                headers={"Accept": "application/json"},
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self.async_http
+    
+    def _status_url(self, id_type, identifier):
+        """URL da consulta de status no ambiente configurado"""
+        base_url = self.base_urls.get(self.environment)
+        return f"{base_url}/status/{id_type}/{identifier}"
+    
+    def _handle_response(self, response, id_type, identifier):
+        """
+        Registra o resultado no circuit breaker e converte a resposta
+        (requests ou httpx)
+        
+        Returns:
+            dict: Dados do cliente ou None se a API não retornou sucesso
+        """
+        # Erros do servidor contam como falha; demais respostas mostram que a API está no ar
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        
+        # Verificar se a resposta foi bem-sucedida
+        if response.status_code == 200:
+            # Tentar converter a resposta para JSON
+            data = response.json()
+            
+            # Formatar resposta para o padrão esperado pela aplicação
+            return self._format_response(data, id_type, identifier)
+        elif response.status_code == 404:
+            # Identificador sem atendimento (resposta negativa, pode ficar em cache)
+            return self._not_found(id_type, identifier)
+        else:
+            # Log de erro
+            logger.error(f"Erro na API Fusion: {response.status_code} - {response.text}")
+            return None
+    
     def _format_response(self, api_data, id_type, identifier):
         """Formata a resposta da API para o padrão esperado pela aplicação"""
         try:
@@ -94,7 +293,8 @@ class FusionAPI:
                     "veiculo": {
                         "modelo": api_data.get("veiculo", {}).get("modelo", ""),
                         "placa": api_data.get("veiculo", {}).get("placa", ""),
-                        "ano": api_data.get("veiculo", {}).get("ano", "")
+                        "ano": api_data.get("veiculo", {}).get("ano", ""),
+                        "chassi": api_data.get("veiculo", {}).get("chassi", "")
                     }
                 },
                 "mensagem_ia": api_data.get("mensagem_ia", ""),
@@ -104,15 +304,14 @@ class FusionAPI:
             logger.error(f"Erro ao formatar resposta: {str(e)}")
             return None
     
-    def _is_offline(self):
-        """Verifica se está offline ou sem acesso à API"""
+    def _health_check(self):
+        """Verifica se a API responde (executado em segundo plano pelo circuit breaker)"""
         try:
-            # Tentar ping no servidor
             base_url = self.base_urls.get(self.environment)
-            requests.get(base_url, timeout=2)
-            return False
-        except:
+            self.http.get(base_url, timeout=2)
             return True
+        except requests.RequestException:
+            return False
     
     def _get_mock_data(self, id_type, identifier):
         """
@@ -243,9 +442,13 @@ class FusionAPI:
             }
         else:
             # Simula uma resposta negativa
-            return {
-                "sucesso": False,
-                "tipo": id_type,
-                "valor": identifier,
-                "mensagem": "Dados não encontrados"
-            }
+            return self._not_found(id_type, identifier)
+    
+    def _not_found(self, id_type, identifier):
+        """Resposta negativa no formato esperado pela aplicação"""
+        return {
+            "sucesso": False,
+            "tipo": id_type,
+            "valor": identifier,
+            "mensagem": "Dados não encontrados"
+        }
@@ -0,0 +1,448 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.metrics import FUSION_CACHE_TOTAL
+from src.utils.validators import normalize_identifier
+
+logger = logging.getLogger(__name__)
+
+# TTL (s) das consultas por status do atendimento: atendimentos em curso mudam
+# de status ao longo do dia, os concluídos praticamente não mudam mais
+DEFAULT_STATUS_TTLS = {
+    "Em andamento": 60,
+    "Em processamento": 60,
+    "Agendado": 300,
+    "Concluído": 3600
+}
+
+
+def cache_key(id_type, identifier):
+    """Chave do cache de uma consulta (identificador normalizado)"""
+    return f"{id_type}:{normalize_identifier(id_type, identifier)}"
+
+
+def record_keys(result):
+    """
+    Chaves de todos os identificadores de um atendimento retornado pela API
+
+    Returns:
+        list: Chaves (cpf, telefone, ordem, placa e chassi presentes)
+    """
+    dados = result.get("dados") or {}
+    veiculo = dados.get("veiculo") or {}
+    identifiers = {
+        "cpf": dados.get("cpf"),
+        "telefone": dados.get("telefone"),
+        "ordem": dados.get("ordem"),
+        "placa": veiculo.get("placa"),
+        "chassi": veiculo.get("chassi") or dados.get("chassi")
+    }
+    return [
+        cache_key(id_type, value)
+        for id_type, value in identifiers.items()
+        if normalize_identifier(id_type, value)
+    ]
+
+
+class FusionRecordStore:
+    """
+    Atendimentos consultados na API Fusion, em memória do processo, indexados
+    por todos os seus identificadores (cpf, telefone, ordem, placa e chassi):
+    um cliente que consultou pelo CPF e depois informa a placa ou o telefone
+    é respondido sem nova consulta à API.
+
+    Cada atendimento é guardado uma vez (LRU com número máximo de registros).
+    Ao gravar um atendimento, o registro anterior da mesma ordem de serviço
+    é substituído com todas as suas chaves, e identificadores que passaram a
+    pertencer ao novo atendimento deixam de apontar para registros de outras
+    ordens. Remover qualquer chave remove o atendimento inteiro.
+    """
+
+    def __init__(self, max_records=10000):
+        """
+        Args:
+            max_records (int): Número máximo de atendimentos mantidos
+        """
+        self.max_records = max_records
+        self._records = OrderedDict()
+        self._index = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, key):
+        """Retorna a entrada com 'tipo' e 'valor' da chave consultada (None se ausente ou vencida)"""
+        with self._lock:
+            record_id = self._index.get(key)
+            if record_id is None:
+                return None
+            record = self._records[record_id]
+            entry = record["entry"]
+            if entry["stale_until"] <= time.time():
+                self._remove(record_id)
+                return None
+            self._records.move_to_end(record_id)
+
+        id_type, identifier = key.split(":", 1)
+        value = entry["value"]
+        if value.get("tipo") != id_type or value.get("valor") != identifier:
+            entry = dict(entry, value=dict(value, tipo=id_type, valor=identifier))
+        return entry
+
+    def set(self, key, entry, ttl):
+        """Guarda a entrada sob a chave consultada e todos os identificadores do atendimento"""
+        value = entry["value"]
+        keys = {key}
+        identity = None
+        if value.get("sucesso"):
+            keys.update(record_keys(value))
+            ordem = normalize_identifier("ordem", (value.get("dados") or {}).get("ordem"))
+            identity = f"ordem:{ordem}" if ordem else key
+
+        with self._lock:
+            for k in keys:
+                record_id = self._index.get(k)
+                if record_id is None:
+                    continue
+                if identity is not None and self._records[record_id]["identity"] == identity:
+                    # Versão anterior do mesmo atendimento: sai com todas as chaves
+                    self._remove(record_id)
+                else:
+                    self._release(record_id, k)
+
+            record_id = next(self._ids)
+            self._records[record_id] = {"entry": entry, "keys": keys, "identity": identity}
+            for k in keys:
+                self._index[k] = record_id
+
+            while len(self._records) > self.max_records:
+                self._remove(next(iter(self._records)))
+                self.evicted += 1
+
+    def delete(self, key):
+        """Remove o atendimento da chave (com todos os seus identificadores)"""
+        with self._lock:
+            record_id = self._index.get(key)
+            if record_id is not None:
+                self._remove(record_id)
+
+    def _remove(self, record_id):
+        """Remove um registro e suas chaves (com o lock adquirido)"""
+        record = self._records.pop(record_id)
+        for k in record["keys"]:
+            if self._index.get(k) == record_id:
+                del self._index[k]
+
+    def _release(self, record_id, key):
+        """Desvincula uma chave de um registro (com o lock adquirido)"""
+        record = self._records[record_id]
+        record["keys"].discard(key)
+        del self._index[key]
+        if not record["keys"]:
+            del self._records[record_id]
+
+    def __len__(self):
+        return len(self._records)
+
+
+class MemoryFusionCacheBackend:
+    """Entradas do cache em memória do processo, uma por chave consultada (LRU)"""
+
+    def __init__(self, max_entries=10000):
+        """
+        Args:
+            max_entries (int): Número máximo de consultas mantidas
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, key):
+        """Retorna a entrada (None se ausente ou vencida)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry["stale_until"] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry, ttl):
+        """Guarda a entrada (ttl não é usado: a validade está na própria entrada)"""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evicted += 1
+
+    def delete(self, key):
+        """Remove a entrada"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class StoreFusionCacheBackend:
+    """
+    Entradas do cache no armazenamento compartilhado (o mesmo das sessões),
+    para que vários processos do gateway aproveitem as mesmas consultas
+    """
+
+    # Leituras e gravações vão à rede: FusionCache.aget as executa fora do event loop
+    blocking = True
+
+    def __init__(self, store, key_prefix="fusion:"):
+        """
+        Args:
+            store: Armazenamento com get/setex/delete (Redis, SQLite ou memória)
+            key_prefix (str): Prefixo das chaves no armazenamento
+        """
+        self.store = store
+        self.key_prefix = key_prefix
+        self.evicted = 0
+
+    def get(self, key):
+        """Retorna a entrada (None se ausente ou vencida)"""
+        # peek não renova a expiração (armazenamento em memória)
+        read = getattr(self.store, "peek", self.store.get)
+        raw = read(f"{self.key_prefix}{key}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry if entry["stale_until"] > time.time() else None
+
+    def set(self, key, entry, ttl):
+        """Guarda a entrada; o armazenamento a remove ao fim do ttl"""
+        self.store.setex(f"{self.key_prefix}{key}", max(1, int(ttl + 0.999)), json.dumps(entry))
+
+    def delete(self, key):
+        """Remove a entrada"""
+        self.store.delete(f"{self.key_prefix}{key}")
+
+    def __len__(self):
+        return 0
+
+
+class FusionCache:
+    """
+    Cache das consultas à API Fusion por (tipo de identificador, identificador).
+
+    - o TTL depende do status do atendimento (status_ttls); respostas
+      "Dados não encontrados" ficam em cache por negative_ttl
+    - vencido o TTL, a resposta ainda é usada por até stale_ttl segundos
+      enquanto uma única consulta em segundo plano a atualiza
+      (stale-while-revalidate); se a API falhar, a resposta antiga continua
+      valendo até o fim dessa janela
+    - erros (None) não entram no cache
+    """
+
+    def __init__(self, backend=None, status_ttls=None, default_ttl=300, negative_ttl=60,
+                 stale_ttl=300, refresh_workers=2):
+        """
+        Args:
+            backend: FusionRecordStore, MemoryFusionCacheBackend ou StoreFusionCacheBackend
+                (padrão: FusionRecordStore)
+            status_ttls (dict): TTL (s) por status do atendimento
+            default_ttl (float): TTL (s) de status não listados
+            negative_ttl (float): TTL (s) de "Dados não encontrados" (0 = não guardar)
+            stale_ttl (float): Tempo (s) após o TTL em que a resposta antiga ainda é usada
+            refresh_workers (int): Threads das atualizações em segundo plano (chamadas síncronas)
+        """
+        self.backend = backend if backend is not None else FusionRecordStore()
+        self.status_ttls = dict(DEFAULT_STATUS_TTLS if status_ttls is None else status_ttls)
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="fusion-refresh")
+        self._refreshing = set()
+        self._tasks = set()
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.backend_errors = 0
+
+    def get(self, id_type, identifier, fetch):
+        """
+        Retorna a consulta em cache ou chama fetch(id_type, identifier)
+
+        Args:
+            id_type (str): Tipo de identificador
+            identifier (str): Valor do identificador
+            fetch: Função que consulta a API (retorna None em caso de erro)
+
+        Returns:
+            dict: Dados do cliente ou None em caso de erro
+        """
+        key = self._key(id_type, identifier)
+        entry = self._read(key)
+        if entry is not None:
+            if entry["fresh_until"] <= time.time():
+                self._schedule_refresh(key, lambda: self._executor.submit(
+                    self._refresh, key, id_type, identifier, fetch))
+            return entry["value"]
+
+        result = fetch(id_type, identifier)
+        self.put(id_type, identifier, result)
+        return result
+
+    async def aget(self, id_type, identifier, fetch):
+        """
+        Versão assíncrona de get (fetch é uma corrotina); a atualização em
+        segundo plano roda como tarefa no event loop
+        """
+        key = self._key(id_type, identifier)
+        entry = await self._in_thread(self._read, key)
+        if entry is not None:
+            if entry["fresh_until"] <= time.time():
+                self._schedule_refresh(key, lambda: self._track(asyncio.create_task(
+                    self._arefresh(key, id_type, identifier, fetch))))
+            return entry["value"]
+
+        result = await fetch(id_type, identifier)
+        await self._in_thread(self.put, id_type, identifier, result)
+        return result
+
+    def put(self, id_type, identifier, result):
+        """Guarda uma resposta da API com o TTL do seu status (erros não são guardados)"""
+        ttl = self.ttl_for(result)
+        if not ttl or ttl <= 0:
+            return
+        now = time.time()
+        stale_ttl = self.stale_ttl if result.get("sucesso") else 0
+        entry = {"value": result, "fresh_until": now + ttl, "stale_until": now + ttl + stale_ttl}
+        try:
+            self.backend.set(self._key(id_type, identifier), entry, ttl + stale_ttl)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Erro ao gravar cache da API Fusion: {str(e)}")
+
+    def invalidate(self, id_type, identifier):
+        """Remove uma consulta do cache"""
+        try:
+            self.backend.delete(self._key(id_type, identifier))
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Erro ao remover do cache da API Fusion: {str(e)}")
+
+    def ttl_for(self, result):
+        """TTL (s) de uma resposta; None se ela não deve ser guardada"""
+        if not result:
+            return None
+        if not result.get("sucesso"):
+            return self.negative_ttl if result.get("mensagem") == "Dados não encontrados" else None
+        status = (result.get("dados") or {}).get("status")
+        return self.status_ttls.get(status, self.default_ttl)
+
+    def close(self):
+        """Encerra as atualizações em segundo plano"""
+        self._executor.shutdown(wait=False)
+
+    def _key(self, id_type, identifier):
+        return cache_key(id_type, identifier)
+
+    def _read(self, key):
+        """Lê a entrada e contabiliza hit/stale/miss (falha no armazenamento = miss)"""
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Erro ao ler cache da API Fusion: {str(e)}")
+            entry = None
+
+        if entry is None:
+            result = "miss"
+            self.misses += 1
+        elif entry["fresh_until"] > time.time():
+            result = "hit"
+            self.hits += 1
+        else:
+            result = "stale"
+            self.stale += 1
+        FUSION_CACHE_TOTAL.inc(result)
+        return entry
+
+    def _schedule_refresh(self, key, start):
+        """Inicia uma atualização por chave (as demais leituras só usam a resposta antiga)"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        try:
+            start()
+        except Exception as e:
+            # Executor encerrado ou sem event loop: a próxima leitura tenta de novo
+            with self._lock:
+                self._refreshing.discard(key)
+            logger.debug(f"Atualização do cache da API Fusion não iniciada: {str(e)}")
+
+    async def _in_thread(self, fn, *args):
+        """Executa fn em uma thread se o backend faz I/O bloqueante (armazenamento compartilhado)"""
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _track(self, task):
+        """Mantém referência às tarefas assíncronas até terminarem"""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _refresh(self, key, id_type, identifier, fetch):
+        try:
+            self._store_refresh(id_type, identifier, fetch(id_type, identifier))
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Erro ao atualizar cache da API Fusion: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    async def _arefresh(self, key, id_type, identifier, fetch):
+        try:
+            result = await fetch(id_type, identifier)
+            await self._in_thread(self._store_refresh, id_type, identifier, result)
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Erro ao atualizar cache da API Fusion: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _store_refresh(self, id_type, identifier, result):
+        """Grava o resultado da atualização; em caso de erro a resposta antiga é mantida"""
+        self.refreshes += 1
+        if result is None:
+            self.refresh_errors += 1
+            return
+        self.put(id_type, identifier, result)
+
+    def stats(self):
+        """Retorna métricas do cache"""
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale) / lookups, 4) if lookups else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "evicted": self.backend.evicted,
+            "backend_errors": self.backend_errors
+        }
@@ -5,6 +5,10 @@ class FusionAPIMock:
     Versão mock da API Fusion para desenvolvimento.
     """
     
+    async def aget_client_data(self, id_type, identifier):
+        """Versão assíncrona de get_client_data (mock)"""
+        return self.get_client_data(id_type, identifier)
+    
     def get_client_data(self, id_type, identifier):
         """
         Consulta dados do cliente (mock)
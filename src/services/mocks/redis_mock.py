@@ -0,0 +1,266 @@
+import copy
+import fnmatch
+import threading
+import time
+
+
+class RedisMock:
+    """
+    Versão mock (em processo) do cliente Redis para desenvolvimento.
+    Implementa o subconjunto de comandos usado pelas sessões e pela
+    deduplicação (strings, hashes, listas, TTL e pipelines), guardando
+    os valores como bytes, como o cliente real. Comandos, pipelines e
+    scripts são executados um de cada vez, como no servidor.
+
+    Scripts: só o protocolo do script de gravação condicional do
+    RedisSessionStore é suportado (confere a versão no hash e aplica a
+    lista de comandos), já que não há interpretador Lua.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+
+        # Idas ao "servidor" e comandos executados, para benchmarks
+        self.round_trips = 0
+        self.commands = 0
+
+    def pipeline(self, transaction=True):
+        return _PipelineMock(self)
+
+    def register_script(self, script):
+        return _ScriptMock(self)
+
+    def _call(self, name, *args, **kwargs):
+        with self._lock:
+            self.round_trips += 1
+            return self._execute(name, args, kwargs)
+
+    def _execute(self, name, args, kwargs):
+        self.commands += 1
+        return getattr(self, "_cmd_" + name)(*args, **kwargs)
+
+    def _alive(self, key):
+        """Descarta a chave se expirada; retorna se ela existe"""
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    # Comandos (cada um é uma ida ao servidor fora de um pipeline)
+
+    def get(self, key):
+        return self._call("get", key)
+
+    def set(self, key, value, nx=False, ex=None):
+        return self._call("set", key, value, nx=nx, ex=ex)
+
+    def setex(self, key, ttl, value):
+        return self._call("set", key, value, ex=ttl)
+
+    def delete(self, *keys):
+        return self._call("delete", *keys)
+
+    def expire(self, key, ttl):
+        return self._call("expire", key, ttl)
+
+    def hset(self, key, mapping):
+        return self._call("hset", key, mapping=mapping)
+
+    def hget(self, key, name):
+        return self._call("hget", key, name)
+
+    def hmget(self, key, *names):
+        return self._call("hmget", key, *names)
+
+    def hgetall(self, key):
+        return self._call("hgetall", key)
+
+    def rpush(self, key, *values):
+        return self._call("rpush", key, *values)
+
+    def lrange(self, key, start, end):
+        return self._call("lrange", key, start, end)
+
+    def ltrim(self, key, start, end):
+        return self._call("ltrim", key, start, end)
+
+    def dump(self, key):
+        return self._call("dump", key)
+
+    def pttl(self, key):
+        return self._call("pttl", key)
+
+    def restore(self, key, ttl, value, replace=False):
+        return self._call("restore", key, ttl, value, replace=replace)
+
+    def scan_iter(self, match=None, count=None):
+        """Percorre as chaves em lotes de 'count' (uma ida ao servidor por lote, como o SCAN)"""
+        with self._lock:
+            keys = [key for key in self._data if match is None or fnmatch.fnmatchcase(key, match)]
+        count = count or 10
+        for start in range(0, len(keys), count):
+            with self._lock:
+                self.round_trips += 1
+                batch = [key for key in keys[start:start + count] if self._alive(key)]
+            yield from batch
+
+    def _cmd_get(self, key):
+        return self._data[key] if self._alive(key) else None
+
+    def _cmd_set(self, key, value, nx=False, ex=None):
+        if nx and self._alive(key):
+            return None
+        self._data[key] = _to_bytes(value)
+        self._expires.pop(key, None)
+        if ex:
+            self._expires[key] = time.monotonic() + ex
+        return True
+
+    def _cmd_delete(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                del self._data[key]
+                self._expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def _cmd_expire(self, key, ttl):
+        if not self._alive(key):
+            return False
+        self._expires[key] = time.monotonic() + ttl
+        return True
+
+    def _cmd_dump(self, key):
+        # Representação opaca: cópia do valor (o servidor real usa o formato RDB)
+        return ("mock-dump", copy.deepcopy(self._data[key])) if self._alive(key) else None
+
+    def _cmd_pttl(self, key):
+        if not self._alive(key):
+            return -2
+        expires_at = self._expires.get(key)
+        return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+
+    def _cmd_restore(self, key, ttl, value, replace=False):
+        if self._alive(key) and not replace:
+            raise ValueError("BUSYKEY Target key name already exists")
+        self._data[key] = copy.deepcopy(value[1])
+        self._expires.pop(key, None)
+        if ttl:
+            self._expires[key] = time.monotonic() + ttl / 1000
+        return True
+
+    def _cmd_hset(self, key, mapping):
+        current = self._data.get(key) if self._alive(key) else None
+        if current is None:
+            current = self._data[key] = {}
+        added = sum(1 for name in mapping if _to_bytes(name) not in current)
+        for name, value in mapping.items():
+            current[_to_bytes(name)] = _to_bytes(value)
+        return added
+
+    def _cmd_hget(self, key, name):
+        return self._data[key].get(_to_bytes(name)) if self._alive(key) else None
+
+    def _cmd_hmget(self, key, *names):
+        current = self._data[key] if self._alive(key) else {}
+        return [current.get(_to_bytes(name)) for name in names]
+
+    def _cmd_hgetall(self, key):
+        return dict(self._data[key]) if self._alive(key) else {}
+
+    def _cmd_rpush(self, key, *values):
+        current = self._data.get(key) if self._alive(key) else None
+        if current is None:
+            current = self._data[key] = []
+        current.extend(_to_bytes(value) for value in values)
+        return len(current)
+
+    def _cmd_lrange(self, key, start, end):
+        if not self._alive(key):
+            return []
+        items = self._data[key]
+        end = len(items) if end == -1 else end + 1
+        return items[start:end]
+
+    def _cmd_ltrim(self, key, start, end):
+        if self._alive(key):
+            items = self._data[key]
+            end = len(items) if end == -1 else end + 1
+            self._data[key] = items[start:end]
+        return True
+
+
+class _PipelineMock:
+    """Acumula comandos e os executa em uma única ida ao servidor"""
+
+    def __init__(self, client):
+        self.client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        if not hasattr(self.client, "_cmd_" + name):
+            raise AttributeError(name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+        return queue
+
+    def setex(self, key, ttl, value):
+        self._commands.append(("set", (key, value), {"ex": ttl}))
+        return self
+
+    def execute(self):
+        with self.client._lock:
+            self.client.round_trips += 1
+            results = [self.client._execute(name, args, kwargs) for name, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+class _ScriptMock:
+    """
+    Script de gravação condicional: KEYS = chaves usadas; ARGV = versão esperada,
+    (nº de argumentos, comando, índice da chave em KEYS, argumentos)...
+    """
+
+    COMMANDS = {"DEL": "delete", "HSET": "hset", "RPUSH": "rpush", "LTRIM": "ltrim", "EXPIRE": "expire"}
+
+    def __init__(self, client):
+        self.client = client
+
+    def __call__(self, keys=(), args=()):
+        client = self.client
+        with client._lock:
+            client.round_trips += 1
+            current = client._execute("hget", (keys[0], "version"), {})
+            if (current or b"0") != _to_bytes(args[0]):
+                return 0
+
+            i = 1
+            while i < len(args):
+                count = int(args[i])
+                name, index, *params = args[i + 1:i + 1 + count]
+                self._apply(name, [keys[int(index) - 1], *params])
+                i += count + 1
+            return 1
+
+    def _apply(self, name, params):
+        command = self.COMMANDS[name]
+        if command == "hset":
+            mapping = dict(zip(params[1::2], params[2::2]))
+            self.client._execute("hset", (params[0],), {"mapping": mapping})
+        elif command in ("ltrim", "expire"):
+            self.client._execute(command, (params[0], *map(int, params[1:])), {})
+        else:
+            self.client._execute(command, tuple(params), {})
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
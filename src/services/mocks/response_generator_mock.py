@@ -99,6 +99,14 @@ class ResponseGeneratorMock:
             f"Estamos trabalhando para implementá-la em breve. Por enquanto, posso ajudar com consultas de status e informações sobre seu atendimento."
         )
     
+    def generate_high_demand_response(self, channel="web"):
+        """Gera resposta quando o atendimento está sobrecarregado"""
+        return (
+            f"Olá! No momento estamos com alta demanda de atendimentos.\n\n"
+            f"Por favor, aguarde alguns minutos e envie sua mensagem novamente. "
+            f"Se preferir, entre em contato com nossa central pelo 0800-727-2327."
+        )
+    
     def generate_fallback_response(self, channel="web"):
         """Gera resposta padrão quando não entende a solicitação"""
         return (
@@ -0,0 +1,20 @@
+class WhatsAppServiceMock:
+    """
+    Versão mock do serviço WhatsApp para desenvolvimento.
+    """
+
+    def __init__(self):
+        # Mensagens "enviadas" para inspeção em desenvolvimento
+        self.sent_messages = []
+
+    def send_message(self, to, message_text):
+        """Envia mensagem de texto (simulado)"""
+        self.sent_messages.append({"to": to, "text": message_text})
+        print(f"[MOCK] Enviando mensagem para {to}: {message_text}")
+        return True
+
+    def send_template(self, to, template_name, template_params=None):
+        """Envia mensagem de template (simulado)"""
+        self.sent_messages.append({"to": to, "template": template_name})
+        print(f"[MOCK] Enviando template {template_name} para {to}")
+        return True
@@ -18,13 +18,21 @@ class WhatsAppService:
             self.api_token = st.secrets.get("whatsapp", {}).get("api_token", "")
             self.phone_number_id = st.secrets.get("whatsapp", {}).get("phone_number_id", "")
             self.api_version = st.secrets.get("whatsapp", {}).get("api_version", "v17.0")
-            self.api_url = f"https://graph.facebook.com/{self.api_version}/{self.phone_number_id}/messages"
+            api_base_url = st.secrets.get("whatsapp", {}).get("api_base_url", "https://graph.facebook.com")
+            self.api_url = f"{api_base_url}/{self.api_version}/{self.phone_number_id}/messages"
         except Exception as e:
             logger.warning(f"Não foi possível carregar configurações WhatsApp: {str(e)}")
             self.api_token = ""
             self.phone_number_id = ""
             self.api_version = "v17.0"
             self.api_url = "https://graph.facebook.com/v17.0/messages"
+        
+        # Sessão HTTP reutilizada entre chamadas (keep-alive)
+        self.http = requests.Session()
+    
+    def close(self):
+        """Fecha a sessão HTTP"""
+        self.http.close()
     
     def send_message(self, to, message_text):
         """
@@ -61,7 +69,7 @@ class WhatsAppService:
             }
             
             # Enviar requisição
-            response = requests.post(
+            response = self.http.post(
                 self.api_url,
                 json=payload,
                 headers=headers,
@@ -128,7 +136,7 @@ class WhatsAppService:
             }
             
             # Enviar requisição
-            response = requests.post(
+            response = self.http.post(
                 self.api_url,
                 json=payload,
                 headers=headers,
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import threading
+import httpx
+import streamlit as st
+from src.utils.rate_limiter import TokenBucket
+from src.services.whatsapp_spool import MessageSpool
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncWhatsAppService:
+    """
+    Cliente assíncrono da API do WhatsApp Business (Graph API).
+    Mantém um pool de conexões HTTP persistente, limita a taxa de envio por
+    phone_number_id (token bucket) e guarda em um spool local (SQLite) as
+    mensagens que falharem, reenviando-as em segundo plano. As operações no
+    spool rodam em threads (asyncio.to_thread) para não bloquear o event loop.
+    """
+
+    # Status HTTP que indicam falha temporária (mensagem vai para o spool)
+    RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+    def __init__(self):
+        # Tentar obter configurações do secrets
+        try:
+            config = st.secrets.get("whatsapp", {})
+            self.api_token = config.get("api_token", "")
+            self.phone_number_id = config.get("phone_number_id", "")
+            self.api_version = config.get("api_version", "v17.0")
+            self.api_base_url = config.get("api_base_url", "https://graph.facebook.com")
+            self.rate_limit = float(config.get("rate_limit", 80))
+            self.max_connections = int(config.get("max_connections", 20))
+            self.timeout = float(config.get("timeout", 10))
+            self.spool_path = config.get("spool_path", "whatsapp_spool.db")
+            self.max_attempts = int(config.get("max_attempts", 10))
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar configurações WhatsApp: {str(e)}")
+            self.api_token = ""
+            self.phone_number_id = ""
+            self.api_version = "v17.0"
+            self.api_base_url = "https://graph.facebook.com"
+            self.rate_limit = 80.0
+            self.max_connections = 20
+            self.timeout = 10.0
+            self.spool_path = "whatsapp_spool.db"
+            self.max_attempts = 10
+
+        self.client = None
+        self.spool = None
+        self.loop = None
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self._drain_task = None
+        self._wakeup = None
+        self._closing = False
+        # Envios agendados no próprio event loop (referência até terminarem)
+        self._tasks = set()
+
+        # Métricas
+        self.sent = 0
+        self.failed = 0
+        self.spooled = 0
+        self.resent = 0
+        self.dropped = 0
+        self.spool_pending = 0
+
+    @property
+    def enabled(self):
+        """Envio real só ocorre com token e phone_number_id configurados"""
+        return bool(self.api_token and self.phone_number_id)
+
+    async def start(self):
+        """Cria o pool de conexões, abre o spool e inicia o reenvio em segundo plano"""
+        self.loop = asyncio.get_running_loop()
+        if not self.enabled:
+            return
+
+        self.client = httpx.AsyncClient(
+            base_url=self.api_base_url,
+            headers={"Authorization": f"Bearer {self.api_token}"},
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            )
+        )
+        self.spool = await asyncio.to_thread(MessageSpool, self.spool_path)
+        self.spool_pending = await asyncio.to_thread(self.spool.count)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._drain_task = asyncio.create_task(self._drain_spool())
+
+        if self.spool_pending:
+            logger.info(f"Spool do WhatsApp com {self.spool_pending} mensagens pendentes")
+
+    async def aclose(self):
+        """Encerra o reenvio em segundo plano e fecha o pool de conexões"""
+        if self._drain_task is not None:
+            # Sinalizar além de cancelar: wait_for pode engolir o cancelamento se
+            # o evento de reenvio disparar no mesmo instante
+            self._closing = True
+            self._wakeup.set()
+            self._drain_task.cancel()
+            await asyncio.gather(self._drain_task, return_exceptions=True)
+            self._drain_task = None
+        if self._tasks:
+            # Envios agendados no event loop terminam antes de fechar o pool
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self.spool is not None:
+            await asyncio.to_thread(self.spool.close)
+            self.spool = None
+
+    async def asend_message(self, to, message_text, phone_number_id=None):
+        """
+        Envia mensagem de texto via WhatsApp
+
+        Args:
+            to (str): Número do destinatário (com código do país, ex: 5511987654321)
+            message_text (str): Texto da mensagem
+            phone_number_id (str): Número remetente (padrão: o configurado)
+
+        Returns:
+            bool: True se enviado, False se falhou (falhas temporárias vão para o spool)
+        """
+        if not self.enabled:
+            logger.info(f"[MOCK] Enviando mensagem para {to}: {message_text}")
+            return True
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": to,
+            "type": "text",
+            "text": {
+                "body": message_text
+            }
+        }
+        return await self._send(phone_number_id or self.phone_number_id, payload)
+
+    async def asend_template(self, to, template_name, template_params=None, phone_number_id=None):
+        """
+        Envia mensagem utilizando template do WhatsApp
+
+        Args:
+            to (str): Número do destinatário
+            template_name (str): Nome do template
+            template_params (list): Parâmetros do template
+            phone_number_id (str): Número remetente (padrão: o configurado)
+
+        Returns:
+            bool: True se enviado, False se falhou (falhas temporárias vão para o spool)
+        """
+        if not self.enabled:
+            logger.info(f"[MOCK] Enviando template {template_name} para {to}")
+            return True
+
+        components = []
+        if template_params:
+            components.append({
+                "type": "body",
+                "parameters": template_params
+            })
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": to,
+            "type": "template",
+            "template": {
+                "name": template_name,
+                "language": {
+                    "code": "pt_BR"
+                },
+                "components": components
+            }
+        }
+        return await self._send(phone_number_id or self.phone_number_id, payload)
+
+    def send_message(self, to, message_text):
+        """
+        Versão síncrona de asend_message para uso pelas threads dos workers.
+        Quando chamada no próprio event loop, agenda o envio e retorna True.
+        """
+        return self._run_sync(self.asend_message(to, message_text))
+
+    def send_template(self, to, template_name, template_params=None):
+        """Versão síncrona de asend_template (ver send_message)"""
+        return self._run_sync(self.asend_template(to, template_name, template_params))
+
+    def _run_sync(self, coro):
+        """Executa uma corrotina no event loop do serviço a partir de outra thread"""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is not None and running is self.loop:
+            # Já no event loop: não bloquear; falhas temporárias vão para o spool
+            task = self.loop.create_task(coro)
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            return True
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _bucket(self, phone_number_id):
+        """Limitador de taxa do número remetente"""
+        bucket = self._buckets.get(phone_number_id)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.setdefault(phone_number_id, TokenBucket(self.rate_limit))
+        return bucket
+
+    async def _post(self, phone_number_id, payload):
+        """
+        Faz a chamada à Graph API respeitando o limite de taxa
+
+        Returns:
+            tuple: (sucesso, temporária, erro)
+        """
+        await self._bucket(phone_number_id).acquire()
+
+        try:
+            response = await self.client.post(
+                f"/{self.api_version}/{phone_number_id}/messages",
+                json=payload
+            )
+        except httpx.HTTPError as e:
+            return False, True, str(e)
+
+        if response.status_code == 200:
+            return True, False, None
+
+        error = f"{response.status_code} - {response.text}"
+        return False, response.status_code in self.RETRYABLE_STATUS, error
+
+    async def _send(self, phone_number_id, payload):
+        """Envia a mensagem e, em falha temporária, guarda no spool"""
+        success, retryable, error = await self._post(phone_number_id, payload)
+
+        if success:
+            self.sent += 1
+            logger.info(f"Mensagem enviada com sucesso para {payload['to']}")
+            return True
+
+        if retryable:
+            self.spooled += 1
+            self.spool_pending += 1
+            await asyncio.to_thread(self.spool.add, phone_number_id, payload, error, delay=1.0)
+            self._wakeup.set()
+            logger.warning(f"Falha temporária ao enviar para {payload['to']}, mensagem no spool: {error}")
+        else:
+            self.failed += 1
+            logger.error(f"Erro ao enviar mensagem: {error}")
+        return False
+
+    async def _drain_spool(self):
+        """Reenvia mensagens do spool respeitando o limite de taxa"""
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=5.0)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._closing:
+                break
+
+            try:
+                for spool_id, phone_number_id, payload, attempts in await asyncio.to_thread(self.spool.due):
+                    success, retryable, error = await self._post(phone_number_id, payload)
+
+                    if success:
+                        self.resent += 1
+                        await asyncio.to_thread(self.spool.remove, spool_id)
+                    elif not retryable or attempts >= self.max_attempts:
+                        self.dropped += 1
+                        await asyncio.to_thread(self.spool.remove, spool_id)
+                        logger.error(f"Mensagem para {payload.get('to')} descartada após {attempts} tentativas: {error}")
+                    else:
+                        # Backoff exponencial limitado a 5 minutos
+                        await asyncio.to_thread(self.spool.reschedule, spool_id, min(300.0, 2.0 ** attempts), error)
+                self.spool_pending = await asyncio.to_thread(self.spool.count)
+            except Exception as e:
+                logger.error(f"Erro ao reenviar mensagens do spool: {str(e)}")
+
+    def stats(self):
+        """Retorna métricas de envio"""
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "spooled": self.spooled,
+            "resent": self.resent,
+            "dropped": self.dropped,
+            # Contagem atualizada a cada passada do reenvio (sem consultar o SQLite aqui)
+            "spool_pending": self.spool_pending
+        }
@@ -0,0 +1,97 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MessageSpool:
+    """
+    Fila local em disco (SQLite) para mensagens do WhatsApp que não puderam
+    ser enviadas. As mensagens ficam guardadas até serem reenviadas com sucesso
+    ou esgotarem o número máximo de tentativas.
+    """
+
+    def __init__(self, path="whatsapp_spool.db"):
+        """
+        Inicializa o spool
+
+        Args:
+            path (str): Caminho do arquivo SQLite (':memory:' para testes)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                phone_number_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_spool_next ON spool (next_attempt_at)")
+
+    def add(self, phone_number_id, payload, error=None, delay=0.0):
+        """
+        Guarda uma mensagem para reenvio
+
+        Args:
+            phone_number_id (str): Número remetente (WhatsApp Business)
+            payload (dict): Corpo da requisição para a Graph API
+            error (str): Motivo da falha
+            delay (float): Tempo (s) até a primeira nova tentativa
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO spool (phone_number_id, payload, attempts, next_attempt_at, created_at, last_error) "
+                "VALUES (?, ?, 1, ?, ?, ?)",
+                (phone_number_id, json.dumps(payload), now + delay, now, error)
+            )
+
+    def due(self, limit=100):
+        """
+        Retorna mensagens prontas para nova tentativa
+
+        Returns:
+            list: Tuplas (id, phone_number_id, payload, attempts)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, phone_number_id, payload, attempts FROM spool "
+                "WHERE next_attempt_at <= ? ORDER BY id LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+        return [(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+
+    def remove(self, spool_id):
+        """Remove uma mensagem (enviada ou descartada)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM spool WHERE id = ?", (spool_id,))
+
+    def reschedule(self, spool_id, delay, error=None):
+        """Agenda nova tentativa após 'delay' segundos"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE spool SET attempts = attempts + 1, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, spool_id)
+            )
+
+    def count(self):
+        """Número de mensagens aguardando reenvio"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def close(self):
+        """Fecha a conexão com o banco"""
+        with self._lock:
+            self._conn.close()
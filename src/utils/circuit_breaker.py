@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from src.utils.metrics import CIRCUIT_TRANSITIONS_TOTAL, CIRCUIT_REJECTED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker (fechado / aberto / meio-aberto) guiado pelo resultado
+    das chamadas reais a um serviço externo.
+
+    - fechado: as chamadas passam; 'failure_threshold' falhas seguidas abrem o circuito
+    - aberto: as chamadas são recusadas de imediato (sem esperar timeout)
+      até 'recovery_timeout' segundos, ou até a verificação de saúde em
+      segundo plano indicar que o serviço voltou
+    - meio-aberto: até 'half_open_max_calls' chamadas de teste passam; sucesso
+      fecha o circuito, falha o reabre
+
+    A verificação de saúde (opcional) roda em uma thread própria e só mantém
+    o estado em cache: o caminho das requisições nunca espera por ela.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1,
+                 health_check=None, health_interval=10.0):
+        """
+        Inicializa o circuit breaker
+
+        Args:
+            name (str): Nome do serviço (rótulo das métricas)
+            failure_threshold (int): Falhas seguidas que abrem o circuito
+            recovery_timeout (float): Tempo (s) aberto antes de permitir chamadas de teste
+            half_open_max_calls (int): Chamadas de teste simultâneas no estado meio-aberto
+            health_check: Função sem argumentos que retorna True se o serviço responde (opcional)
+            health_interval (float): Intervalo (s) entre verificações de saúde
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.health_check = health_check
+        self.health_interval = health_interval
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._lock = threading.Lock()
+
+        # Último resultado da verificação de saúde (None = ainda não verificado)
+        self.healthy = None
+        self._stop = threading.Event()
+        self._prober = None
+
+        # Métricas
+        self.opened = 0
+        self.rejected = 0
+
+    def start(self):
+        """Inicia a verificação de saúde em segundo plano (se configurada)"""
+        if self.health_check is not None and self._prober is None and self.health_interval:
+            self._stop.clear()
+            self._prober = threading.Thread(target=self._probe_loop, name=f"{self.name}-health", daemon=True)
+            self._prober.start()
+        return self
+
+    def close(self):
+        """Interrompe a verificação de saúde"""
+        self._stop.set()
+        if self._prober is not None:
+            self._prober.join(timeout=5)
+            self._prober = None
+
+    @property
+    def state(self):
+        """Estado atual (um circuito aberto vencido é informado como meio-aberto)"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow_request(self):
+        """
+        Verifica se uma chamada pode ser feita agora; toda chamada permitida
+        deve ser seguida de record_success() ou record_failure()
+
+        Returns:
+            bool: False se o circuito está aberto (a chamada não deve ser feita)
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    self.rejected += 1
+                    CIRCUIT_REJECTED_TOTAL.inc(self.name)
+                    return False
+                self._transition(self.HALF_OPEN)
+
+            if self._trial_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                CIRCUIT_REJECTED_TOTAL.inc(self.name)
+                return False
+            self._trial_calls += 1
+            return True
+
+    def record_success(self):
+        """Registra uma chamada bem-sucedida (o serviço respondeu)"""
+        with self._lock:
+            self._failures = 0
+            if self._state == self.HALF_OPEN:
+                self._trial_calls = max(0, self._trial_calls - 1)
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        """Registra uma falha (erro de conexão, timeout ou erro do servidor)"""
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN:
+                self._trial_calls = max(0, self._trial_calls - 1)
+                self._open()
+            elif self._state == self.CLOSED and self._failures >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        """Abre o circuito (com o lock adquirido)"""
+        self._opened_at = time.monotonic()
+        self.opened += 1
+        self._transition(self.OPEN)
+
+    def _transition(self, state):
+        """Muda o estado (com o lock adquirido)"""
+        if state == self._state:
+            return
+        if state == self.CLOSED:
+            self._failures = 0
+            self._trial_calls = 0
+        logger.warning(f"Circuit breaker '{self.name}': {self._state} -> {state}")
+        self._state = state
+        CIRCUIT_TRANSITIONS_TOTAL.inc(self.name, state)
+
+    def _probe_loop(self):
+        """Atualiza o estado de saúde em cache até close()"""
+        while not self._stop.wait(self.health_interval):
+            try:
+                self.healthy = bool(self.health_check())
+            except Exception as e:
+                logger.debug(f"Verificação de saúde '{self.name}' falhou: {str(e)}")
+                self.healthy = False
+
+            # Serviço voltou: permitir chamadas de teste sem esperar recovery_timeout
+            if self.healthy:
+                with self._lock:
+                    if self._state == self.OPEN:
+                        self._transition(self.HALF_OPEN)
+
+    def stats(self):
+        """Retorna o estado e as métricas do circuit breaker"""
+        return {
+            "state": self.state,
+            "open": self.state != self.CLOSED,
+            "consecutive_failures": self._failures,
+            "healthy": self.healthy,
+            "opened": self.opened,
+            "rejected": self.rejected
+        }
@@ -0,0 +1,277 @@
+import bisect
+import threading
+import time
+
+# Limites padrão dos histogramas de latência (segundos)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """
+    Base das métricas.
+    Cada thread agrega em seu próprio dicionário (sem lock no caminho quente);
+    os dicionários de todas as threads só são combinados na exportação.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        """Dicionário de agregação da thread atual"""
+        shard = getattr(self._local, "data", None)
+        if shard is None:
+            shard = {}
+            self._local.data = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _labels(self, labelvalues):
+        """Formata os rótulos no padrão Prometheus"""
+        if not self.labelnames:
+            return ""
+        pairs = ",".join(
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labelvalues)
+        )
+        return "{" + pairs + "}"
+
+    def _merged(self):
+        """Combina os dados de todas as threads"""
+        raise NotImplementedError
+
+    def render(self):
+        """Linhas no formato de exposição de texto do Prometheus"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador monotônico com rótulos"""
+
+    type = "counter"
+
+    def inc(self, *labelvalues, amount=1):
+        """Incrementa o contador para os valores de rótulo informados"""
+        shard = self._shard()
+        shard[labelvalues] = shard.get(labelvalues, 0) + amount
+
+    def _merged(self):
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for labels, value in list(shard.items()):
+                merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+    def value(self, *labelvalues):
+        """Valor atual (somado entre threads)"""
+        return self._merged().get(labelvalues, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._merged().items()):
+            lines.append(f"{self.name}{self._labels(labels)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histograma com limites fixos e rótulos"""
+
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labelvalues):
+        """Registra uma observação"""
+        shard = self._shard()
+        entry = shard.get(labelvalues)
+        if entry is None:
+            # [contagem por faixa (+Inf no fim), soma]
+            entry = shard[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def time(self, *labelvalues):
+        """Context manager que observa a duração do bloco em segundos"""
+        return _Timer(self, labelvalues)
+
+    def _merged(self):
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for labels, (counts, total) in list(shard.items()):
+                current = merged.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0])
+                for i, count in enumerate(counts):
+                    current[0][i] += count
+                current[1] += total
+        return merged
+
+    def snapshot(self, *labelvalues):
+        """Retorna (quantidade, soma) das observações para os rótulos"""
+        counts, total = self._merged().get(labelvalues, [[0], 0.0])
+        return sum(counts), total
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._merged().items()):
+            base = self._labels(labels)[1:-1]
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    """Mede a duração de um bloco e registra no histograma"""
+
+    __slots__ = ("histogram", "labelvalues", "started")
+
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labelvalues)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Registro das métricas do processo.
+    Além de contadores e histogramas, aceita coletores: funções chamadas na
+    exportação que retornam valores instantâneos (gauges), ex: profundidade da fila.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help, labelnames=()):
+        """Cria (ou retorna) um contador"""
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        """Cria (ou retorna) um histograma"""
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args)
+            return self._metrics[name]
+
+    def register_collector(self, collector):
+        """
+        Registra um coletor de gauges
+
+        Args:
+            collector: Função sem argumentos que retorna lista de (nome, valor)
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def unregister_collector(self, collector):
+        """Remove um coletor registrado"""
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self):
+        """Exporta todas as métricas no formato de texto do Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collector in collectors:
+            for name, value in collector():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    """Escapa valores de rótulo"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Registro global do processo e métricas compartilhadas entre os módulos
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "carglass_stage_duration_seconds",
+    "Duração de cada etapa do processamento de uma mensagem",
+    labelnames=("stage",)
+)
+INTENTS_TOTAL = metrics.counter(
+    "carglass_intents_total",
+    "Intenções detectadas por tipo",
+    labelnames=("intent",)
+)
+ACTIONS_TOTAL = metrics.counter(
+    "carglass_actions_total",
+    "Ações executadas por tipo",
+    labelnames=("action",)
+)
+ESCALATIONS_TOTAL = metrics.counter(
+    "carglass_escalations_total",
+    "Escalonamentos para atendente por motivo",
+    labelnames=("reason",)
+)
+SESSION_BYTES = metrics.histogram(
+    "carglass_session_bytes",
+    "Tamanho serializado das sessões gravadas (bytes)",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072)
+)
+SESSION_HISTORY_MESSAGES = metrics.histogram(
+    "carglass_session_history_messages",
+    "Mensagens mantidas no histórico recente das sessões gravadas",
+    buckets=(1, 2, 5, 10, 20, 30, 50, 100, 200)
+)
+SESSION_CONFLICTS_TOTAL = metrics.counter(
+    "carglass_session_conflicts_total",
+    "Gravações de sessão rejeitadas por versão desatualizada (outro worker gravou antes)"
+)
+CIRCUIT_TRANSITIONS_TOTAL = metrics.counter(
+    "carglass_circuit_breaker_transitions_total",
+    "Mudanças de estado dos circuit breakers de serviços externos",
+    labelnames=("breaker", "state")
+)
+CIRCUIT_REJECTED_TOTAL = metrics.counter(
+    "carglass_circuit_breaker_rejected_total",
+    "Chamadas não enviadas porque o circuito estava aberto",
+    labelnames=("breaker",)
+)
+FUSION_CACHE_TOTAL = metrics.counter(
+    "carglass_fusion_cache_total",
+    "Consultas ao cache da API Fusion por resultado (hit, stale, miss)",
+    labelnames=("result",)
+)
+SINGLE_FLIGHT_COALESCED_TOTAL = metrics.counter(
+    "carglass_single_flight_coalesced_total",
+    "Chamadas que aguardaram o resultado de uma chamada idêntica já em andamento",
+    labelnames=("name",)
+)
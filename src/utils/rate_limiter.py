@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador de taxa do tipo token bucket.
+    Permite rajadas de até 'capacity' operações e uma taxa sustentada de
+    'rate' operações por segundo.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Inicializa o limitador
+
+        Args:
+            rate (float): Tokens repostos por segundo
+            capacity (float): Tamanho máximo da rajada (padrão: igual a rate)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Reserva um token
+
+        Returns:
+            float: Tempo (s) a aguardar antes de usar o token reservado
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+
+            # Tokens podem ficar negativos: cada reserva "entra na fila" após as anteriores
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    async def acquire(self):
+        """Aguarda (sem bloquear o event loop) até obter um token"""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import threading
+from src.utils.metrics import SINGLE_FLIGHT_COALESCED_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """Chamada síncrona em andamento e seu resultado"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Deduplicação de chamadas idênticas simultâneas (single-flight).
+
+    Enquanto uma chamada para uma chave está em andamento, as demais
+    chamadas com a mesma chave não são executadas: aguardam e recebem o
+    mesmo resultado (ou a mesma exceção). Terminada a chamada, a próxima
+    executa de novo. do() atende threads e ado() corrotinas no event loop.
+    """
+
+    def __init__(self, name):
+        """
+        Args:
+            name (str): Nome do serviço (rótulo das métricas)
+        """
+        self.name = name
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+        # Métricas
+        self.executed = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        """
+        Executa fn(*args), ou aguarda a execução em andamento para a mesma chave
+
+        Args:
+            key: Chave que identifica chamadas equivalentes
+            fn: Função a executar
+
+        Returns:
+            Resultado de fn (compartilhado entre as chamadas agrupadas)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            SINGLE_FLIGHT_COALESCED_TOTAL.inc(self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key, fn, *args):
+        """
+        Versão assíncrona de do(): fn é uma corrotina, executada como tarefa
+        para que o cancelamento de quem a iniciou não afete os demais
+
+        Returns:
+            Resultado de fn (compartilhado entre as chamadas agrupadas)
+        """
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(fn(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda finished: self._forget(key, finished))
+            with self._lock:
+                self.executed += 1
+        else:
+            with self._lock:
+                self.coalesced += 1
+            SINGLE_FLIGHT_COALESCED_TOTAL.inc(self.name)
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        """Remove a tarefa concluída (se ainda for a registrada para a chave)"""
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Exceção já entregue a quem aguardava; evita o aviso de exceção não lida
+            logger.debug(f"Chamada '{self.name}' falhou: {str(task.exception())}")
+
+    def stats(self):
+        """Retorna as métricas de deduplicação"""
+        return {
+            "in_flight": len(self._calls) + len(self._tasks),
+            "executed": self.executed,
+            "coalesced": self.coalesced
+        }
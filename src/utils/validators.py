@@ -183,3 +183,22 @@ def validate_ordem(ordem):
         return True
     
     return False
+
+def normalize_identifier(id_type, value):
+    """
+    Normaliza um identificador da mesma forma que detect_identifier_type,
+    para comparar valores digitados pelo cliente com os retornados pela API.
+    
+    Args:
+        id_type (str): Tipo de identificador (cpf, telefone, placa, ordem, chassi)
+        value (str): Valor do identificador
+        
+    Returns:
+        str: Identificador normalizado ('' se vazio)
+    """
+    clean = re.sub(r'[^a-zA-Z0-9]', '', str(value or '')).upper()
+    
+    # Ordem informada só com números recebe o prefixo ORD
+    if id_type == "ordem" and re.match(r'^\d{5,8}$', clean):
+        return f"ORD{clean}"
+    return clean
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+import pytest
+
+from src.channels.whatsapp.container import GatewayContainer
+from src.channels.whatsapp.dedup import MessageDeduplicator
+from src.services.mocks.redis_mock import RedisMock
+
+
+class SlowSharedStore(RedisMock):
+    """Armazenamento compartilhado com latência nas gravações"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.claims = 0
+
+    def set(self, key, value, nx=False, ex=None):
+        self.claims += 1
+        time.sleep(self.delay)
+        return super().set(key, value, nx=nx, ex=ex)
+
+
+def test_shared_claim_does_not_block_event_loop():
+    dedup = MessageDeduplicator(shared_store=SlowSharedStore(delay=0.2))
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        duplicate = await dedup.ais_duplicate("wamid.1")
+        task.cancel()
+        return duplicate, ticks
+
+    duplicate, ticks = asyncio.run(scenario())
+
+    assert duplicate is False
+    assert ticks >= 10
+
+
+def test_concurrent_redeliveries_claim_shared_store_once():
+    store = SlowSharedStore(delay=0.05)
+    dedup = MessageDeduplicator(shared_store=store)
+
+    async def scenario():
+        return await asyncio.gather(*(dedup.ais_duplicate("wamid.2") for _ in range(5)))
+
+    results = asyncio.run(scenario())
+
+    assert results.count(False) == 1
+    assert store.claims == 1
+    assert dedup.stats()["duplicates_dropped"] == 4
+
+
+def test_message_claimed_by_other_process_is_duplicate():
+    store = RedisMock()
+    first = MessageDeduplicator(shared_store=store)
+    second = MessageDeduplicator(shared_store=store)
+
+    assert first.is_duplicate("wamid.3") is False
+    assert second.is_duplicate("wamid.3") is True
+    # Lembrada localmente: a reentrega seguinte não consulta o armazenamento
+    assert second.is_duplicate("wamid.3") is True
+    assert second.stats()["duplicates_dropped"] == 2
+
+
+def test_shared_dedup_rejects_memory_sessions():
+    container = GatewayContainer(settings={"dedup_backend": "shared", "ingestion_mode": "inline"})
+
+    with pytest.raises(ValueError, match="MemorySessionStore"):
+        container.startup()
+    container.session_store.close()
+
+
+def test_released_message_is_processed_on_redelivery():
+    store = RedisMock()
+    dedup = MessageDeduplicator(shared_store=store)
+    other_process = MessageDeduplicator(shared_store=store)
+
+    async def scenario():
+        first = await dedup.ais_duplicate("wamid.4")
+        # Fila cheia: a mensagem não foi aceita
+        await dedup.arelease("wamid.4")
+        redelivered = await other_process.ais_duplicate("wamid.4")
+        again = await dedup.ais_duplicate("wamid.4")
+        return first, redelivered, again
+
+    assert asyncio.run(scenario()) == (False, False, True)
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+from src.channels.whatsapp.dispatcher import ACCEPTED, SHED, MessageDispatcher
+
+
+def message(i):
+    return {"message_id": f"wamid.{i}", "sender": f"5511{i:09d}", "channel": "whatsapp"}
+
+
+def test_shed_notices_bounded_while_graph_sends_are_slow():
+    release = threading.Event()
+    notified = []
+
+    def handler(msg):
+        release.wait()
+
+    def shed_handler(msg):
+        notified.append(msg["message_id"])
+        release.wait()
+
+    async def scenario():
+        dispatcher = MessageDispatcher(
+            handler, workers=1, shed_handler=shed_handler,
+            high_watermark=1, low_watermark=0, shed_queue_size=3
+        )
+        await dispatcher.start()
+        results = [dispatcher.submit(message(i)) for i in range(10)]
+        stats = dispatcher.stats()
+
+        release.set()
+        await dispatcher.stop()
+        return results, stats, dispatcher.stats()
+
+    results, during, after = asyncio.run(scenario())
+
+    assert results[0] == ACCEPTED
+    assert results[1:] == [SHED] * 9
+    assert during["shed_notices_pending"] == 3
+    assert during["shed_notices_dropped"] == 6
+    assert after["shed_notices_pending"] == 0
+    assert len(notified) == 3
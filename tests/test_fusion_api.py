@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+import httpx
+
+from src.services.fusion_api import FusionAPI
+from src.services.fusion_cache import StoreFusionCacheBackend
+from src.services.mocks.redis_mock import RedisMock
+
+RECORD = {
+    "nome": "Cliente",
+    "cpf": "12345678900",
+    "telefone": "11987654321",
+    "ordem": "ORD123456",
+    "status": "Concluído",
+    "veiculo": {"modelo": "Honda Civic", "placa": "ABC1234", "ano": "2020"}
+}
+
+
+class Upstream:
+    """Servidor Fusion simulado no transporte do httpx"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.requests = 0
+
+    def __call__(self, request):
+        self.requests += 1
+        return httpx.Response(self.status_code, json=RECORD)
+
+
+def build_api(upstream):
+    api = FusionAPI()
+    api.environment = "prod"
+    api.base_urls["prod"] = "http://fusion.test/api"
+    api.breaker.close()
+    api.async_http = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+    return api
+
+
+def test_async_lookup_shares_cache_with_sync_path():
+    upstream = Upstream()
+    api = build_api(upstream)
+
+    async def scenario():
+        try:
+            return await api.aget_client_data("cpf", "12345678900")
+        finally:
+            await api.aclose()
+
+    result = asyncio.run(scenario())
+
+    assert result["sucesso"] is True
+    assert result["dados"]["nome"] == "Cliente"
+    # Consulta síncrona por outro identificador do mesmo atendimento vem do cache
+    assert api.get_client_data("placa", "ABC1234")["dados"]["cpf"] == "12345678900"
+    assert upstream.requests == 1
+    api.close()
+
+
+def test_async_failures_open_shared_breaker():
+    upstream = Upstream(status_code=503)
+    api = build_api(upstream)
+    threshold = api.breaker.failure_threshold
+
+    async def scenario():
+        try:
+            for _ in range(threshold):
+                assert await api.aget_client_data("cpf", "99999999999") is None
+            return await api.aget_client_data("cpf", "99999999999")
+        finally:
+            await api.aclose()
+
+    result = asyncio.run(scenario())
+
+    assert api.breaker.stats()["state"] == "open"
+    assert upstream.requests == threshold
+    # Circuito aberto: resposta do modo offline sem consultar a API
+    assert result["sucesso"] is False
+    api.close()
+
+
+def test_shared_cache_reads_run_off_event_loop():
+    api = build_api(Upstream())
+    api.cache_backend = "shared"
+    api.attach_shared_cache(RedisMock())
+    backend = api.cache.backend
+    threads = []
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return StoreFusionCacheBackend.get(backend, key)
+
+    backend.get = recording_get
+
+    async def scenario():
+        try:
+            await api.aget_client_data("cpf", "12345678900")
+            return await api.aget_client_data("cpf", "12345678900")
+        finally:
+            await api.aclose()
+
+    assert asyncio.run(scenario())["sucesso"] is True
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+    assert api.cache.stats()["hits"] == 1
+    api.close()
+
+
+def test_concurrent_async_lookups_coalesce():
+    upstream = Upstream()
+    api = build_api(upstream)
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*(api.aget_client_data("ordem", "ORD123456") for _ in range(8)))
+        finally:
+            await api.aclose()
+
+    results = asyncio.run(scenario())
+
+    assert all(result["sucesso"] for result in results)
+    assert upstream.requests == 1
+    assert api.stats()["coalesced"] == 7
+    api.close()
@@ -0,0 +1,165 @@
+from src.core.decision_engine import Action, DecisionEngine as RulesEngine
+from src.core.orchestrator import ActionOrchestrator
+from src.core.session_manager import SessionManager
+from src.core.session_store import MemorySessionStore
+from src.services.mocks.ai_service_mock import AIServiceMock
+from src.services.mocks.response_generator_mock import ResponseGeneratorMock
+from src.utils.metrics import SESSION_CONFLICTS_TOTAL
+
+
+class Intent:
+    type = "escalate"
+
+
+class IntentDetector:
+    def detect(self, user_input, session):
+        return Intent()
+
+
+class DecisionEngine:
+    def determine_action(self, intent, session):
+        session.get_state()
+        return Action("escalate", {"reason": "Cliente pediu atendente"})
+
+
+class EscalationService:
+    """Conta os escalonamentos; no primeiro, outro worker grava a mesma sessão"""
+
+    def __init__(self, concurrent_turn=None):
+        self.calls = 0
+        self.concurrent_turn = concurrent_turn
+
+    def escalate(self, user_id, channel, history, reason):
+        self.calls += 1
+        if self.calls == 1 and self.concurrent_turn is not None:
+            self.concurrent_turn()
+        return f"ESC-{self.calls}"
+
+
+class Services:
+    def __init__(self, escalation_service):
+        self.intent_detector = IntentDetector()
+        self.decision_engine = DecisionEngine()
+        self.escalation_service = escalation_service
+        self.response_generator = ResponseGeneratorMock()
+        self.ai_service = AIServiceMock()
+
+    def get(self, name):
+        return getattr(self, name)
+
+
+def test_conflict_reapplies_turn_without_repeating_escalation():
+    store = MemorySessionStore(sweep_interval=0)
+    other_worker = SessionManager(store)
+
+    def concurrent_turn():
+        session = other_worker.get_session("whatsapp", "5511999999999")
+        session.add_message("user", "mensagem de outro worker")
+        other_worker.commit_session(session)
+
+    # A sessão já existe antes do turno
+    other_worker.commit_session(other_worker.get_session("whatsapp", "5511999999999"))
+
+    escalation = EscalationService(concurrent_turn)
+    manager = SessionManager(store)
+    orchestrator = ActionOrchestrator(manager, Services(escalation), max_attempts=3)
+
+    conflicts = SESSION_CONFLICTS_TOTAL.value()
+    response = orchestrator.process_input("quero falar com um atendente", "whatsapp", "5511999999999")
+
+    assert SESSION_CONFLICTS_TOTAL.value() - conflicts == 1
+    assert escalation.calls == 1
+    assert "ESC-1" in response
+
+    session = SessionManager(store).get_session("whatsapp", "5511999999999")
+    contents = [m["content"] for m in session.get_full_history()]
+    assert "mensagem de outro worker" in contents
+    assert contents[-2:] == ["quero falar com um atendente", response]
+    assert session.fields["escalation_info"]["reason"] == "Cliente pediu atendente"
+    store.close()
+
+
+def test_turn_without_conflict_commits_once():
+    store = MemorySessionStore(sweep_interval=0)
+    escalation = EscalationService()
+    orchestrator = ActionOrchestrator(SessionManager(store), Services(escalation))
+
+    orchestrator.process_input("atendente", "whatsapp", "5511888888888")
+
+    session = SessionManager(store).get_session("whatsapp", "5511888888888")
+    assert session.fields["version"] == 1
+    assert escalation.calls == 1
+    store.close()
+
+
+def test_conflict_with_changed_state_escalates_once_and_keeps_state():
+    store = MemorySessionStore(sweep_interval=0)
+    other_worker = SessionManager(store)
+
+    def concurrent_turn():
+        session = other_worker.get_session("whatsapp", "5511777777777")
+        session.set_state("awaiting_followup")
+        other_worker.commit_session(session)
+
+    other_worker.commit_session(other_worker.get_session("whatsapp", "5511777777777"))
+
+    escalation = EscalationService(concurrent_turn)
+    orchestrator = ActionOrchestrator(SessionManager(store), Services(escalation))
+
+    response = orchestrator.process_input("atendente", "whatsapp", "5511777777777", message_id="wamid.1")
+
+    # A decisão é refeita sobre o novo estado, sem escalar o turno de novo
+    assert escalation.calls == 1
+    assert "ESC-1" in response
+    session = SessionManager(store).get_session("whatsapp", "5511777777777")
+    assert session.get_state() == "awaiting_followup"
+    assert session.fields["escalation_info"]["reason"] == "Cliente pediu atendente"
+    store.close()
+
+
+class StatusIntent:
+    type = "ask_status"
+    value = "qual o status do meu pedido?"
+
+
+class IdentifiedByOtherWorker:
+    """Na primeira detecção, outro worker identifica o cliente pelo CPF"""
+
+    def __init__(self, concurrent_turn):
+        self.concurrent_turn = concurrent_turn
+
+    def detect(self, user_input, session):
+        if self.concurrent_turn is not None:
+            self.concurrent_turn()
+            self.concurrent_turn = None
+        return StatusIntent()
+
+
+def test_conflict_with_identified_customer_redoes_decision():
+    store = MemorySessionStore(sweep_interval=0)
+    other_worker = SessionManager(store)
+    client_data = {"sucesso": True, "dados": {"nome": "Cliente", "status": "Em andamento"}}
+
+    def concurrent_turn():
+        session = other_worker.get_session("whatsapp", "5511666666666")
+        session.add_message("user", "12345678900")
+        session.update_client_info(client_data)
+        session.set_state("awaiting_followup")
+        other_worker.commit_session(session)
+
+    other_worker.commit_session(other_worker.get_session("whatsapp", "5511666666666"))
+
+    services = Services(EscalationService())
+    services.intent_detector = IdentifiedByOtherWorker(concurrent_turn)
+    services.decision_engine = RulesEngine()
+    orchestrator = ActionOrchestrator(SessionManager(store), services)
+
+    response = orchestrator.process_input(StatusIntent.value, "whatsapp", "5511666666666")
+
+    assert response == AIServiceMock().generate_response(StatusIntent.value, client_data, channel="whatsapp")
+    session = SessionManager(store).get_session("whatsapp", "5511666666666")
+    assert session.get_state() == "awaiting_followup"
+    assert session.get_client_info() == client_data
+    contents = [m["content"] for m in session.get_full_history()]
+    assert contents[-3:] == ["12345678900", StatusIntent.value, response]
+    store.close()
@@ -0,0 +1,100 @@
+import pytest
+
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_manager import SessionConflictError, SessionManager
+from src.services.mocks.redis_mock import RedisMock
+
+USER = "5511999999999"
+KEY = f"session:whatsapp:{USER}"
+
+
+class KeyRecordingRedis(RedisMock):
+    """RedisMock que registra as chaves tocadas por comandos"""
+
+    def __init__(self):
+        super().__init__()
+        self.touched = set()
+
+    def _execute(self, name, args, kwargs):
+        if args:
+            self.touched.add(args[0])
+        return super()._execute(name, args, kwargs)
+
+
+def add_turn(manager, text):
+    session = manager.get_session("whatsapp", USER)
+    session.add_message("user", text)
+    manager.commit_session(session)
+    return session
+
+
+def test_cas_writes_only_declared_keys():
+    client = KeyRecordingRedis()
+    store = RedisSessionStore(client=client)
+    manager = SessionManager(store)
+    add_turn(manager, "primeira")
+
+    declared = []
+    script = store._cas
+
+    def recording_script(keys=(), args=()):
+        declared.extend(keys)
+        client.touched.clear()
+        return script(keys=keys, args=args)
+
+    store._cas = recording_script
+    session = add_turn(manager, "segunda")
+
+    assert declared == [KEY, f"{{{KEY}}}:history"]
+    assert client.touched <= set(declared)
+    assert session.fields["version"] == 2
+    assert store.incremental_saves == 1
+
+
+def test_cas_success_appends_only_new_messages():
+    client = RedisMock()
+    store = RedisSessionStore(client=client)
+    manager = SessionManager(store)
+    add_turn(manager, "primeira")
+    add_turn(manager, "segunda")
+
+    fields, _ = store.load_session(KEY)
+    history = [m["content"] for m in SessionManager(store).get_session("whatsapp", USER).get_full_history()]
+
+    assert fields["version"] == 2
+    assert history[1:] == ["primeira", "segunda"]
+    assert store.get_version_token(KEY) == (2, fields["session_id"])
+
+
+def test_cas_conflict_rejects_stale_copy():
+    store = RedisSessionStore(client=RedisMock())
+    first, second = SessionManager(store), SessionManager(store)
+    add_turn(first, "primeira")
+
+    stale = second.get_session("whatsapp", USER)
+    add_turn(first, "segunda")
+    stale.add_message("user", "cópia antiga")
+
+    with pytest.raises(SessionConflictError):
+        second.commit_session(stale)
+
+    history = [m["content"] for m in SessionManager(store).get_session("whatsapp", USER).get_full_history()]
+    assert "cópia antiga" not in history
+    assert store.conflicts == 1
+    assert store.load_session(KEY)[0]["version"] == 2
+
+
+def test_history_list_trimmed_to_window():
+    client = RedisMock()
+    store = RedisSessionStore(client=client)
+    manager = SessionManager(store, history_window=4, archive_batch=2)
+    for turn in range(10):
+        add_turn(manager, f"mensagem {turn}")
+
+    session = SessionManager(store, history_window=4, archive_batch=2).get_session("whatsapp", USER)
+    stored = client.lrange(f"{{{KEY}}}:history", 0, -1)
+    full = [m["content"] for m in session.get_full_history()]
+
+    assert len(stored) <= session.history_length()
+    assert session.history_length() <= 4 + 2
+    assert full[1:] == [f"mensagem {turn}" for turn in range(10)]
@@ -0,0 +1,74 @@
+from src.core.decision_engine import DecisionEngine
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_cache import SessionNearCache
+from src.core.session_manager import SessionManager
+from src.services.mocks.redis_mock import RedisMock
+
+
+class Intent:
+    type = "ask_status"
+    value = "qual o status do meu pedido?"
+
+
+def build():
+    client = RedisMock()
+    store = RedisSessionStore(client=client)
+    cached = SessionManager(store, near_cache=SessionNearCache())
+    other = SessionManager(store)
+    return client, cached, other
+
+
+def commit_message(manager, text):
+    session = manager.get_session("whatsapp", "5511999999999")
+    session.add_message("user", text)
+    manager.commit_session(session)
+    return session
+
+
+def test_cached_entry_is_checked_on_every_read():
+    client, cached, _ = build()
+    commit_message(cached, "primeira")
+
+    trips = client.round_trips
+    session = cached.get_session("whatsapp", "5511999999999")
+
+    # Só a consulta da versão: a sessão em si vem do cache
+    assert client.round_trips == trips + 1
+    assert cached.near_cache.stats()["probes"] == 1
+    assert cached.near_cache.stats()["hits"] == 1
+    assert [m["content"] for m in session.get_full_history()][-1] == "primeira"
+
+
+def test_stale_entry_is_not_used_for_the_decision():
+    _, cached, other = build()
+    commit_message(cached, "oi")
+
+    # Outro worker identifica o cliente pelo CPF
+    session = other.get_session("whatsapp", "5511999999999")
+    session.add_message("user", "12345678900")
+    session.update_client_info({"sucesso": True, "dados": {"nome": "Cliente"}})
+    session.set_state("awaiting_followup")
+    other.commit_session(session)
+
+    session = cached.get_session("whatsapp", "5511999999999")
+    action = DecisionEngine().determine_action(Intent(), session)
+
+    # Com a cópia em cache, a resposta seria pedir o CPF de novo
+    assert action.type == "answer_question"
+    assert session.has_client_info()
+    assert cached.near_cache.stats()["stale"] == 1
+
+
+def test_recreated_session_with_same_version_is_stale():
+    _, cached, other = build()
+    original = commit_message(cached, "sessão antiga")
+
+    # A sessão expira e é recriada por outro worker com a mesma versão
+    other.storage.delete_session("session:whatsapp:5511999999999")
+    recreated = commit_message(other, "sessão nova")
+    assert recreated.fields["version"] == original.fields["version"]
+
+    session = cached.get_session("whatsapp", "5511999999999")
+
+    assert session.fields["session_id"] == recreated.fields["session_id"]
+    assert cached.near_cache.stats()["stale"] == 1
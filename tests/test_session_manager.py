@@ -0,0 +1,69 @@
+import pytest
+
+from src.core.session_manager import SessionManager
+from src.core.session_store import MemorySessionStore
+
+
+class KeyValueOnlyStore:
+    """Armazenamento chave/valor sem scan_keys"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_iter_sessions_without_scan_keys_names_the_store():
+    manager = SessionManager(KeyValueOnlyStore())
+
+    with pytest.raises(TypeError, match="KeyValueOnlyStore"):
+        manager.iter_sessions()
+
+
+def test_iter_sessions_filters_by_channel():
+    store = MemorySessionStore(sweep_interval=0)
+    manager = SessionManager(store)
+    for channel, user_id in (("whatsapp", "5511000000001"), ("whatsapp", "5511000000002"), ("web", "abc")):
+        session = manager.get_session(channel, user_id)
+        session.add_message("user", "olá")
+        manager.commit_session(session)
+
+    users = sorted(session.user_id for session in manager.iter_sessions(batch_size=1, channel="whatsapp"))
+
+    assert users == ["5511000000001", "5511000000002"]
+    store.close()
+
+
+def test_reset_deletes_archived_chunks_when_saved():
+    store = MemorySessionStore(sweep_interval=0)
+    manager = SessionManager(store, history_window=2, archive_batch=1)
+    key = "session:whatsapp:5511000000003"
+    for turn in range(8):
+        session = manager.get_session("whatsapp", "5511000000003")
+        session.add_message("user", f"mensagem {turn}")
+        manager.commit_session(session)
+    chunks = session.fields["archive_chunks"]
+    assert chunks > 1
+
+    session = manager.get_session("whatsapp", "5511000000003")
+    session.reset()
+    # Nada é removido antes de a sessão reiniciada ser gravada
+    assert store.get(f"{key}:archive:0") is not None
+    for turn in range(3):
+        session.add_message("user", f"depois do reset {turn}")
+    manager.trim_history(session)
+    manager.commit_session(session)
+
+    remaining = [index for index in range(chunks) if store.get(f"{key}:archive:{index}") is not None]
+    assert remaining == list(range(session.fields["archive_chunks"]))
+    contents = [m["content"] for m in manager.get_session("whatsapp", "5511000000003").get_full_history()]
+    assert not any(text.startswith("mensagem") for text in contents)
+    assert contents[-3:] == [f"depois do reset {turn}" for turn in range(3)]
+    store.close()
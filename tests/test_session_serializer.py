@@ -0,0 +1,56 @@
+import json
+
+from src.core.session_manager import SessionManager
+from src.core.session_serializer import JsonSessionSerializer, RawJson
+from src.core.session_store import MemorySessionStore
+
+CLIENT_INFO = {"sucesso": True, "dados": {"nome": "Cliente", "status": "Em andamento"}}
+
+
+def test_json_session_hydrates_lazily():
+    store = MemorySessionStore(sweep_interval=0)
+    manager = SessionManager(store, history_window=100)
+    session = manager.get_session("whatsapp", "5511999999999")
+    session.update_client_info(CLIENT_INFO)
+    session.add_message("user", 'texto com\nquebra e "aspas",\n"conversation_history":[')
+    manager.commit_session(session)
+
+    session = manager.get_session("whatsapp", "5511999999999")
+    assert session.get_state() == "awaiting_identifier"
+    assert not session.is_history_loaded()
+    assert isinstance(session.fields["client_info"], RawJson)
+    assert session.history_length() == 2
+
+    # Mensagem nova gravada sem decodificar as anteriores
+    session.add_message("assistant", "resposta")
+    manager.commit_session(session)
+    assert not session.is_history_loaded()
+
+    session = manager.get_session("whatsapp", "5511999999999")
+    contents = [m["content"] for m in session.get_conversation_history()]
+    assert contents[1:] == ['texto com\nquebra e "aspas",\n"conversation_history":[', "resposta"]
+    assert session.get_client_info() == CLIENT_INFO
+    store.close()
+
+
+def test_json_document_stays_plain_json():
+    serializer = JsonSessionSerializer()
+    data = {
+        "session_id": "abc",
+        "state": "awaiting_followup",
+        "client_info": CLIENT_INFO,
+        "conversation_history": [{"role": "user", "content": "olá", "timestamp": "2024-01-01T10:00:00"}]
+    }
+
+    assert json.loads(serializer.dumps(data)) == data
+    assert json.loads(serializer.dumps({"conversation_history": []})) == {"conversation_history": []}
+
+
+def test_single_line_json_from_previous_format_is_read():
+    serializer = JsonSessionSerializer()
+    data = {"state": "escalated", "client_info": None, "conversation_history": [{"role": "user", "content": "oi"}]}
+
+    fields, history = serializer.loads_lazy(json.dumps(data))
+
+    assert history is None
+    assert fields == data
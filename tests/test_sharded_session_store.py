@@ -0,0 +1,81 @@
+from src.core.redis_session_store import RedisSessionStore
+from src.core.session_manager import SessionManager
+from src.core.session_store import MemorySessionStore
+from src.core.sharded_session_store import create_sharded_store
+from src.services.mocks.redis_mock import RedisMock
+
+USERS = [f"5511{i:09d}" for i in range(200)]
+
+
+class DumpCountingStore(MemorySessionStore):
+    """MemorySessionStore que conta as leituras de migração"""
+
+    def __init__(self):
+        super().__init__(sweep_interval=0)
+        self.dumps = 0
+
+    def dump_entry(self, key):
+        self.dumps += 1
+        return super().dump_entry(key)
+
+
+def write_sessions(manager):
+    for user_id in USERS:
+        session = manager.get_session("whatsapp", user_id)
+        session.add_message("user", f"olá de {user_id}")
+        manager.commit_session(session)
+
+
+def assert_sessions(manager):
+    for user_id in USERS:
+        contents = [m["content"] for m in manager.get_session("whatsapp", user_id).get_full_history()]
+        assert contents[1:] == [f"olá de {user_id}"]
+
+
+def test_keys_routed_to_owner_shard():
+    shards = {f"shard-{i}": MemorySessionStore(sweep_interval=0) for i in range(3)}
+    store = create_sharded_store(shards)
+    write_sessions(SessionManager(store))
+
+    for name, shard in shards.items():
+        keys = list(shard.scan_keys())
+        assert keys
+        assert all(store.shard_for(key) == name for key in keys)
+    assert len(store) == len(USERS)
+
+
+def test_added_shard_migrates_on_access_and_rebalance():
+    shards = {f"shard-{i}": DumpCountingStore() for i in range(2)}
+    store = create_sharded_store(shards)
+    manager = SessionManager(store)
+    write_sessions(manager)
+
+    new_shard = DumpCountingStore()
+    store.add_shard("shard-2", new_shard)
+    assert store.rebalancing
+
+    # Acesso à chave que mudou de dono migra antes da leitura, conferindo a origem uma vez
+    moved_user = next(u for u in USERS if store.shard_for(f"session:whatsapp:{u}") == "shard-2")
+    for _ in range(3):
+        manager.get_session("whatsapp", moved_user)
+    assert sum(shard.dumps for shard in shards.values()) == 1
+    assert new_shard.peek(f"session:whatsapp:{moved_user}") is not None
+
+    result = store.rebalance()
+    assert not store.rebalancing
+    assert result["moved"] > 0
+    assert all(store.shard_for(key) == "shard-2" for key in new_shard.scan_keys())
+    assert_sessions(SessionManager(store))
+
+
+def test_removed_shard_drained_by_rebalance_with_redis_shards():
+    shards = {f"redis-{i}": RedisSessionStore(client=RedisMock()) for i in range(3)}
+    store = create_sharded_store(shards)
+    write_sessions(SessionManager(store))
+
+    store.remove_shard("redis-1")
+    result = store.rebalance()
+
+    assert result["retired"] == ["redis-1"]
+    assert list(shards["redis-1"].scan_keys()) == []
+    assert_sessions(SessionManager(store))
@@ -0,0 +1,54 @@
+import asyncio
+
+from src.utils.single_flight import SingleFlight
+
+
+def test_concurrent_coroutines_share_one_call():
+    flight = SingleFlight("teste")
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0.05)
+        return {"chave": key}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("cpf:123", fetch, "cpf:123") for _ in range(10)))
+
+    results = asyncio.run(scenario())
+
+    assert calls == ["cpf:123"]
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 9}
+
+
+def test_cancelling_leader_caller_keeps_call_for_others():
+    flight = SingleFlight("teste")
+    calls = []
+    release = None
+
+    async def fetch(key):
+        calls.append(key)
+        await release.wait()
+        return "resultado"
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(flight.ado("ordem:1", fetch, "ordem:1"))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.ado("ordem:1", fetch, "ordem:1")) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*followers)
+        return leader.cancelled(), results
+
+    leader_cancelled, results = asyncio.run(scenario())
+
+    assert leader_cancelled
+    assert results == ["resultado"] * 3
+    assert calls == ["ordem:1"]
+    assert flight.stats()["coalesced"] == 3
@@ -0,0 +1,102 @@
+import threading
+
+from src.core.sqlite_session_store import SQLiteSessionStore
+
+
+def test_compare_and_set_versions(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    try:
+        assert store.compare_and_set("s", 60, b"v1", 0, 1)
+        assert not store.compare_and_set("s", 60, b"x", 0, 1)
+        assert store.compare_and_set("s", 60, b"v2", 1, 2)
+        assert store.get("s") == b"v2"
+    finally:
+        store.close()
+
+
+def test_compare_and_set_rejects_write_from_other_instance(tmp_path):
+    """Dois processos no mesmo arquivo: a verificação antecipada de B vê a versão antiga"""
+    path = str(tmp_path / "sessions.db")
+    a = SQLiteSessionStore(path)
+    b = SQLiteSessionStore(path)
+    try:
+        assert a.compare_and_set("s", 60, b"base", 0, 1)
+
+        # B conferiu a versão 1 antes de A gravar a versão 2
+        lookup = b._lookup
+        b._lookup = lambda key, now: (True, 1)
+        assert a.compare_and_set("s", 60, b"from A", 1, 2)
+        assert not b.compare_and_set("s", 60, b"from B", 1, 2)
+        b._lookup = lookup
+
+        assert b.get("s") == b"from A"
+        assert b.stats()["conflicts"] == 1
+    finally:
+        a.close()
+        b.close()
+
+
+def test_concurrent_instances_do_not_lose_updates(tmp_path):
+    """Leitura, alteração e CAS com nova tentativa em duas instâncias: nenhuma gravação perdida"""
+    path = str(tmp_path / "sessions.db")
+    stores = [SQLiteSessionStore(path), SQLiteSessionStore(path)]
+    increments = 25
+
+    def worker(store, name):
+        for i in range(increments):
+            while True:
+                value = store.get("history")
+                version = int(value.split(b"|")[0]) if value else 0
+                new = b"|".join([str(version + 1).encode(), (value or b"").split(b"|", 1)[-1] + f"{name}{i},".encode()])
+                if store.compare_and_set("history", 60, new, version, version + 1):
+                    break
+
+    threads = [
+        threading.Thread(target=worker, args=(store, f"{n}{t}-"))
+        for n, store in enumerate(stores) for t in range(3)
+    ]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        value = stores[0].get("history")
+        version, history = value.split(b"|", 1)
+        assert int(version) == 6 * increments
+        assert history.count(b",") == 6 * increments
+    finally:
+        for store in stores:
+            store.close()
+
+
+def test_chained_compare_and_set_in_same_process(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    try:
+        results = []
+        threads = []
+        for version in range(10):
+            t = threading.Thread(target=lambda v=version: results.append(
+                store.compare_and_set("s", 60, str(v + 1).encode(), v, v + 1)))
+            threads.append(t)
+        # Em ordem: cada CAS confere a gravação pendente da anterior
+        for t in threads:
+            t.start()
+            t.join(0.001)
+        for t in threads:
+            t.join()
+        assert store.get("s") == str(results.count(True)).encode()
+    finally:
+        store.close()
+
+
+def test_set_nx_across_instances(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    a = SQLiteSessionStore(path)
+    b = SQLiteSessionStore(path)
+    try:
+        assert a.set("wamid:1", "1", nx=True, ex=60)
+        b._lookup = lambda key, now: (False, 0)
+        assert b.set("wamid:1", "1", nx=True, ex=60) is None
+    finally:
+        a.close()
+        b.close()
@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+
+from src.services.whatsapp_async import AsyncWhatsAppService
+
+
+async def start_service(status_code):
+    service = AsyncWhatsAppService()
+    service.api_token = "token"
+    service.phone_number_id = "123"
+    service.spool_path = ":memory:"
+    service.rate_limit = 1000.0
+    await service.start()
+
+    await service.client.aclose()
+    service.client = httpx.AsyncClient(
+        base_url="https://graph.test",
+        transport=httpx.MockTransport(lambda request: httpx.Response(status_code, text="erro"))
+    )
+    return service
+
+
+def test_send_from_event_loop_keeps_task_until_done():
+    async def scenario():
+        service = await start_service(503)
+        try:
+            assert service.send_message("5511999999999", "olá") is True
+            tracked = len(service._tasks)
+            await asyncio.gather(*list(service._tasks))
+            return tracked, len(service._tasks), service.stats()
+        finally:
+            await service.aclose()
+
+    tracked, remaining, stats = asyncio.run(scenario())
+
+    assert tracked == 1
+    assert remaining == 0
+    assert stats["spooled"] == 1
+    assert stats["spool_pending"] == 1
+
+
+def test_successful_send_does_not_touch_spool():
+    async def scenario():
+        service = await start_service(200)
+        try:
+            sent = await service.asend_message("5511999999999", "olá")
+            return sent, service.stats()
+        finally:
+            await service.aclose()
+
+    sent, stats = asyncio.run(scenario())
+
+    assert sent is True
+    assert stats["sent"] == 1
+    assert stats["spool_pending"] == 0